@@ -1,10 +1,21 @@
-import sys
 import time
+_T0 = time.perf_counter()  # referência do perfil de inicialização (--perfil-inicio)
+import re
+import sys
 import json
-import requests
+import atexit
+import base64
+import codecs
+import contextlib
+import os
+import random
+import string
+import functools
+import importlib
 import threading
+from collections import namedtuple, deque
+from datetime import datetime, timezone, timedelta
 from io import BytesIO
-from PIL import Image, ImageFilter
 from firebase_config import FIREBASE_CONFIG, SETORES
 from PyQt6.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QHBoxLayout,
                               QLabel, QLineEdit, QTextEdit, QMessageBox, QScrollArea,
@@ -15,10 +26,94 @@ from PyQt6.QtCore import (Qt, QPoint, QTimer, QObject, pyqtSignal, QRect,
                            QByteArray, QBuffer, QIODevice, QSequentialAnimationGroup)
 from PyQt6.QtGui import (QCursor, QPainter, QColor, QPen, QRadialGradient,
                           QFont, QPixmap, QIcon, QPainterPath)
-from PyQt6.QtSvg import QSvgRenderer
-from pynput import keyboard, mouse
-from pynput.keyboard import Key, Controller as KeyboardController
-from pynput.mouse import Button, Controller as MouseController
+
+
+# ---------------------------------------------------------------------------
+# Inicialização  — perfil de tempo e imports tardios
+# ---------------------------------------------------------------------------
+class PerfilInicio:
+    """Tempo de cada fase da inicialização até a janela de login aparecer.
+    Com --perfil-inicio o main() imprime a tabela no stderr e encerra após o primeiro paint;
+    para o detalhe de cada import use também python -X importtime."""
+
+    def __init__(self, t0, ativo):
+        self.ativo     = ativo
+        self.t0        = t0
+        self._anterior = t0
+        self.fases     = []  # [(fase, ms da fase, ms desde o início)]
+        self.tardios   = {}  # módulo → ms do import tardio
+
+    def marcar(self, fase):
+        if not self.ativo:
+            return
+        agora = time.perf_counter()
+        self.fases.append((fase, (agora - self._anterior) * 1000, (agora - self.t0) * 1000))
+        self._anterior = agora
+
+    def tardio(self, modulo, inicio):
+        self.tardios[modulo] = (time.perf_counter() - inicio) * 1000
+
+    def relatorio(self):
+        linhas = [f"{'fase':34s} {'ms':>8s} {'acumulado':>10s}"]
+        linhas += [f"{fase:34s} {ms:8.1f} {total:10.1f}" for fase, ms, total in self.fases]
+        if self.tardios:
+            linhas.append("imports tardios já feitos: " +
+                          ", ".join(f"{m} {ms:.1f} ms" for m, ms in self.tardios.items()))
+        return "\n".join(linhas)
+
+
+perfil_inicio = PerfilInicio(_T0, '--perfil-inicio' in sys.argv)
+perfil_inicio.marcar('imports (stdlib, PyQt6, config)')
+
+
+class _ModuloTardio:
+    """Importa o módulo no primeiro acesso a um atributo (ex.: requests.request)."""
+
+    def __init__(self, nome):
+        self._nome   = nome
+        self._modulo = None
+
+    def carregar(self):
+        if self._modulo is None:
+            inicio = time.perf_counter()
+            modulo = importlib.import_module(self._nome)
+            perfil_inicio.tardio(self._nome, inicio)
+            self._modulo = modulo
+        return self._modulo
+
+    def __getattr__(self, attr):
+        return getattr(self.carregar(), attr)
+
+
+# requests só é usado a partir do clique em "Entrar"; PIL (blur do overlay) e QtSvg (ícones do
+# menu) são importados dentro de quem usa; pynput só depois do login (_carregar_pynput)
+requests = _ModuloTardio('requests')
+
+keyboard = Key = Button = KeyboardController = MouseController = None
+_lock_pynput = threading.Lock()
+
+
+def _carregar_pynput():
+    global keyboard, Key, Button, KeyboardController, MouseController
+    with _lock_pynput:
+        if keyboard is not None:
+            return
+        inicio = time.perf_counter()
+        from pynput import keyboard as _keyboard, mouse as _mouse
+        Key, KeyboardController = _keyboard.Key, _keyboard.Controller
+        Button, MouseController = _mouse.Button, _mouse.Controller
+        keyboard = _keyboard
+        perfil_inicio.tardio('pynput', inicio)
+
+
+def _aquecer_imports():
+    """Roda em segundo plano depois que a janela de login aparece, para o clique em
+    "Entrar" e o início do listener não pagarem os imports."""
+    try:
+        requests.carregar()
+        _carregar_pynput()
+    except Exception as e:
+        print(f"Erro ao pré-carregar módulos: {e}")
 
 
 # ---------------------------------------------------------------------------
@@ -72,46 +167,722 @@ class NotificationWidget(QWidget):
             self.setWindowOpacity(self.opacity)
 
 
+# ---------------------------------------------------------------------------
+# leitura em streaming de arrays JSON (respostas do runQuery)
+# ---------------------------------------------------------------------------
+_RE_SEPARADORES = re.compile(r'[\s,]*')
+
+
+def _iter_json_array(chunks):
+    """Decodifica um array JSON recebido em pedaços, devolvendo um elemento por vez."""
+    decoder = json.JSONDecoder()
+    utf8    = codecs.getincrementaldecoder('utf-8')()
+    buf, pos, aberto = '', 0, False
+    for chunk in chunks:
+        # descarta o que já foi consumido — o buffer guarda só o elemento incompleto
+        buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        while True:
+            pos = _RE_SEPARADORES.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            if not aberto:
+                if buf[pos] != '[':
+                    raise ValueError('resposta não é um array JSON')
+                aberto = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                item, fim = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # elemento ainda incompleto, espera o próximo pedaço
+            yield item
+            pos = fim
+    if buf[pos:].strip():
+        raise ValueError('array JSON truncado')
+
+
+# ---------------------------------------------------------------------------
+# codec de valores do Firestore (REST) ↔ Python
+# ---------------------------------------------------------------------------
+GeoPoint = namedtuple('GeoPoint', 'latitude longitude')
+
+
+class Referencia(str):
+    """Caminho de documento guardado como referenceValue."""
+    __slots__ = ()
+
+
+def _decodificar_timestamp(v):
+    # RFC 3339 com até 9 casas decimais; datetime só guarda microssegundos
+    data, _, resto = v.rstrip('Z').partition('.')
+    frac = resto[:6].ljust(6, '0') if resto else '000000'
+    return datetime.fromisoformat(f"{data}.{frac}+00:00")
+
+
+def _codificar_timestamp(v):
+    if v.tzinfo is None:
+        v = v.astimezone()
+    return v.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+_DECODIFICADORES = {
+    'nullValue':      lambda v: None,
+    'booleanValue':   bool,
+    'integerValue':   int,
+    'doubleValue':    float,
+    'timestampValue': _decodificar_timestamp,
+    'stringValue':    str,
+    'bytesValue':     base64.b64decode,
+    'referenceValue': Referencia,
+    'geoPointValue':  lambda v: GeoPoint(v.get('latitude', 0.0), v.get('longitude', 0.0)),
+    'arrayValue':     lambda v: [_decodificar_valor(x) for x in v.get('values', ())],
+    'mapValue':       lambda v: _fields_to_dict(v.get('fields', {})),
+}
+
+_CODIFICADORES = {
+    type(None): lambda v: {'nullValue': None},
+    bool:       lambda v: {'booleanValue': v},
+    int:        lambda v: {'integerValue': str(v)},
+    float:      lambda v: {'doubleValue': v},
+    str:        lambda v: {'stringValue': v},
+    bytes:      lambda v: {'bytesValue': base64.b64encode(v).decode('ascii')},
+    datetime:   lambda v: {'timestampValue': _codificar_timestamp(v)},
+    Referencia: lambda v: {'referenceValue': str(v)},
+    GeoPoint:   lambda v: {'geoPointValue': {'latitude': v.latitude, 'longitude': v.longitude}},
+    list:       lambda v: {'arrayValue': {'values': [_codificar_valor(x) for x in v]}},
+    tuple:      lambda v: {'arrayValue': {'values': [_codificar_valor(x) for x in v]}},
+    dict:       lambda v: {'mapValue': {'fields': _dict_to_fields(v)}},
+}
+
+
+def _decodificar_valor(v):
+    # cada Value do Firestore tem exatamente uma chave: o tipo
+    for tipo, valor in v.items():
+        dec = _DECODIFICADORES.get(tipo)
+        return dec(valor) if dec else None
+    return None
+
+
+def _codificar_valor(v):
+    cod = _CODIFICADORES.get(type(v))
+    if cod is None:
+        cod = next((c for t, c in _CODIFICADORES.items() if isinstance(v, t)), None)
+        if cod is None:
+            raise TypeError(f"tipo sem equivalente no Firestore: {type(v).__name__}")
+    return cod(v)
+
+
+def _fields_to_dict(fields):
+    return {k: _decodificar_valor(v) for k, v in fields.items()}
+
+
+def _dict_to_fields(d):
+    return {k: _codificar_valor(v) for k, v in d.items()}
+
+
+# ---------------------------------------------------------------------------
+# registros do Firestore (templates, atalhos e shortcuts antigos)
+# ---------------------------------------------------------------------------
+
+def _carregar_acoes(valor):
+    """Aceita a lista de ações nativa (arrayValue) ou o JSON em string. As escritas continuam
+    em string enquanto houver versões antigas do programa, que só leem esse formato e, ao
+    salvar de novo, apagariam as ações guardadas como arrayValue."""
+    if isinstance(valor, str):
+        try:
+            valor = json.loads(valor or '[]')
+        except ValueError:
+            return []
+    return valor if isinstance(valor, list) else []
+
+
+_RE_ACAO_CLIQUE_E = re.compile(r'Clicar com o bot[aã]o E (\d+) vez')
+_RE_ACAO_CLIQUE_D = re.compile(r'bot[aã]o D\.')
+_RE_ACAO_CLIQUE_M = re.compile(r'bot[aã]o do meio\.')
+_RE_ACAO_ESPERAR  = re.compile(r'Esperar (\d+) ms')
+
+
+def _compilar_acoes(acoes):
+    """Converte ações no formato antigo (texto) para dicts, uma vez só, ao carregar o atalho."""
+    compiladas = []
+    for acao in acoes:
+        if isinstance(acao, dict):
+            compiladas.append(acao)
+            continue
+        if not isinstance(acao, str):
+            continue
+        m = _RE_ACAO_CLIQUE_E.match(acao)
+        if m:
+            compiladas.append({'tipo': 'click', 'botao': 'E', 'qtd': int(m.group(1))})
+        elif _RE_ACAO_CLIQUE_D.search(acao):
+            compiladas.append({'tipo': 'click', 'botao': 'D', 'qtd': 1})
+        elif _RE_ACAO_CLIQUE_M.search(acao):
+            compiladas.append({'tipo': 'click', 'botao': 'M', 'qtd': 1})
+        else:
+            m = _RE_ACAO_ESPERAR.match(acao)
+            if m:
+                compiladas.append({'tipo': 'esperar', 'ms': int(m.group(1))})
+    return compiladas
+
+
+class _Registro:
+    """Base dos registros: campos em __slots__, com acesso estilo dict (r['campo'], r.get)."""
+    __slots__ = ('id', 'versao')
+    _CAMPOS = ()  # (campo, default) lidos de doc['fields']
+
+    @classmethod
+    def from_doc(cls, doc):
+        f = _fields_to_dict(doc.get('fields', {}))
+        r = cls.__new__(cls)
+        r.id = doc['name'].rsplit('/', 1)[-1]
+        r.versao = doc.get('updateTime')  # usada como pré-condição nas escritas da fila offline
+        for campo, default in cls._CAMPOS:
+            v = f.get(campo)  # ausente ou nullValue: o default, para o _derivar não quebrar
+            setattr(r, campo, default if v is None else v)
+        r._derivar()
+        return r
+
+    def _derivar(self):
+        pass
+
+    def __getitem__(self, chave):
+        try:
+            return getattr(self, chave)
+        except AttributeError:
+            raise KeyError(chave) from None
+
+    def get(self, chave, default=None):
+        return getattr(self, chave, default)
+
+    def __contains__(self, chave):
+        return hasattr(self, chave)
+
+    def to_dict(self):
+        d = {'id': self.id}
+        for campo, _ in self._CAMPOS:
+            d[campo] = getattr(self, campo)
+        return d
+
+
+class Template(_Registro):
+    __slots__ = ('nome', 'texto', 'atalho', 'usuario_id', 'setor', 'compartilhado',
+                 'gatilho', 'preview', 'nome_lower', 'texto_lower')
+    _CAMPOS = (('nome', ''), ('texto', ''), ('atalho', ''), ('usuario_id', ''),
+               ('setor', ''), ('compartilhado', False))
+
+    def _derivar(self):
+        self.gatilho     = self.atalho.lower()
+        self.preview     = self.texto[:50] + '...' if len(self.texto) > 50 else self.texto
+        self.nome_lower  = self.nome.lower()
+        self.texto_lower = self.texto.lower()
+
+
+class Atalho(_Registro):
+    __slots__ = ('titulo', 'descricao', 'comando_tipo', 'comando_valor', 'acoes', 'ativo',
+                 'usuario_id', 'setor', 'compartilhado', 'velocidade', 'gatilho', 'teclas_alt', 'acoes_exec')
+    _CAMPOS = (('titulo', ''), ('descricao', ''), ('comando_tipo', ''), ('comando_valor', ''),
+               ('acoes', '[]'), ('ativo', True), ('usuario_id', ''), ('setor', ''),
+               ('compartilhado', False), ('velocidade', ''))  # velocidade '' = perfil global
+
+    def _derivar(self):
+        self.acoes      = _carregar_acoes(self.acoes)
+        self.acoes_exec = _compilar_acoes(self.acoes)
+        valor = self.comando_valor
+        self.gatilho    = valor.lower() if self.comando_tipo == 'shortcut' else ''
+        self.teclas_alt = (frozenset(t.strip().upper() for t in valor.split(',') if t.strip())
+                           if self.comando_tipo == 'alt_tecla' else frozenset())
+
+
+class ShortcutAntigo(_Registro):
+    __slots__ = ('nome', 'ativo', 'acoes', 'tecla_atalho', 'usuario_id', 'setor',
+                 'gatilho', 'tecla_alt')
+    _CAMPOS = (('nome', ''), ('ativo', True), ('acoes', '[]'), ('tecla_atalho', ''),
+               ('usuario_id', ''), ('setor', ''))
+
+    def _derivar(self):
+        self.acoes = _carregar_acoes(self.acoes)
+        tecla = self.tecla_atalho
+        # mais de 2 caracteres é atalho de texto; senão é Alt + tecla
+        self.gatilho   = tecla.lower() if len(tecla) > 2 else ''
+        self.tecla_alt = tecla.upper() if 0 < len(tecla) <= 2 else ''
+
+
 # ---------------------------------------------------------------------------
 # FirebaseAuth  — autenticação + CRUD de templates/shortcuts no Firestore
 # ---------------------------------------------------------------------------
+def _filtro_igual(campo, valor):
+    return {"fieldFilter": {"field": {"fieldPath": campo}, "op": "EQUAL", "value": _codificar_valor(valor)}}
+
+
+class ErroFirestore(Exception):
+    """Firestore não respondeu (rede, timeout, circuito aberto) ou recusou a leitura.
+    status é o código HTTP, ou None quando nem houve resposta."""
+
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _escrita_segura(fn):
+    """Escritas devolvem False em vez de estourar quando o Firestore está fora do ar."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except ErroFirestore:
+            return False
+    return wrapper
+
+
+class Disjuntor:
+    """Circuit breaker: depois de N falhas seguidas para de chamar o servidor por um tempo
+    e deixa passar uma única requisição de teste quando o tempo acaba."""
+    FECHADO, ABERTO, MEIO_ABERTO = 'fechado', 'aberto', 'meio-aberto'
+
+    def __init__(self, limite=3, espera=30.0):
+        self.limite  = limite
+        self.espera  = espera
+        self.estado  = self.FECHADO
+        self.falhas_seguidas = 0
+        self._aberto_em = 0.0
+        self._lock = threading.Lock()
+
+    def permite(self):
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return True
+            if self.estado == self.ABERTO and time.monotonic() - self._aberto_em >= self.espera:
+                self.estado = self.MEIO_ABERTO
+                return True  # requisição de teste
+            return False
+
+    def sucesso(self):
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas_seguidas = 0
+
+    def falha(self):
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas_seguidas >= self.limite:
+                self.estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+
+
+class GerenciadorToken:
+    """Guarda idToken/refreshToken do Firebase e renova o idToken antes de expirar."""
+    _URL_REFRESH = "https://securetoken.googleapis.com/v1/token?key={}"
+    _MARGEM      = 300  # renova 5 min antes de expirar
+    _REPETIR_EM  = 30   # nova tentativa se a renovação agendada falhar por rede
+
+    def __init__(self, api_key, transporte=requests):
+        self._api_key = api_key
+        self._http    = transporte
+        self._lock    = threading.Lock()
+        self._timer   = None
+        self.id_token      = None
+        self.refresh_token = None
+        self.expira_em     = 0.0  # time.monotonic()
+
+    def definir(self, id_token, refresh_token, expires_in):
+        with self._lock:
+            self._aplicar(id_token, refresh_token, expires_in)
+        self._agendar(self.expira_em - self._MARGEM - time.monotonic())
+
+    def _aplicar(self, id_token, refresh_token, expires_in):
+        self.id_token      = id_token
+        self.refresh_token = refresh_token or self.refresh_token
+        self.expira_em     = time.monotonic() + float(expires_in or 3600)
+
+    def limpar(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self.id_token = self.refresh_token = None
+            self.expira_em = 0.0
+
+    def atual(self):
+        """Token pronto para uso; se já estiver na margem de expiração, renova antes."""
+        token = self.id_token
+        if token and self.refresh_token and time.monotonic() >= self.expira_em - self._MARGEM:
+            return self.renovar(token) or token
+        return token
+
+    def renovar(self, token_recusado=None):
+        """Troca o refreshToken por um idToken novo. Se outra thread já renovou enquanto
+        esta esperava o lock, devolve o token dela em vez de renovar de novo."""
+        with self._lock:
+            if token_recusado is not None and self.id_token != token_recusado:
+                return self.id_token
+            if not self.refresh_token:
+                return None
+            try:
+                resp = self._http.request('POST', self._URL_REFRESH.format(self._api_key), timeout=15,
+                                          data={"grant_type": "refresh_token", "refresh_token": self.refresh_token})
+            except requests.RequestException:
+                return None
+            if resp.status_code != 200:
+                return None
+            result = resp.json()
+            self._aplicar(result['id_token'], result.get('refresh_token'), result.get('expires_in'))
+        self._agendar(self.expira_em - self._MARGEM - time.monotonic())
+        return self.id_token
+
+    def _agendar(self, segundos):
+        timer = threading.Timer(max(0.0, segundos), self._renovar_agendado)
+        timer.daemon = True
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = timer
+        timer.start()
+
+    def _renovar_agendado(self):
+        token = self.id_token
+        if token is None:
+            return  # logout
+        if self.renovar(token) is None and self.refresh_token and self.id_token == token:
+            self._agendar(self._REPETIR_EM)
+
+
+class TransporteMedido:
+    """Envolve o transporte HTTP e registra cada chamada: operação (o método do cliente que a
+    originou, ex.: _query_templates, get_user_data), status, bytes enviados/recebidos e duração."""
+    MAX_REGISTROS = 5000
+    # funções de infraestrutura puladas ao procurar quem originou a chamada
+    _INFRA = frozenset({'request', '_request', '_run_query', '_commit', '_consultar', '_listar_usuarios',
+                        '_gravar', 'commit', 'get', 'run_transaction', 'wrapper'})
+
+    def __init__(self, transporte):
+        self._transporte = transporte
+        self._registros  = deque(maxlen=self.MAX_REGISTROS)  # [ts, op, metodo, status, enviados, recebidos, ms]
+        self._lock       = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        registro = [time.time(), self._operacao(), method, None, 0, 0, 0.0]
+        t0 = time.perf_counter()
+        try:
+            resp = self._transporte.request(method, url, **kwargs)
+        finally:
+            registro[6] = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._registros.append(registro)
+        registro[3] = resp.status_code
+        registro[4] = self._tamanho_envio(resp)
+        if kwargs.get('stream'):
+            # corpo ainda não foi lido: conta os bytes conforme o chamador consome
+            original = resp.iter_content
+            def contando(*args, **kw):
+                for chunk in original(*args, **kw):
+                    registro[5] += len(chunk)
+                    yield chunk
+            resp.iter_content = contando
+        else:
+            registro[5] = len(resp.content or b'')
+        return resp
+
+    @staticmethod
+    def _tamanho_envio(resp):
+        # corpo que o requests já serializou para enviar (PreparedRequest.body): não serializa de novo
+        corpo = getattr(getattr(resp, 'request', None), 'body', None)
+        return len(corpo) if corpo else 0
+
+    def _operacao(self):
+        f = sys._getframe(2)
+        while f is not None:
+            nome = f.f_code.co_name
+            if (nome not in self._INFRA and not nome.startswith('<')
+                    and isinstance(f.f_locals.get('self'), (FirebaseAuth, GerenciadorToken, FeedAlteracoes))):
+                return nome
+            f = f.f_back
+        return '?'
+
+    def resumo(self, janela=None):
+        """Por operação, da mais chamada para a menos: chamadas, erros, p50/p95 (ms) e bytes.
+        janela: só os últimos N segundos (None = tudo que está guardado)."""
+        agora = time.time()
+        with self._lock:
+            registros = [r for r in self._registros if janela is None or agora - r[0] <= janela]
+        por_op = {}
+        for _, op, _, status, enviados, recebidos, ms in registros:
+            d = por_op.setdefault(op, {'chamadas': 0, 'erros': 0, 'enviados': 0, 'recebidos': 0, 'ms': []})
+            d['chamadas']  += 1
+            d['erros']     += status is None or status >= 400
+            d['enviados']  += enviados
+            d['recebidos'] += recebidos
+            d['ms'].append(ms)
+        saida = {}
+        for op, d in sorted(por_op.items(), key=lambda kv: -kv[1]['chamadas']):
+            ms = sorted(d.pop('ms'))
+            d['p50_ms'] = round(ms[int(0.50 * (len(ms) - 1))], 1)
+            d['p95_ms'] = round(ms[int(0.95 * (len(ms) - 1))], 1)
+            saida[op] = d
+        return saida
+
+    def salvar(self, caminho, extra=None):
+        with self._lock:
+            ultimas = list(self._registros)[-500:]
+        dados = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'resumo':    self.resumo(),
+            'ultimas':   [dict(zip(('ts', 'op', 'metodo', 'status', 'enviados', 'recebidos', 'ms'), r))
+                          for r in ultimas],
+        }
+        dados.update(extra or {})
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=1)
+
+
 class FirebaseAuth:
-    def __init__(self):
+    _RUN_QUERY_CHUNK = 64 * 1024  # bytes lidos por vez do corpo do runQuery
+    _ARQ_OUTBOX      = 'at_outbox.json'
+    _ARQ_CONFIG      = 'at_config.json'
+    _SINCRONIZAR_EM  = 30  # segundos entre tentativas enquanto a fila offline não esvazia
+    _CLASSES         = {'templates': Template, 'atalhos': Atalho, 'shortcuts': ShortcutAntigo}
+    _CAMPO_ALTERADO  = 'atualizado_em'  # horário do servidor da última escrita; base do feed de alterações
+    _TIMEOUT         = (5, 20)    # segundos: (conectar, ler)
+    _TENTATIVAS      = 4
+    _BACKOFF_BASE    = 0.5
+    _BACKOFF_MAX     = 8.0
+    _STATUS_REPETIR  = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, transporte=None, arq_outbox=None, arq_config=None):
+        """transporte: objeto com request(metodo, url, **kwargs) no formato do requests
+        (padrão: o próprio requests). Testes e benchmarks passam um FirestoreFake."""
         self.api_key    = FIREBASE_CONFIG['apiKey']
         self.project_id = FIREBASE_CONFIG['projectId']
         self.current_user = None
-        self.id_token     = None
+        self._http        = TransporteMedido(transporte or requests)
+        self.telemetria   = self._http
+        self._token       = GerenciadorToken(self.api_key, self._http)
         self._cache_templates = {}  # chave: (field, value) → lista
         self._cache_shortcuts = {}  # chave: (field, value) → lista
         self._cache_nomes     = {}  # chave: uid → nome
+        self.revisao          = 0   # cresce a cada mudança nas listas em cache (para índices derivados delas)
+        self.cache_alterado   = threading.Event()  # ligado junto com cada revisão nova
+        # último resultado bom de cada consulta; não é limpo ao invalidar o cache,
+        # serve de reserva quando o Firestore falha
+        self._ultimo_templates = {}
+        self._ultimo_shortcuts = {}
+        self._ultimo_usuarios  = {}
+        self._disjuntor   = Disjuntor()
+        self._arq_outbox  = arq_outbox or self._ARQ_OUTBOX
+        self._outbox      = FilaOffline(None)  # a fila em disco é de cada usuário; abre no login
+        self._lock_cache  = threading.RLock()  # UI, sincronização e feed trocam as listas em cache
+        self.config       = ConfigLocal(arq_config or self._ARQ_CONFIG)
+        self._timer_sinc  = None
+        self._lock_sinc   = threading.Lock()
+        self._lock_envio  = threading.Lock()  # uma sincronização por vez (a fila sai em ordem, uma vez só)
+        self._sem_rede    = False  # a fila parou por falta de rede: avisar quando ela esvaziar
+        self.ao_sincronizar = None  # callback(aplicadas, conflitos), chamado da thread de sincronização
+        self.feed         = None
+        self._assinantes  = []  # callback(tipo, colecao, registro_ou_id) do feed de alterações
+        self._falhas      = {}  # tipo → contagem (diagnóstico)
+        self._lock_falhas = threading.Lock()
 
     # ── helpers ──────────────────────────────────────────────────────────────
     def _base(self, collection, doc_id=''):
+        return f"https://firestore.googleapis.com/v1/{self._doc_name(collection, doc_id)}"
+
+    def _doc_name(self, collection, doc_id=''):
         path = f"projects/{self.project_id}/databases/(default)/documents/{collection}"
         if doc_id:
             path += f"/{doc_id}"
-        return f"https://firestore.googleapis.com/v1/{path}"
+        return path
+
+    def _documents_url(self, metodo):
+        return f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:{metodo}"
+
+    @property
+    def id_token(self):
+        return self._token.id_token
+
+    def _request(self, metodo, url, idempotente=True, tentativas=None, **kwargs):
+        """Requisição autenticada com timeout, novas tentativas e disjuntor.
+        - 401: renova o token e repete uma única vez;
+        - 429/5xx e erros de rede: repete com backoff exponencial + jitter (respeita Retry-After),
+          até tentativas vezes (padrão _TENTATIVAS); criações (idempotente=False) só repetem 429,
+          que o servidor garante não ter aplicado;
+        - esgotadas as tentativas devolve a última resposta, ou levanta ErroFirestore se não houve nenhuma."""
+        if not self._disjuntor.permite():
+            self._contar_falha('circuito_aberto')
+            raise ErroFirestore("Firestore indisponível (circuito aberto)")
+        kwargs.setdefault('timeout', self._TIMEOUT)
+        token = self._token.atual()
+        renovou = False
+        resp = erro = None
+        tentativa = 0
+        tentativas = tentativas or self._TENTATIVAS
+        while True:
+            try:
+                resp = self._http.request(metodo, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+            except requests.RequestException as e:
+                resp, erro = None, e
+                self._contar_falha('timeout' if isinstance(e, requests.Timeout) else 'rede')
+                repetir = idempotente
+            else:
+                if resp.status_code == 401 and not renovou:
+                    renovou = True
+                    novo = self._token.renovar(token)
+                    if novo:
+                        resp.close()
+                        token = novo
+                        continue
+                if resp.status_code not in self._STATUS_REPETIR:
+                    self._disjuntor.sucesso()
+                    return resp
+                self._contar_falha(f'http_{resp.status_code}')
+                repetir = idempotente or resp.status_code == 429
+            tentativa += 1
+            if not repetir or tentativa >= tentativas:
+                break
+            espera = self._espera(tentativa, resp)
+            if resp is not None:
+                resp.close()
+            time.sleep(espera)
+        self._disjuntor.falha()
+        if resp is None:
+            raise ErroFirestore(f"Falha de conexão com o Firestore: {erro}")
+        return resp
+
+    def _espera(self, tentativa, resp):
+        """Backoff exponencial com full jitter; Retry-After do servidor vale como mínimo."""
+        espera = random.uniform(0, min(self._BACKOFF_MAX, self._BACKOFF_BASE * 2 ** tentativa))
+        if resp is not None:
+            try:
+                espera = max(espera, min(self._BACKOFF_MAX, float(resp.headers.get('Retry-After', 0))))
+            except ValueError:
+                pass  # Retry-After em formato de data: fica só o backoff
+        return espera
+
+    def _contar_falha(self, tipo):
+        with self._lock_falhas:
+            self._falhas[tipo] = self._falhas.get(tipo, 0) + 1
+
+    def diagnostico(self):
+        """Contadores de falha e estado do disjuntor, para depuração."""
+        with self._lock_falhas:
+            falhas = dict(self._falhas)
+        return {
+            'falhas':          falhas,
+            'disjuntor':       self._disjuntor.estado,
+            'falhas_seguidas': self._disjuntor.falhas_seguidas,
+        }
 
-    def _headers(self):
-        return {"Authorization": f"Bearer {self.id_token}"}
+    def _consultar(self, cache, reserva, key, consulta):
+        """Devolve o cache; se não houver, consulta o Firestore. Se a consulta falhar,
+        devolve o último resultado bom (sem gravar no cache, para tentar de novo depois).
+        Só as listas de templates/atalhos/shortcuts contam como revisão nova e recebem a fila
+        offline; as de usuários (cache descartável) não fazem o registro de gatilhos ser refeito."""
+        if key not in cache:
+            try:
+                cache[key] = consulta()
+            except ErroFirestore:
+                return reserva.get(key, [])
+            with self._lock_cache:
+                reserva[key] = cache[key]
+                if reserva is not self._ultimo_templates and reserva is not self._ultimo_shortcuts:
+                    return cache[key]
+                self._nova_revisao()
+                # o servidor ainda não tem o que está na fila offline: reaplica por cima
+                for entrada in self._outbox.copia():
+                    self._aplicar_local(entrada['writes'])
+        return cache[key]
+
+    def _run_query(self, body):
+        """Executa um runQuery e devolve os documentos um a um, enquanto a resposta ainda chega.
+        Levanta ErroFirestore se a consulta falhar ou a resposta vier cortada."""
+        resp = self._request('POST', self._documents_url('runQuery'), json=body, stream=True)
+        try:
+            if resp.status_code != 200:
+                raise ErroFirestore(f"runQuery falhou ({resp.status_code})", resp.status_code)
+            try:
+                for item in _iter_json_array(resp.iter_content(chunk_size=self._RUN_QUERY_CHUNK)):
+                    doc = item.get('document')
+                    if doc:
+                        yield doc
+            except (ValueError, requests.RequestException) as e:
+                self._contar_falha('resposta_cortada')
+                raise ErroFirestore(f"runQuery interrompido: {e}")
+        finally:
+            resp.close()
+
+    def _contar(self, colecao, filtro):
+        """COUNT do Firestore: cobra uma leitura a cada 1000 documentos contados, em vez de uma por documento."""
+        body = {"structuredAggregationQuery": {
+            "structuredQuery": {"from": [{"collectionId": colecao}], "where": filtro},
+            "aggregations":    [{"alias": "n", "count": {}}],
+        }}
+        resp = self._request('POST', self._documents_url('runAggregationQuery'), json=body)
+        if resp.status_code != 200:
+            raise ErroFirestore(f"contagem falhou ({resp.status_code})", resp.status_code)
+        for item in resp.json():
+            campos = item.get('result', {}).get('aggregateFields', {})
+            if 'n' in campos:
+                return _decodificar_valor(campos['n'])
+        return 0
+
+    def _buscar_documentos(self, nomes):
+        """batchGet: {nome completo: documento, ou None se não existe mais}."""
+        achados = {}
+        nomes = list(nomes)
+        for i in range(0, len(nomes), 100):
+            resp = self._request('POST', self._documents_url('batchGet'), json={"documents": nomes[i:i + 100]})
+            if resp.status_code != 200:
+                raise ErroFirestore(f"batchGet falhou ({resp.status_code})", resp.status_code)
+            for item in resp.json():
+                if 'found' in item:
+                    achados[item['found']['name']] = item['found']
+                elif 'missing' in item:
+                    achados[item['missing']] = None
+        return achados
 
     def _fields_to_dict(self, fields):
-        result = {}
-        for k, v in fields.items():
-            if 'stringValue'  in v: result[k] = v['stringValue']
-            elif 'booleanValue' in v: result[k] = v['booleanValue']
-            elif 'integerValue' in v: result[k] = int(v['integerValue'])
-            elif 'doubleValue'  in v: result[k] = v['doubleValue']
-        return result
+        return _fields_to_dict(fields)
+
+    # ── escritas em lote / transações (documents:commit) ─────────────────────
+    def batch(self):
+        return WriteBatch(self)
+
+    def _commit(self, writes, transacao=None, tentativas=None):
+        body = {"writes": writes}
+        if transacao:
+            body["transaction"] = transacao
+        return self._request('POST', self._documents_url('commit'), json=body,
+                             idempotente=not any(self._criacao(w) for w in writes), tentativas=tentativas)
+
+    @staticmethod
+    def _criacao(write):
+        """Escrita com pré-condição exists=False: repetida depois de aplicada, falharia com ALREADY_EXISTS."""
+        return write.get('currentDocument', {}).get('exists') is False
+
+    def run_transaction(self, fn, tentativas=3):
+        """Executa fn(tx) numa transação; repete se o Firestore abortar por conflito.
+        Devolve o retorno de fn, ou None se não conseguir gravar."""
+        for _ in range(tentativas):
+            tx = Transacao(self)
+            try:
+                resultado = fn(tx)
+                if tx.commit():
+                    return resultado
+            except ErroFirestore:
+                return None
+            if tx.status != 409:  # 409 = ABORTED (outra escrita concorrente)
+                return None
+        return None
 
     # ── auth ─────────────────────────────────────────────────────────────────
     def signup(self, email, password, nome, setor):
         url  = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={self.api_key}"
-        resp = requests.post(url, json={"email": email, "password": password, "returnSecureToken": True})
+        resp = self._http.request('POST', url, json={"email": email, "password": password, "returnSecureToken": True})
         if resp.status_code == 200:
             result = resp.json()
             uid = result['localId']
-            self.id_token = result['idToken']
+            self._token.definir(result['idToken'], result.get('refreshToken'), result.get('expiresIn'))
             if self._is_first_user():
                 self._upsert_usuario(uid, nome, setor, email, aprovado=True, is_admin=True)
                 return {'success': True, 'uid': uid, 'first_admin': True}
@@ -123,15 +894,19 @@ class FirebaseAuth:
     def login(self, email, password):
         url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={self.api_key}"
         try:
-            resp = requests.post(url, json={"email": email, "password": password, "returnSecureToken": True})
+            resp = self._http.request('POST', url, json={"email": email, "password": password, "returnSecureToken": True})
             if resp.status_code == 200:
                 result = resp.json()
-                self.id_token = result['idToken']
+                self._token.definir(result['idToken'], result.get('refreshToken'), result.get('expiresIn'))
                 uid = result['localId']
                 user_data = self.get_user_data(uid)
                 if user_data and user_data.get('aprovado'):
                     self.current_user = user_data
                     self.current_user['uid'] = uid
+                    self._abrir_outbox(uid)
+                    if len(self._outbox):
+                        self._agendar_sincronizacao(1)
+                    self.iniciar_feed(user_data.get('setor', ''), uid)
                     return {'success': True, 'user': self.current_user}
                 return {'success': False, 'error': 'Usuário aguardando aprovação'}
             return {'success': False, 'error': 'Email ou senha incorretos'}
@@ -140,23 +915,40 @@ class FirebaseAuth:
 
     def logout(self):
         self.current_user = None
-        self.id_token     = None
+        if self.feed:
+            self.feed.parar()
+            self.feed = None
+        with self._lock_sinc:
+            if self._timer_sinc is not None:
+                self._timer_sinc.cancel()
+                self._timer_sinc = None
+            self._outbox = FilaOffline(None)  # a fila deste usuário fica no disco até ele voltar
+        self._token.limpar()
+
+    def _abrir_outbox(self, uid):
+        """Fila offline do usuário: at_outbox_<uid>.json. Escritas de um usuário nunca são
+        reenviadas com o token de outro que entrar na mesma máquina."""
+        raiz, ext = os.path.splitext(self._arq_outbox)
+        with self._lock_sinc:
+            self._outbox = FilaOffline(f"{raiz}_{uid}{ext}")
+            self._sem_rede = bool(len(self._outbox))  # sobrou da última sessão
 
     def send_password_reset(self, email):
         url  = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode?key={self.api_key}"
-        resp = requests.post(url, json={"requestType": "PASSWORD_RESET", "email": email})
+        resp = self._http.request('POST', url, json={"requestType": "PASSWORD_RESET", "email": email})
         return resp.status_code == 200
 
     # ── usuários ─────────────────────────────────────────────────────────────
     def _is_first_user(self):
         try:
-            resp = requests.get(self._base('usuarios'), headers=self._headers())
+            resp = self._request('GET', self._base('usuarios'))
             if resp.status_code == 200:
                 return len(resp.json().get('documents', [])) == 0
         except:
             pass
         return True
 
+    @_escrita_segura
     def _upsert_usuario(self, uid, nome, setor, email, aprovado=False, is_admin=False):
         data = {"fields": {
             "nome":     {"stringValue": nome},
@@ -165,18 +957,19 @@ class FirebaseAuth:
             "aprovado": {"booleanValue": aprovado},
             "is_admin": {"booleanValue": is_admin},
         }}
-        requests.patch(self._base('usuarios', uid), headers=self._headers(), json=data)
+        self._request('PATCH', self._base('usuarios', uid), json=data)
 
+    @_escrita_segura
     def _save_pending(self, uid, nome, setor, email):
         data = {"fields": {
             "nome":  {"stringValue": nome},
             "setor": {"stringValue": setor},
             "email": {"stringValue": email},
         }}
-        requests.patch(self._base('pending_users', uid), headers=self._headers(), json=data)
+        self._request('PATCH', self._base('pending_users', uid), json=data)
 
     def get_user_data(self, uid):
-        resp = requests.get(self._base('usuarios', uid), headers=self._headers())
+        resp = self._request('GET', self._base('usuarios', uid))
         if resp.status_code == 200:
             fields = resp.json().get('fields', {})
             return self._fields_to_dict(fields)
@@ -184,161 +977,395 @@ class FirebaseAuth:
 
     def get_user_nome(self, uid):
         if uid not in self._cache_nomes:
-            data = self.get_user_data(uid)
+            try:
+                data = self.get_user_data(uid)
+            except ErroFirestore:
+                return '?'  # não guarda: tenta de novo na próxima vez
             self._cache_nomes[uid] = data.get('nome', '?') if data else '?'
         return self._cache_nomes[uid]
 
-    def get_pending_users(self):
-        resp = requests.get(self._base('pending_users'), headers=self._headers())
+    def _listar_usuarios(self, colecao):
+        resp = self._request('GET', self._base(colecao))
         if resp.status_code != 200:
-            return []
+            raise ErroFirestore(f"leitura de {colecao} falhou ({resp.status_code})", resp.status_code)
         users = []
         for doc in resp.json().get('documents', []):
-            doc_uid = doc['name'].split('/')[-1]
             u = self._fields_to_dict(doc.get('fields', {}))
-            u['uid'] = doc_uid  # sempre usa o ID do documento, nunca campo interno
+            u['uid'] = doc['name'].split('/')[-1]  # sempre usa o ID do documento, nunca campo interno
             users.append(u)
         return users
 
+    def get_pending_users(self):
+        return self._consultar({}, self._ultimo_usuarios, 'pending_users',
+                               lambda: self._listar_usuarios('pending_users'))
+
     def get_approved_users(self):
-        resp = requests.get(self._base('usuarios'), headers=self._headers())
-        if resp.status_code != 200:
-            return []
-        users = []
-        for doc in resp.json().get('documents', []):
-            uid = doc['name'].split('/')[-1]
-            u = self._fields_to_dict(doc.get('fields', {}))
-            u['uid'] = uid
-            users.append(u)
-        return users
+        return self._consultar({}, self._ultimo_usuarios, 'usuarios',
+                               lambda: self._listar_usuarios('usuarios'))
 
     def approve_user(self, uid, nome, setor, email):
-        requests.patch(self._base('usuarios', uid), headers=self._headers(), json={"fields": {
-            "nome": {"stringValue": nome}, "setor": {"stringValue": setor},
-            "email": {"stringValue": email}, "aprovado": {"booleanValue": True}, "is_admin": {"booleanValue": False},
-        }})
-        requests.delete(self._base('pending_users', uid), headers=self._headers())
-        return True
+        return self.approve_users([{'uid': uid, 'nome': nome, 'setor': setor, 'email': email}])
 
     def reject_user(self, uid):
-        requests.delete(self._base('pending_users', uid), headers=self._headers())
-        return True
+        return self.reject_users([uid])
 
     def delete_user(self, uid):
-        requests.delete(self._base('usuarios', uid), headers=self._headers())
-        return True
+        return self.delete_users([uid])
 
     def promote_to_admin(self, uid):
-        resp = requests.get(self._base('usuarios', uid), headers=self._headers())
-        if resp.status_code == 200:
-            fields = resp.json().get('fields', {})
-            fields['is_admin'] = {"booleanValue": True}
-            requests.patch(self._base('usuarios', uid), headers=self._headers(), json={"fields": fields})
-            return True
-        return False
+        return self.promote_users_to_admin([uid])
+
+    # operações em massa: um único commit para todos os usuários selecionados
+    def approve_users(self, usuarios):
+        b = self.batch()
+        for u in usuarios:
+            b.set('usuarios', u['uid'], {"nome": u.get('nome', ''), "setor": u.get('setor', ''),
+                                         "email": u.get('email', ''), "aprovado": True, "is_admin": False})
+            b.delete('pending_users', u['uid'])
+        return b.commit()
+
+    def reject_users(self, uids):
+        b = self.batch()
+        for uid in uids:
+            b.delete('pending_users', uid)
+        return b.commit()
+
+    def delete_users(self, uids):
+        b = self.batch()
+        for uid in uids:
+            b.delete('usuarios', uid)
+        return b.commit()
+
+    def promote_users_to_admin(self, uids):
+        # escrita só do campo, sem ler o documento antes; falha se algum usuário não existir
+        b = self.batch()
+        for uid in uids:
+            b.update('usuarios', uid, {"is_admin": True})
+        return b.commit()
+
+    # ── escritas de templates/atalhos/shortcuts, com fila offline ────────────
+    def _novo_id(self):
+        """Id gerado no cliente, no mesmo formato dos automáticos do Firestore; permite criar offline."""
+        return ''.join(random.choices(string.ascii_letters + string.digits, k=20))
+
+    def _gravar(self, desc, batch):
+        """Põe as escritas na fila offline (em disco) e no cache local, para a tela já mostrar a
+        alteração, e manda a fila numa thread: a UI nunca espera a rede. Sem conexão a fila
+        fica para depois; escrita recusada pelo servidor vai para os conflitos (ver sincronizar)."""
+        writes = batch._writes
+        self._versionar(writes)
+        self._outbox.adicionar(desc, writes)
+        self._aplicar_local(writes)
+        self._agendar_sincronizacao(0)
+        return True
+
+    def _listas_cache(self, colecao):
+        """Listas em cache (e reservas) com documentos da coleção, sem repetir a mesma lista."""
+        dicts = ((self._cache_templates, self._ultimo_templates) if colecao == 'templates'
+                 else (self._cache_shortcuts, self._ultimo_shortcuts))
+        listas = {}
+        for d in dicts:
+            for key, lista in d.items():
+                # atalhos e shortcuts dividem o mesmo cache; as chaves de atalhos têm prefixo
+                if colecao != 'templates' and key[0].startswith('atalhos_') != (colecao == 'atalhos'):
+                    continue
+                listas[id(lista)] = (key, lista)
+        return listas.values()
+
+    def _filtro_lista(self, colecao, key):
+        """Filtro do runQuery que traz exatamente os documentos da lista em cache de chave key."""
+        campo, valor = key
+        if campo in ('usuario_id', 'atalhos_uid'):
+            return _filtro_igual('usuario_id', valor)
+        if colecao == 'shortcuts':
+            return _filtro_igual('setor', valor)
+        return {"compositeFilter": {"op": "AND", "filters": [
+            _filtro_igual('setor', valor), _filtro_igual('compartilhado', True)]}}
+
+    @staticmethod
+    def _pertence(key, registro):
+        campo, valor = key
+        if campo in ('usuario_id', 'atalhos_uid'):
+            return registro.usuario_id == valor
+        # listas do setor: templates e atalhos só entram se compartilhados
+        return registro.setor == valor and (isinstance(registro, ShortcutAntigo) or registro.compartilhado)
+
+    def _versionar(self, writes):
+        """Edições e exclusões da fila exigem a versão que estava na tela: se alguém alterou o
+        documento nesse meio tempo, a sincronização acusa conflito em vez de sobrescrever."""
+        for w in writes:
+            if self._criacao(w):
+                continue  # criação: o id é novo
+            nome = w['update']['name'] if 'update' in w else w['delete']
+            colecao, doc_id = nome.split('/')[-2:]
+            for _, lista in self._listas_cache(colecao):
+                versao = next((r.versao for r in lista if r.id == doc_id and r.versao), None)
+                if versao:
+                    w['currentDocument'] = {'updateTime': versao}
+                    break
+
+    def _trocar_lista(self, antiga, nova):
+        """Põe nova no lugar de antiga em todos os caches e reservas que a usam. As listas em
+        cache nunca são alteradas no lugar: quem já as está percorrendo (a UI, o listener)
+        continua com a versão que pegou. Chamar com _lock_cache."""
+        for d in (self._cache_templates, self._ultimo_templates, self._cache_shortcuts, self._ultimo_shortcuts):
+            for key, lista in list(d.items()):
+                if lista is antiga:
+                    d[key] = nova
+
+    def _aplicar_local(self, writes, resultados=None):
+        """Reflete as escritas nas listas em cache (em cópias, ver _trocar_lista). Com os writeResults
+        de um commit já aplicado, os registros ficam com a versão (updateTime) do servidor."""
+        with self._lock_cache:
+            for n, w in enumerate(writes):
+                self._aplicar_write(w, resultados[n] if resultados and n < len(resultados) else None)
+            self._nova_revisao()
+
+    def _aplicar_write(self, w, resultado):
+        nome = w['update']['name'] if 'update' in w else w['delete']
+        colecao, doc_id = nome.split('/')[-2:]
+        cls = self._CLASSES.get(colecao)
+        if cls is None:
+            return
+        for key, antiga in self._listas_cache(colecao):
+            lista = list(antiga)
+            i = next((i for i, r in enumerate(lista) if r.id == doc_id), None)
+            atual = lista[i] if i is not None else None
+            if 'delete' in w:
+                if atual is not None:
+                    del lista[i]
+                    self._trocar_lista(antiga, lista)
+                continue
+            dados = atual.to_dict() if atual is not None else {}
+            dados.pop('id', None)
+            dados.update(_fields_to_dict(w['update'].get('fields', {})))
+            novo = cls.from_doc({'name': nome, 'fields': _dict_to_fields(dados)})
+            if resultado:
+                novo.versao = resultado.get('updateTime')
+            else:
+                novo.versao = atual.versao if atual is not None else None
+            if not self._pertence(key, novo):
+                if atual is None:
+                    continue
+                del lista[i]
+            elif atual is not None:
+                lista[i] = novo
+            else:
+                lista.append(novo)
+            self._trocar_lista(antiga, lista)
+
+    def _agendar_sincronizacao(self, segundos):
+        with self._lock_sinc:
+            if self._timer_sinc is not None and self._timer_sinc.is_alive():
+                return  # já tem uma agendada
+            self._timer_sinc = threading.Timer(segundos, self.sincronizar)
+            self._timer_sinc.daemon = True
+            self._timer_sinc.start()
+
+    def sincronizar(self):
+        """Envia a fila offline, em ordem. Para no primeiro erro de rede e reagenda; escrita
+        recusada pelo servidor (ex.: documento alterado por outra pessoa) vai para conflitos.
+        ao_sincronizar avisa dos conflitos e, depois de um período sem rede, do que foi aplicado."""
+        with self._lock_envio:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        with self._lock_sinc:
+            self._timer_sinc = None
+            fila = self._outbox
+        sem_rede = self._sem_rede
+        aplicadas = conflitos = 0
+        while fila is self._outbox:  # logout no meio: a fila é de outro usuário, para
+            entrada = fila.primeira()
+            if entrada is None:
+                self._sem_rede = False
+                break
+            try:
+                resp = self._commit(entrada['writes'])
+            except ErroFirestore:
+                resp = None
+            if resp is None or resp.status_code in self._STATUS_REPETIR or resp.status_code == 401:
+                self._sem_rede = True
+                self._agendar_sincronizacao(self._SINCRONIZAR_EM)
+                break
+            if self._ja_criado(entrada, resp):
+                # a tentativa anterior chegou ao servidor mas a resposta se perdeu (timeout, 5xx)
+                fila.concluir(entrada)
+                aplicadas += 1
+            elif resp.status_code == 200:
+                resultados = resp.json().get('writeResults', [])
+                self._aplicar_local(entrada['writes'], resultados)
+                # próximas escritas do mesmo documento passam a exigir a versão que acabou de ser gravada
+                for w, r in zip(entrada['writes'], resultados):
+                    anterior = w.get('currentDocument', {}).get('updateTime')
+                    if anterior and r.get('updateTime'):
+                        fila.trocar_versao(w['update']['name'] if 'update' in w else w['delete'],
+                                           anterior, r['updateTime'])
+                fila.concluir(entrada)
+                aplicadas += 1
+            else:
+                try:
+                    motivo = resp.json().get('error', {}).get('message', '')
+                except ValueError:
+                    motivo = ''
+                fila.concluir(entrada, conflito=motivo or f'HTTP {resp.status_code}')
+                conflitos += 1
+        if aplicadas or conflitos:
+            self._invalidate_cache()  # troca o que foi aplicado localmente pelo estado do servidor
+            if self.ao_sincronizar and (conflitos or sem_rede):
+                self.ao_sincronizar(aplicadas if sem_rede else 0, conflitos)
+
+    def conflitos_offline(self):
+        """Escritas da fila offline que o servidor recusou, mais recentes por último."""
+        return self._outbox.copia_conflitos()
+
+    def descartar_conflito(self, conflito):
+        self._outbox.remover_conflito(conflito)
+
+    def reaplicar_conflito(self, conflito):
+        """Manda de novo a escrita recusada sem exigir a versão antiga: a alteração feita offline
+        passa por cima do que estiver no servidor."""
+        if self._outbox.remover_conflito(conflito):
+            writes = []
+            for w in conflito['writes']:
+                w = dict(w)
+                pre = w.pop('currentDocument', {})
+                if 'updateTime' in pre and 'updateMask' in w:
+                    w['currentDocument'] = {'exists': True}  # edição parcial continua exigindo o documento
+                elif 'updateTime' not in pre and pre:
+                    w['currentDocument'] = pre
+                writes.append(w)
+            self._outbox.adicionar(conflito['desc'], writes)
+            self._aplicar_local(writes)
+            self._agendar_sincronizacao(0)
+
+    def _ja_criado(self, entrada, resp):
+        """A entrada só cria documentos (ids gerados aqui) e o servidor diz que eles já existem."""
+        if resp.status_code != 409 or not all(self._criacao(w) for w in entrada['writes']):
+            return False
+        try:
+            return resp.json().get('error', {}).get('status') == 'ALREADY_EXISTS'
+        except ValueError:
+            return False
+
+    # ── feed de alterações ───────────────────────────────────────────────────
+    def iniciar_feed(self, setor, uid):
+        if self.feed:
+            self.feed.parar()
+        self.feed = FeedAlteracoes(self, setor, uid)
+        self.feed.iniciar()
+
+    def assinar(self, callback):
+        """callback(tipo, colecao, registro_ou_id), com tipo 'added', 'changed' ou 'removed'.
+        É chamado da thread do feed: na UI, repassar por um sinal."""
+        self._assinantes.append(callback)
+
+    def cancelar_assinatura(self, callback):
+        if callback in self._assinantes:
+            self._assinantes.remove(callback)
+
+    def _emitir(self, tipo, colecao, registro):
+        for callback in list(self._assinantes):
+            try:
+                callback(tipo, colecao, registro)
+            except Exception:
+                self._contar_falha('assinante_feed')  # aparece no diagnóstico
+
+    def _aplicar_documento(self, colecao, doc_id, registro):
+        """Põe a versão do servidor (registro None = removido) nas listas em cache (em cópias,
+        ver _trocar_lista). Devolve 'added', 'changed', 'removed', ou None se o cache já estava assim."""
+        antes = depois = mudou = False
+        with self._lock_cache:
+            for key, antiga in self._listas_cache(colecao):
+                i = next((i for i, r in enumerate(antiga) if r.id == doc_id), None)
+                atual = antiga[i] if i is not None else None
+                antes = antes or atual is not None
+                lista = list(antiga)
+                if registro is not None and self._pertence(key, registro):
+                    depois = True
+                    if atual is None:
+                        lista.append(registro)
+                    elif atual.versao != registro.versao:
+                        lista[i] = registro
+                    else:
+                        continue
+                elif atual is not None:
+                    del lista[i]
+                else:
+                    continue
+                self._trocar_lista(antiga, lista)
+                mudou = True
+            if not mudou:
+                return None
+            self._nova_revisao()
+        return 'changed' if antes and depois else ('added' if depois else 'removed')
 
     # ── templates no Firestore ───────────────────────────────────────────────
     # Estrutura: colecao "templates", cada doc tem: nome, texto, atalho, usuario_id, setor
 
+    def _nova_revisao(self):
+        self.revisao += 1
+        self.cache_alterado.set()
+
     def _invalidate_cache(self):
         self._cache_templates = {}
         self._cache_shortcuts = {}
+        self._nova_revisao()
 
     def add_template(self, nome, texto, atalho, usuario_id, setor, compartilhado=False):
-        data = {"fields": {
-            "nome":          {"stringValue": nome},
-            "texto":         {"stringValue": texto},
-            "atalho":        {"stringValue": atalho or ""},
-            "usuario_id":    {"stringValue": usuario_id},
-            "setor":         {"stringValue": setor},
-            "compartilhado": {"booleanValue": compartilhado},
-        }}
-        resp = requests.post(self._base('templates'), headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
-
-    def add_atalho(self, titulo, comando_tipo, comando_valor, acoes, usuario_id, setor, compartilhado=False):
-        data = {"fields": {
-            "titulo":         {"stringValue": titulo},
-            "comando_tipo":   {"stringValue": comando_tipo},
-            "comando_valor":  {"stringValue": comando_valor or ""},
-            "acoes":          {"stringValue": json.dumps(acoes)},
-            "usuario_id":     {"stringValue": usuario_id},
-            "setor":          {"stringValue": setor},
-            "compartilhado":  {"booleanValue": compartilhado},
-        }}
-        resp = requests.post(self._base('atalhos'), headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        b = self.batch().set('templates', self._novo_id(), {
+            "nome": nome, "texto": texto, "atalho": atalho or "",
+            "usuario_id": usuario_id, "setor": setor, "compartilhado": compartilhado,
+        }, existe=False)
+        return self._gravar('Criar template', b)
+
+    def add_atalho(self, titulo, comando_tipo, comando_valor, acoes, usuario_id, setor, compartilhado=False,
+                   velocidade=''):
+        b = self.batch().set('atalhos', self._novo_id(), {
+            "titulo": titulo, "comando_tipo": comando_tipo, "comando_valor": comando_valor or "",
+            "acoes": json.dumps(acoes), "usuario_id": usuario_id, "setor": setor,
+            "compartilhado": compartilhado, "velocidade": velocidade,
+        }, existe=False)
+        return self._gravar('Criar atalho', b)
 
     def delete_atalho(self, doc_id):
-        resp = requests.delete(self._base('atalhos', doc_id), headers=self._headers())
-        if resp.status_code == 200:
-            self._cache_shortcuts.clear()
-        return resp.status_code == 200
+        return self._gravar('Excluir atalho', self.batch().delete('atalhos', doc_id))
 
-    def update_atalho(self, doc_id, titulo, comando_tipo, comando_valor, acoes, compartilhado=False):
-        data = {"fields": {
-            "titulo":        {"stringValue": titulo},
-            "comando_tipo":  {"stringValue": comando_tipo},
-            "comando_valor": {"stringValue": comando_valor},
-            "acoes":         {"stringValue": json.dumps(acoes)},
-            "compartilhado": {"booleanValue": compartilhado},
-        }}
-        mask = "updateMask.fieldPaths=titulo&updateMask.fieldPaths=comando_tipo&updateMask.fieldPaths=comando_valor&updateMask.fieldPaths=acoes&updateMask.fieldPaths=compartilhado"
-        resp = requests.patch(self._base('atalhos', doc_id) + '?' + mask, headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._cache_shortcuts.clear()
-        return resp.status_code == 200
+    def update_atalho(self, doc_id, titulo, comando_tipo, comando_valor, acoes, compartilhado=False,
+                      velocidade=''):
+        b = self.batch().update('atalhos', doc_id, {
+            "titulo": titulo, "comando_tipo": comando_tipo, "comando_valor": comando_valor,
+            "acoes": json.dumps(acoes), "compartilhado": compartilhado, "velocidade": velocidade,
+        })
+        return self._gravar('Editar atalho', b)
 
     def update_atalho_ativo(self, doc_id, ativo):
-        data = {"fields": {"ativo": {"booleanValue": ativo}}}
-        url = self._base('atalhos', doc_id) + '?updateMask.fieldPaths=ativo'
-        requests.patch(url, headers=self._headers(), json=data)
-        self._cache_shortcuts.clear()
+        return self._gravar('Ativar/desativar atalho', self.batch().update('atalhos', doc_id, {"ativo": ativo}))
 
     def update_atalho_descricao(self, doc_id, descricao):
-        data = {"fields": {"descricao": {"stringValue": descricao}}}
-        url = self._base('atalhos', doc_id) + '?updateMask.fieldPaths=descricao'
-        resp = requests.patch(url, headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._cache_shortcuts.clear()
+        return self._gravar('Editar descrição', self.batch().update('atalhos', doc_id, {"descricao": descricao}))
 
     def update_template(self, doc_id, nome, texto, atalho, compartilhado=False):
-        data = {"fields": {
-            "nome":          {"stringValue": nome},
-            "texto":         {"stringValue": texto},
-            "atalho":        {"stringValue": atalho or ""},
-            "compartilhado": {"booleanValue": compartilhado},
-        }}
-        resp = requests.patch(self._base('templates', doc_id), headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        b = self.batch().update('templates', doc_id, {
+            "nome": nome, "texto": texto, "atalho": atalho or "", "compartilhado": compartilhado,
+        })
+        return self._gravar('Editar template', b)
 
     def delete_template(self, doc_id):
-        resp = requests.delete(self._base('templates', doc_id), headers=self._headers())
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        return self._gravar('Excluir template', self.batch().delete('templates', doc_id))
 
     def get_templates_meus(self, usuario_id):
         key = ('usuario_id', usuario_id)
-        if key not in self._cache_templates:
-            self._cache_templates[key] = self._query_templates('usuario_id', usuario_id)
-        return self._cache_templates[key]
+        return self._consultar(self._cache_templates, self._ultimo_templates, key,
+                               lambda: self._query_templates('usuario_id', usuario_id))
 
     def get_templates_setor(self, setor):
         key = ('setor', setor)
-        if key not in self._cache_templates:
-            self._cache_templates[key] = self._query_templates_setor_compartilhados(setor)
-        return self._cache_templates[key]
+        return self._consultar(self._cache_templates, self._ultimo_templates, key,
+                               lambda: self._query_templates_setor_compartilhados(setor))
 
     def _query_templates_setor_compartilhados(self, setor):
         """Retorna templates do setor que foram compartilhados."""
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
         body = {
             "structuredQuery": {
                 "from": [{"collectionId": "templates"}],
@@ -353,24 +1380,9 @@ class FirebaseAuth:
                 }
             }
         }
-        resp = requests.post(url, headers=self._headers(), json=body)
-        if resp.status_code != 200:
-            return []
-        results = []
-        for item in resp.json():
-            doc = item.get('document')
-            if not doc: continue
-            doc_id = doc['name'].split('/')[-1]
-            f = self._fields_to_dict(doc.get('fields', {}))
-            results.append({
-                'id': doc_id, 'nome': f.get('nome', ''), 'texto': f.get('texto', ''),
-                'atalho': f.get('atalho', ''), 'usuario_id': f.get('usuario_id', ''),
-                'setor': f.get('setor', ''), 'compartilhado': f.get('compartilhado', False),
-            })
-        return results
+        return [Template.from_doc(doc) for doc in self._run_query(body)]
 
     def _query_templates(self, field, value):
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
         body = {
             "structuredQuery": {
                 "from": [{"collectionId": "templates"}],
@@ -383,89 +1395,57 @@ class FirebaseAuth:
                 }
             }
         }
-        resp = requests.post(url, headers=self._headers(), json=body)
-        if resp.status_code != 200:
-            return []
-        results = []
-        for item in resp.json():
-            doc = item.get('document')
-            if not doc:
-                continue
-            doc_id = doc['name'].split('/')[-1]
-            f = self._fields_to_dict(doc.get('fields', {}))
-            results.append({
-                'id':            doc_id,
-                'nome':          f.get('nome', ''),
-                'texto':         f.get('texto', ''),
-                'atalho':        f.get('atalho', ''),
-                'usuario_id':    f.get('usuario_id', ''),
-                'setor':         f.get('setor', ''),
-                'compartilhado': f.get('compartilhado', False),
-            })
-        return results
+        return [Template.from_doc(doc) for doc in self._run_query(body)]
 
     def search_templates(self, query, setor=None):
         templates = self.get_templates_setor(setor) if setor else []
         q = query.lower()
-        return [t for t in templates if q in t['nome'].lower() or q in t['texto'].lower()]
+        return [t for t in templates if q in t.nome_lower or q in t.texto_lower]
 
     # ── shortcuts no Firestore ───────────────────────────────────────────────
     def add_shortcut(self, nome, acoes, tecla_atalho, usuario_id, setor):
-        data = {"fields": {
-            "nome":         {"stringValue": nome},
-            "acoes":        {"stringValue": json.dumps(acoes)},
-            "tecla_atalho": {"stringValue": tecla_atalho or ""},
-            "ativo":        {"booleanValue": True},
-            "usuario_id":   {"stringValue": usuario_id},
-            "setor":        {"stringValue": setor},
-        }}
-        resp = requests.post(self._base('shortcuts'), headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        b = self.batch().set('shortcuts', self._novo_id(), {
+            "nome": nome, "acoes": json.dumps(acoes), "tecla_atalho": tecla_atalho or "",
+            "ativo": True, "usuario_id": usuario_id, "setor": setor,
+        }, existe=False)
+        return self._gravar('Criar shortcut', b)
 
     def update_shortcut(self, doc_id, nome, acoes, tecla_atalho, usuario_id, setor):
-        data = {"fields": {
-            "nome":         {"stringValue": nome},
-            "acoes":        {"stringValue": json.dumps(acoes)},
-            "tecla_atalho": {"stringValue": tecla_atalho or ""},
-            "usuario_id":   {"stringValue": usuario_id},
-            "setor":        {"stringValue": setor},
-        }}
-        resp = requests.patch(self._base('shortcuts', doc_id), headers=self._headers(), json=data)
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        b = self.batch().update('shortcuts', doc_id, {
+            "nome": nome, "acoes": json.dumps(acoes), "tecla_atalho": tecla_atalho or "",
+            "usuario_id": usuario_id, "setor": setor,
+        })
+        return self._gravar('Editar shortcut', b)
 
     def delete_shortcut(self, doc_id):
-        resp = requests.delete(self._base('shortcuts', doc_id), headers=self._headers())
-        if resp.status_code == 200:
-            self._invalidate_cache()
-        return resp.status_code == 200
+        return self._gravar('Excluir shortcut', self.batch().delete('shortcuts', doc_id))
 
     def toggle_shortcut(self, doc_id, ativo_atual):
-        resp = requests.get(self._base('shortcuts', doc_id), headers=self._headers())
-        if resp.status_code == 200:
-            fields = resp.json().get('fields', {})
-            fields['ativo'] = {"booleanValue": not ativo_atual}
-            requests.patch(self._base('shortcuts', doc_id), headers=self._headers(), json={"fields": fields})
+        """Inverte 'ativo' lendo o valor atual dentro da transação (ativo_atual é só o que a tela mostrava)."""
+        def _alternar(tx):
+            atual = tx.get('shortcuts', doc_id)
+            if atual is None:
+                return None
+            novo = not atual.get('ativo', ativo_atual)
+            tx.update('shortcuts', doc_id, {"ativo": novo})
+            return novo
+        novo = self.run_transaction(_alternar)
+        if novo is not None:
             self._invalidate_cache()
+        return novo
 
     def get_atalhos_meus(self, usuario_id):
         key = ('atalhos_uid', usuario_id)
-        if key not in self._cache_shortcuts:
-            self._cache_shortcuts[key] = self._query_atalhos('usuario_id', usuario_id)
-        return self._cache_shortcuts[key]
+        return self._consultar(self._cache_shortcuts, self._ultimo_shortcuts, key,
+                               lambda: self._query_atalhos('usuario_id', usuario_id))
 
     def get_atalhos_setor(self, setor):
         key = ('atalhos_setor', setor)
-        if key not in self._cache_shortcuts:
-            self._cache_shortcuts[key] = self._query_atalhos_setor_compartilhados(setor)
-        return self._cache_shortcuts[key]
+        return self._consultar(self._cache_shortcuts, self._ultimo_shortcuts, key,
+                               lambda: self._query_atalhos_setor_compartilhados(setor))
 
     def _query_atalhos_setor_compartilhados(self, setor):
         """Retorna atalhos do setor que foram compartilhados."""
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
         body = {
             "structuredQuery": {
                 "from": [{"collectionId": "atalhos"}],
@@ -480,68 +1460,23 @@ class FirebaseAuth:
                 }
             }
         }
-        resp = requests.post(url, headers=self._headers(), json=body)
-        if resp.status_code != 200:
-            return []
-        results = []
-        for item in resp.json():
-            if 'document' not in item: continue
-            doc = item['document']
-            f = doc.get('fields', {})
-            results.append({
-                'id':            doc['name'].split('/')[-1],
-                'titulo':        f.get('titulo',        {}).get('stringValue', ''),
-                'descricao':     f.get('descricao',     {}).get('stringValue', ''),
-                'comando_tipo':  f.get('comando_tipo',  {}).get('stringValue', ''),
-                'comando_valor': f.get('comando_valor', {}).get('stringValue', ''),
-                'acoes':         json.loads(f.get('acoes', {}).get('stringValue', '[]')),
-                'ativo':         f.get('ativo', {}).get('booleanValue', True),
-                'usuario_id':    f.get('usuario_id',    {}).get('stringValue', ''),
-                'setor':         f.get('setor',         {}).get('stringValue', ''),
-                'compartilhado': f.get('compartilhado', {}).get('booleanValue', True),
-            })
-        return results
+        return [Atalho.from_doc(doc) for doc in self._run_query(body)]
 
     def _query_atalhos(self, field, value):
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
         body = {"structuredQuery": {"from": [{"collectionId": "atalhos"}], "where": {"fieldFilter": {"field": {"fieldPath": field}, "op": "EQUAL", "value": {"stringValue": value}}}}}
-        resp = requests.post(url, headers=self._headers(), json=body)
-        if resp.status_code != 200:
-            return []
-        results = []
-        for item in resp.json():
-            if 'document' not in item:
-                continue
-            doc = item['document']
-            f = doc.get('fields', {})
-            results.append({
-                'id':            doc['name'].split('/')[-1],
-                'titulo':        f.get('titulo',        {}).get('stringValue', ''),
-                'descricao':     f.get('descricao',     {}).get('stringValue', ''),
-                'comando_tipo':  f.get('comando_tipo',  {}).get('stringValue', ''),
-                'comando_valor': f.get('comando_valor', {}).get('stringValue', ''),
-                'acoes':         json.loads(f.get('acoes', {}).get('stringValue', '[]')),
-                'ativo':         f.get('ativo', {}).get('booleanValue', True),
-                'usuario_id':    f.get('usuario_id',    {}).get('stringValue', ''),
-                'setor':         f.get('setor',         {}).get('stringValue', ''),
-                'compartilhado': f.get('compartilhado', {}).get('booleanValue', False),
-            })
-        return results
+        return [Atalho.from_doc(doc) for doc in self._run_query(body)]
 
     def get_shortcuts_meus(self, usuario_id):
         key = ('usuario_id', usuario_id)
-        if key not in self._cache_shortcuts:
-            self._cache_shortcuts[key] = self._query_shortcuts('usuario_id', usuario_id)
-        return self._cache_shortcuts[key]
+        return self._consultar(self._cache_shortcuts, self._ultimo_shortcuts, key,
+                               lambda: self._query_shortcuts('usuario_id', usuario_id))
 
     def get_shortcuts_setor(self, setor):
         key = ('setor', setor)
-        if key not in self._cache_shortcuts:
-            self._cache_shortcuts[key] = self._query_shortcuts('setor', setor)
-        return self._cache_shortcuts[key]
+        return self._consultar(self._cache_shortcuts, self._ultimo_shortcuts, key,
+                               lambda: self._query_shortcuts('setor', setor))
 
     def _query_shortcuts(self, field, value):
-        url = f"https://firestore.googleapis.com/v1/projects/{self.project_id}/databases/(default)/documents:runQuery"
         body = {
             "structuredQuery": {
                 "from": [{"collectionId": "shortcuts"}],
@@ -554,51 +1489,360 @@ class FirebaseAuth:
                 }
             }
         }
-        resp = requests.post(url, headers=self._headers(), json=body)
+        return [ShortcutAntigo.from_doc(doc) for doc in self._run_query(body)]
+
+    # config local (at_config.json), servida da memória — ver ConfigLocal
+    def get_config(self, chave, default=None):
+        return self.config.obter(chave, default)
+
+    def set_config(self, chave, valor):
+        self.config.definir(chave, valor)
+
+
+class WriteBatch:
+    """Acumula escritas e aplica todas de uma vez via documents:commit (atômico, uma ida ao servidor).
+    O lote vai sempre num commit só: ou todas as escritas valem, ou nenhuma."""
+
+    def __init__(self, firebase):
+        self._fb     = firebase
+        self._writes = []
+        self.status  = None
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, colecao, doc_id, dados, mask=None, existe=None):
+        write = {"update": {"name": self._fb._doc_name(colecao, doc_id), "fields": _dict_to_fields(dados)}}
+        if mask is not None:
+            write["updateMask"] = {"fieldPaths": list(mask)}
+        if existe is not None:
+            write["currentDocument"] = {"exists": existe}
+        if colecao in self._fb._CLASSES:
+            # carimbo do servidor que o FeedAlteracoes usa para buscar só o que mudou
+            write["updateTransforms"] = [{"fieldPath": self._fb._CAMPO_ALTERADO, "setToServerValue": "REQUEST_TIME"}]
+        self._writes.append(write)
+        return self
+
+    def update(self, colecao, doc_id, dados):
+        """Grava só os campos informados; exige que o documento exista."""
+        return self.set(colecao, doc_id, dados, mask=dados.keys(), existe=True)
+
+    def delete(self, colecao, doc_id):
+        self._writes.append({"delete": self._fb._doc_name(colecao, doc_id)})
+        return self
+
+    def commit(self):
+        if not self._writes:
+            return True
+        try:
+            resp = self._fb._commit(self._writes)
+        except ErroFirestore:
+            self.status = None
+            return False
+        self.status = resp.status_code
+        return resp.status_code == 200
+
+
+class Transacao(WriteBatch):
+    """WriteBatch com leituras consistentes; a transação começa na primeira leitura (batchGet)."""
+
+    def __init__(self, firebase):
+        super().__init__(firebase)
+        self.id = None
+
+    def get(self, colecao, doc_id):
+        body = {"documents": [self._fb._doc_name(colecao, doc_id)]}
+        if self.id:
+            body["transaction"] = self.id
+        else:
+            body["newTransaction"] = {"readWrite": {}}
+        resp = self._fb._request('POST', self._fb._documents_url('batchGet'), json=body)
+        self.status = resp.status_code
         if resp.status_code != 200:
-            return []
-        results = []
+            return None
+        doc = None
         for item in resp.json():
-            doc = item.get('document')
-            if not doc:
-                continue
-            doc_id = doc['name'].split('/')[-1]
-            f = self._fields_to_dict(doc.get('fields', {}))
-            try:
-                acoes = json.loads(f.get('acoes', '[]'))
-            except:
-                acoes = []
-            results.append({
-                'id':           doc_id,
-                'nome':         f.get('nome', ''),
-                'ativo':        f.get('ativo', True),
-                'acoes':        acoes,
-                'tecla_atalho': f.get('tecla_atalho', ''),
-                'usuario_id':   f.get('usuario_id', ''),
-                'setor':        f.get('setor', ''),
-            })
-        return results
-
-    # config simples (salvo localmente via arquivo json pequeno)
-    def get_config(self, chave, default=None):
+            self.id = item.get('transaction', self.id)
+            if 'found' in item:
+                doc = item['found']
+        return _fields_to_dict(doc.get('fields', {})) if doc else None
+
+    def commit(self):
+        if self.id is None:
+            return super().commit()
         try:
-            with open('at_config.json', 'r') as f:
-                return json.load(f).get(chave, default)
-        except:
-            return default
+            resp = self._fb._commit(self._writes, self.id)
+        except ErroFirestore:
+            self.status = None
+            return False
+        self.status = resp.status_code
+        return resp.status_code == 200
 
-    def set_config(self, chave, valor):
+
+class FilaOffline:
+    """Escritas feitas sem conexão, guardadas em disco na ordem em que aconteceram.
+    caminho None: só em memória (antes do login)."""
+
+    def __init__(self, caminho):
+        self.caminho   = caminho
+        self.pendentes = []  # [{'desc', 'writes', 'em'}]
+        self.conflitos = []  # entradas recusadas pelo servidor ao sincronizar, com 'motivo'
+        self._lock     = threading.Lock()
+        if caminho is None:
+            return
         try:
-            try:
-                with open('at_config.json', 'r') as f:
-                    cfg = json.load(f)
-            except:
-                cfg = {}
-            cfg[chave] = valor
-            with open('at_config.json', 'w') as f:
-                json.dump(cfg, f)
-        except:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            self.pendentes = dados.get('pendentes', [])
+            self.conflitos = dados.get('conflitos', [])
+        except (OSError, ValueError):
+            pass
+
+    def __len__(self):
+        return len(self.pendentes)
+
+    def copia(self):
+        with self._lock:
+            return list(self.pendentes)
+
+    def copia_conflitos(self):
+        with self._lock:
+            return list(self.conflitos)
+
+    def primeira(self):
+        with self._lock:
+            return self.pendentes[0] if self.pendentes else None
+
+    def pendente(self, nome):
+        """True se há escrita na fila para o documento (nome completo)."""
+        with self._lock:
+            return any((w['update']['name'] if 'update' in w else w['delete']) == nome
+                       for e in self.pendentes for w in e['writes'])
+
+    def adicionar(self, desc, writes):
+        with self._lock:
+            self.pendentes.append({'desc': desc, 'writes': writes, 'em': time.time()})
+            self._salvar()
+
+    def concluir(self, entrada, conflito=None):
+        with self._lock:
+            self.pendentes = [e for e in self.pendentes if e is not entrada]
+            if conflito:
+                self.conflitos.append({**entrada, 'motivo': conflito})
+            self._salvar()
+
+    def remover_conflito(self, conflito):
+        """True se o conflito ainda estava na lista."""
+        with self._lock:
+            if conflito not in self.conflitos:
+                return False
+            self.conflitos.remove(conflito)
+            self._salvar()
+            return True
+
+    def trocar_versao(self, nome, anterior, nova):
+        with self._lock:
+            for e in self.pendentes:
+                for w in e['writes']:
+                    alvo = w['update']['name'] if 'update' in w else w['delete']
+                    pre  = w.get('currentDocument', {})
+                    if alvo == nome and pre.get('updateTime') == anterior:
+                        pre['updateTime'] = nova
+            self._salvar()
+
+    def _salvar(self):
+        if self.caminho is None:
+            return
+        # grava num temporário e troca de uma vez: queda no meio nunca deixa o arquivo pela metade
+        tmp = self.caminho + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'pendentes': self.pendentes, 'conflitos': self.conflitos}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.caminho)
+
+
+class ConfigLocal:
+    """Preferências locais em JSON: lidas uma vez, servidas da memória e gravadas em segundo
+    plano, juntando alterações próximas numa única escrita atômica. Gravação pendente é
+    feita ao sair do programa."""
+    # chave → (padrão, tipo); chaves fora do esquema são guardadas como vierem
+    ESQUEMA = {
+        'last_tab':  ('templates', str),
+        'animacoes': (True, bool),
+        'velocidade':       ('normal', str),  # perfil global dos atalhos (PERFIS_VELOCIDADE)
+        'velocidade_fator': (1.0, float),     # resultado da calibração, usado pelo perfil 'calibrado'
+        'tecla_panico':     ('pause', str),   # além do Esc, para todo atalho e digitação em andamento
+        'injecao':          ('cuidadosa', str),  # como o texto dos templates é injetado (MODOS_INJECAO)
+        'expansao':         ('espaco', str),  # quando um gatilho de texto dispara (MODOS_EXPANSAO)
+    }
+    ATRASO = 0.5  # segundos sem alterações antes de gravar
+
+    def __init__(self, caminho):
+        self.caminho  = caminho
+        self._valores = {}
+        self._lock    = threading.Lock()
+        self._timer   = None
+        self._sujo    = False
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if isinstance(dados, dict):
+                self._valores = dados
+        except OSError:
             pass
+        except ValueError:
+            print(f"{caminho} inválido, usando os valores padrão")
+        atexit.register(self.gravar)
+
+    @staticmethod
+    def _do_tipo(valor, tipo):
+        """valor convertido para tipo, ou None se não for dele. Inteiro vale para float (o JSON
+        editado à mão ou de versões antigas guarda 1 em vez de 1.0); bool nunca vale como número."""
+        if tipo is float and isinstance(valor, int) and not isinstance(valor, bool):
+            return float(valor)
+        return valor if isinstance(valor, tipo) else None
+
+    def obter(self, chave, default=None):
+        """Valor salvo; se não houver (ou for de tipo errado), default ou o padrão do esquema."""
+        padrao, tipo = self.ESQUEMA.get(chave, (None, object))
+        valor = self._do_tipo(self._valores.get(chave), tipo)
+        if valor is not None:
+            return valor
+        return default if default is not None else padrao
+
+    def definir(self, chave, valor):
+        _, tipo = self.ESQUEMA.get(chave, (None, object))
+        convertido = self._do_tipo(valor, tipo)
+        if convertido is None:
+            raise TypeError(f"config '{chave}' espera {tipo.__name__}, recebeu {type(valor).__name__}")
+        valor = convertido
+        with self._lock:
+            if self._valores.get(chave) == valor:
+                return
+            self._valores[chave] = valor
+            self._sujo = True
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.ATRASO, self.gravar)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def gravar(self):
+        """Grava agora o que estiver pendente (temporário + troca, como a FilaOffline)."""
+        # o lock cobre a escrita: o atexit espera uma gravação do timer que esteja no meio
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            if not self._sujo:
+                return
+            self._sujo = False
+            tmp = self.caminho + '.tmp'
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self._valores, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.caminho)
+            except OSError as e:
+                print(f"Erro ao salvar {self.caminho}: {e}")
+
+
+class FeedAlteracoes:
+    """Mantém templates/atalhos/shortcuts em cache em dia com o que os colegas gravam.
+    A cada INTERVALO busca só os documentos visíveis para o usuário (do setor; templates e
+    atalhos só se compartilhados ou dele) com atualizado_em desde a última leitura. Exige os
+    índices compostos (setor, atualizado_em), (setor, compartilhado, atualizado_em) e
+    (setor, usuario_id, atualizado_em).
+    O que não deixa carimbo (exclusões, escritas de versões antigas do programa, documentos
+    de antes do atualizado_em) é achado pela conferência das listas em cache: a cada CONTAGEM
+    ciclos um COUNT por lista, e só se o total não bater, ou a cada CONFERENCIA ciclos, a lista
+    de chaves com o updateTime de cada documento."""
+    INTERVALO    = 5    # segundos
+    CONTAGEM     = 12   # ciclos entre contagens (~1 min)
+    CONFERENCIA  = 360  # ciclos entre conferências completas (~30 min)
+    SOBREPOSICAO = 5    # segundos relidos a cada ciclo: escritas concorrentes podem chegar fora de ordem
+
+    def __init__(self, firebase, setor, uid):
+        self._fb    = firebase
+        self.setor  = setor
+        self.uid    = uid
+        self._parar = threading.Event()
+        # começa um pouco antes de agora; o que já está no cache com a mesma versão não gera evento
+        inicio = datetime.now(timezone.utc) - timedelta(seconds=60)
+        self._desde = {colecao: inicio for colecao in firebase._CLASSES}
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _loop(self):
+        ciclo = 0
+        while not self._parar.wait(self.INTERVALO):
+            ciclo += 1
+            for colecao in self._fb._CLASSES:
+                try:
+                    self._incremental(colecao)
+                    if ciclo % self.CONTAGEM == 0:
+                        self._conferir(colecao, completa=ciclo % self.CONFERENCIA == 0)
+                except ErroFirestore:
+                    break  # sem conexão: tenta no próximo ciclo (o disjuntor segura as chamadas)
+
+    def _incremental(self, colecao):
+        campo = self._fb._CAMPO_ALTERADO
+        filtros = [
+            _filtro_igual('setor', self.setor),
+            {"fieldFilter": {
+                "field": {"fieldPath": campo},
+                "op":    "GREATER_THAN_OR_EQUAL",
+                "value": _codificar_valor(self._desde[colecao] - timedelta(seconds=self.SOBREPOSICAO)),
+            }},
+        ]
+        if colecao != 'shortcuts':
+            filtros.append({"compositeFilter": {"op": "OR", "filters": [
+                _filtro_igual('compartilhado', True), _filtro_igual('usuario_id', self.uid)]}})
+        body = {"structuredQuery": {
+            "from":  [{"collectionId": colecao}],
+            "where": {"compositeFilter": {"op": "AND", "filters": filtros}},
+        }}
+        for doc in self._fb._run_query(body):
+            carimbo = doc.get('fields', {}).get(campo)
+            if carimbo:
+                self._desde[colecao] = max(self._desde[colecao], _decodificar_valor(carimbo))
+            self._aplicar(colecao, doc['name'], doc)
+
+    def _aplicar(self, colecao, nome, doc):
+        """doc None: o documento não existe mais."""
+        if self._fb._outbox.pendente(nome):
+            return  # a alteração local ainda não sincronizada vale até a fila andar
+        registro = self._fb._CLASSES[colecao].from_doc(doc) if doc else None
+        doc_id = nome.rsplit('/', 1)[-1]
+        tipo = self._fb._aplicar_documento(colecao, doc_id, registro)
+        if tipo:
+            self._fb._emitir(tipo, colecao, registro if registro is not None else doc_id)
+
+    def _conferir(self, colecao, completa=False):
+        """Acerta as listas em cache de colecao que divergem do servidor. A contagem só pega
+        documentos que entraram ou saíram; a conferência completa pega também os alterados."""
+        for key, lista in list(self._fb._listas_cache(colecao)):
+            filtro = self._fb._filtro_lista(colecao, key)
+            if not completa and self._fb._contar(colecao, filtro) == len(lista):
+                continue
+            body = {"structuredQuery": {
+                "from":   [{"collectionId": colecao}],
+                "select": {"fields": [{"fieldPath": "__name__"}]},
+                "where":  filtro,
+            }}
+            servidor = {doc['name']: doc.get('updateTime') for doc in self._fb._run_query(body)}
+            local = {self._fb._doc_name(colecao, r.id): r.versao for r in lista}
+            # entraram, saíram (excluídos ou que deixaram de pertencer à lista) ou mudaram
+            divergentes = {n for n in servidor.keys() | local.keys() if servidor.get(n) != local.get(n)}
+            if divergentes:
+                for nome, doc in self._fb._buscar_documentos(divergentes).items():
+                    self._aplicar(colecao, nome, doc)
 
 
 # ---------------------------------------------------------------------------
@@ -767,44 +2011,406 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Erro', 'Email não encontrado!')
 
 
+# ---------------------------------------------------------------------------
+# Rastreio de latência  — tecla → texto digitado
+# ---------------------------------------------------------------------------
+class _Traco:
+    """Uma passagem por um fluxo (ex.: expansão de um atalho), com as marcas de tempo das etapas."""
+    __slots__ = ('rastreador', 'fluxo', 't0', 'inicio', 'marcas')
+
+    def __init__(self, rastreador, fluxo):
+        self.rastreador = rastreador
+        self.fluxo  = fluxo
+        self.t0     = time.perf_counter()
+        self.inicio = time.time()
+        self.marcas = []  # [(etapa, perf_counter)]
+
+    def marcar(self, etapa):
+        self.marcas.append((etapa, time.perf_counter()))
+
+    def fim(self, etapa=None):
+        if etapa:
+            self.marcar(etapa)
+        self.rastreador.registrar(self)
+
+
+class Rastreador:
+    """Junta os traços em memória (últimas MAX_AMOSTRAS durações por etapa) e, se houver
+    arquivo, grava cada traço como uma linha JSON. Cada etapa mede o tempo desde a anterior,
+    então dá para ver se o atraso está no hook, na busca no cache ou na injeção do pynput."""
+    MAX_AMOSTRAS = 2000
+
+    def __init__(self, arquivo=None):
+        self._amostras = {}  # 'fluxo.etapa' → deque de ms
+        self._lock     = threading.Lock()
+        self._arquivo  = open(arquivo, 'a', encoding='utf-8', buffering=1) if arquivo else None
+        if self._arquivo:
+            atexit.register(self._fechar)
+
+    def iniciar(self, fluxo):
+        return _Traco(self, fluxo)
+
+    def registrar(self, traco):
+        anterior = traco.t0
+        etapas = []
+        with self._lock:
+            for etapa, t in traco.marcas:
+                self._amostra(f"{traco.fluxo}.{etapa}", (t - anterior) * 1000)
+                etapas.append([etapa, round((t - traco.t0) * 1000, 3)])
+                anterior = t
+            self._amostra(f"{traco.fluxo}.total", (anterior - traco.t0) * 1000)
+            if self._arquivo:
+                self._arquivo.write(json.dumps({'fluxo': traco.fluxo, 'inicio': traco.inicio,
+                                                'etapas_ms': etapas}) + '\n')
+
+    def _amostra(self, nome, ms):
+        fila = self._amostras.get(nome)
+        if fila is None:
+            fila = self._amostras[nome] = deque(maxlen=self.MAX_AMOSTRAS)
+        fila.append(ms)
+
+    def resumo(self):
+        """{'fluxo.etapa': {'n', 'p50', 'p95', 'p99'}} em milissegundos."""
+        with self._lock:
+            copias = {nome: sorted(fila) for nome, fila in self._amostras.items()}
+        return {nome: {'n': len(v),
+                       'p50': v[int(0.50 * (len(v) - 1))],
+                       'p95': v[int(0.95 * (len(v) - 1))],
+                       'p99': v[int(0.99 * (len(v) - 1))]}
+                for nome, v in copias.items() if v}
+
+    def _fechar(self):
+        resumo = self.resumo()
+        with self._lock:
+            if self._arquivo:
+                self._arquivo.write(json.dumps({'resumo': resumo}) + '\n')
+                self._arquivo.close()
+                self._arquivo = None
+
+
+# ASSISTIVETOUCH_TRACE=caminho.jsonl grava cada traço; sem ela, só o resumo em memória
+rastreio = Rastreador(os.environ.get('ASSISTIVETOUCH_TRACE'))
+
+
 # ---------------------------------------------------------------------------
 # KeyboardSignals / KeyboardListener
 # ---------------------------------------------------------------------------
+# teclas que levam o cursor de texto para outro lugar: a palavra sendo digitada se perde
+_TECLAS_NAVEGACAO = ('left', 'right', 'up', 'down', 'home', 'end', 'page_up', 'page_down', 'delete')
+
+MODOS_EXPANSAO = [('espaco',   'No espaço ou pontuação'),
+                  ('imediato', 'Assim que o gatilho se completa')]
+_PONTUACAO_FIM = '.,;:!?'  # encerram um gatilho (e são redigitadas depois do texto)
+
+# do mais rápido ao mais cuidadoso; os rápidos são opcionais (o padrão é 'cuidadosa')
+MODOS_INJECAO = [('selecao',   'Rápida, selecionando o gatilho'),
+                 ('rajada',    'Rápida'),
+                 ('cuidadosa', 'Cuidadosa (tecla a tecla)')]
+
+
+class AdaptadorInjecao:
+    """Modo de inserção do texto: o da configuração, descido um degrau em MODOS_INJECAO
+    quando o usuário desfaz (Ctrl+Z) logo depois de uma inserção rápida, sinal de que o
+    aplicativo pode ter perdido eventos da rajada. O degrau é só desta sessão, não vai para
+    a configuração, e volta depois de RECUPERAR inserções sem Ctrl+Z: um desfazer por
+    outro motivo não prende o usuário no modo lento."""
+    JANELA_DESFAZER = 3.0  # s depois da inserção em que um Ctrl+Z conta como falha
+    RECUPERAR       = 20   # inserções sem Ctrl+Z para subir um degrau de volta
+
+    def __init__(self, config):
+        self.config     = config
+        self._ultima    = 0.0
+        self._degraus   = 0     # quantos degraus abaixo do modo configurado
+        self._base      = None  # modo configurado quando desceu (mudou na tela: zera)
+        self._sem_falha = 0
+        self._lock      = threading.Lock()
+
+    def _configurado(self):
+        modo = self.config.obter('injecao')
+        return modo if modo in dict(MODOS_INJECAO) else 'cuidadosa'
+
+    def modo(self):
+        ordem = [m for m, _ in MODOS_INJECAO]
+        base  = self._configurado()
+        with self._lock:
+            if base != self._base:
+                self._degraus = 0
+            return ordem[min(ordem.index(base) + self._degraus, len(ordem) - 1)]
+
+    def inserido(self, modo):
+        with self._lock:
+            if modo != 'cuidadosa':
+                self._ultima = time.monotonic()
+            if self._degraus:
+                self._sem_falha += 1
+                if self._sem_falha >= self.RECUPERAR:
+                    self._degraus  -= 1
+                    self._sem_falha = 0
+
+    def desfeito(self):
+        """Chamado no Ctrl+Z; devolve o modo novo se desceu um degrau."""
+        atual = self.modo()
+        ordem = [m for m, _ in MODOS_INJECAO]
+        with self._lock:
+            if time.monotonic() - self._ultima > self.JANELA_DESFAZER:
+                return None
+            self._ultima = 0.0
+            if ordem.index(atual) + 1 >= len(ordem):
+                return None
+            self._base      = self._configurado()
+            self._degraus  += 1
+            self._sem_falha = 0
+        return ordem[ordem.index(atual) + 1]
+
+
+ConflitoGatilho = namedtuple('ConflitoGatilho', 'tipo gatilho donos')  # donos: [(tipo, registro)]
+
+_NOMES_TIPO_GATILHO = {'template': 'template', 'atalho': 'atalho', 'shortcut': 'shortcut antigo'}
+
+
+class RegistroGatilhos:
+    """Todos os gatilhos do setor num lugar só. Normaliza os três formatos (templates.atalho;
+    atalhos.comando_valor conforme comando_tipo; shortcuts.tecla_atalho, que é texto com mais
+    de 2 caracteres e Alt + tecla com até 2) e serve os dois despachos:
+      - texto: trie em que cada nó é um dict caractere → nó; o nó onde um gatilho termina guarda
+        em _FIM o (tipo, registro) que vale, na ordem templates → atalhos → shortcuts. O
+        BufferDigitacao avança um nó por tecla, então o custo não depende de quantos gatilhos há.
+      - alt: letra maiúscula → (tipo, registro).
+    Os gatilhos que perdem para outro, ou que nunca chegam a disparar, ficam em conflitos."""
+    _FIM = ''  # nenhuma tecla é a string vazia
+
+    def __init__(self, templates, atalhos, shortcuts):
+        self.raiz = {}
+        self.alt  = {}
+        self.conflitos = []
+        texto, alt = {}, {}  # gatilho → [(tipo, registro)], na ordem de prioridade
+        for tipo, r, gatilho, teclas in self._normalizar(templates, atalhos, shortcuts):
+            if gatilho:
+                texto.setdefault(gatilho, []).append((tipo, r))
+            for tecla in teclas:
+                alt.setdefault(tecla, []).append((tipo, r))
+
+        for gatilho, donos in texto.items():
+            no = self.raiz
+            for c in gatilho:
+                no = no.setdefault(c, {})
+            no[self._FIM] = donos[0]
+            if len(donos) > 1:
+                self.conflitos.append(ConflitoGatilho('duplicado', gatilho, donos))
+            if '//' in gatilho:
+                self.conflitos.append(ConflitoGatilho('popup', gatilho, donos))
+            if any(c in BufferDigitacao.LIMITES for c in gatilho):
+                self.conflitos.append(ConflitoGatilho('espaco', gatilho, donos))
+        for tecla, donos in alt.items():
+            self.alt[tecla] = donos[0]
+            if len(donos) > 1:
+                self.conflitos.append(ConflitoGatilho('alt_duplicado', tecla, donos))
+
+    @staticmethod
+    def _normalizar(templates, atalhos, shortcuts):
+        """(tipo, registro, gatilho de texto, teclas Alt) dos registros ativos."""
+        for t in templates:
+            yield 'template', t, t.gatilho, ()
+        for a in atalhos:
+            if a.ativo:
+                yield 'atalho', a, a.gatilho, a.teclas_alt
+        for s in shortcuts:
+            if s.ativo:
+                yield 'shortcut', s, s.gatilho, (s.tecla_alt,) if s.tecla_alt else ()
+
+    @staticmethod
+    def avancar(no, c):
+        return no.get(c.lower()) if no is not None else None
+
+    @classmethod
+    def achado(cls, no):
+        """(tipo, registro) se um gatilho termina neste nó."""
+        return no.get(cls._FIM) if no is not None else None
+
+    @classmethod
+    def unico(cls, no):
+        """Um gatilho termina aqui e nenhum outro continua a partir dele."""
+        return no is not None and len(no) == 1 and cls._FIM in no
+
+    def buscar(self, palavra):
+        no = self.raiz
+        for c in palavra:
+            no = self.avancar(no, c)
+        return self.achado(no)
+
+    @staticmethod
+    def descrever(dono):
+        tipo, r = dono
+        return f"{_NOMES_TIPO_GATILHO[tipo]} “{r.get('titulo') or r.get('nome', '')}”"
+
+    def relatorio(self):
+        """Uma frase por conflito, para a tela de administração."""
+        linhas = []
+        for c in self.conflitos:
+            nomes = ', '.join(self.descrever(d) for d in c.donos)
+            if c.tipo == 'duplicado':
+                linhas.append(f"“{c.gatilho}” está em {nomes}; só o primeiro dispara.")
+            elif c.tipo == 'alt_duplicado':
+                linhas.append(f"Alt+{c.gatilho} está em {nomes}; só o primeiro dispara.")
+            elif c.tipo == 'popup':
+                linhas.append(f"“{c.gatilho}” ({nomes}) tem //, que abre o popup de templates antes de o gatilho terminar.")
+            else:
+                linhas.append(f"“{c.gatilho}” ({nomes}) tem espaço e nunca é reconhecido.")
+        return linhas
+
+
+class BufferDigitacao:
+    """Últimas teclas digitadas num deque de tamanho fixo, de onde sai a palavra atual.
+    Espaço, Enter e Tab entram como limites de palavra; o backspace tira a última tecla.
+    Estados: com o início conhecido (na partida e depois de uma expansão ou do popup) a
+    palavra é tudo desde o último limite; sem ele (clique, setas, Ctrl+algo, o backspace
+    passou do que foi visto, ou a palavra encheu o buffer) palavra() devolve None até o
+    próximo limite: o cursor pode estar no meio de uma palavra.
+    Cada tecla guarda junto o nó da trie do RegistroGatilhos em que a palavra está depois dela
+    (None: a palavra já não é começo de nenhum gatilho), e o backspace volta ao nó anterior."""
+    TAMANHO = 30
+    LIMITES = ' \n\t'
+
+    def __init__(self):
+        self._teclas   = deque(maxlen=self.TAMANHO)  # (caractere, nó)
+        self._inicio   = True   # _teclas[0] começa uma palavra
+        self._registro = None
+        self._lock     = threading.Lock()  # o listener do mouse também limpa
+
+    def usar_registro(self, registro):
+        """Troca o registro e refaz os nós das teclas guardadas."""
+        with self._lock:
+            self._registro = registro
+            no = registro.raiz if self._inicio else None
+            teclas = []
+            for c, _ in self._teclas:
+                no = registro.raiz if c in self.LIMITES else RegistroGatilhos.avancar(no, c)
+                teclas.append((c, no))
+            self._teclas = deque(teclas, maxlen=self.TAMANHO)
+
+    def _no(self):
+        if self._teclas:
+            return self._teclas[-1][1]
+        return self._registro.raiz if self._inicio and self._registro else None
+
+    def no(self):
+        with self._lock:
+            return self._no()
+
+    def caractere(self, c):
+        """Guarda a tecla e devolve o nó novo."""
+        with self._lock:
+            if len(self._teclas) == self.TAMANHO:
+                self._inicio = self._teclas[0][0] in self.LIMITES
+            if c in self.LIMITES:
+                no = self._registro.raiz if self._registro else None
+            else:
+                no = RegistroGatilhos.avancar(self._no(), c)
+            self._teclas.append((c, no))
+            return no
+
+    def apagar(self):
+        with self._lock:
+            if self._teclas:
+                self._teclas.pop()
+            else:
+                self._inicio = False  # apagou o que estava antes do que vimos
+
+    def limpar(self, inicio=True):
+        """Esquece as teclas; inicio=False quando o cursor foi para um lugar desconhecido."""
+        with self._lock:
+            self._teclas.clear()
+            self._inicio = inicio
+
+    def termina_com(self, sufixo):
+        with self._lock:
+            n = len(sufixo)
+            return len(self._teclas) >= n and ''.join(c for c, _ in list(self._teclas)[-n:]) == sufixo
+
+    def palavra(self):
+        with self._lock:
+            teclas = ''.join(c for c, _ in self._teclas)
+            inicio = self._inicio
+        for i in range(len(teclas) - 1, -1, -1):
+            if teclas[i] in self.LIMITES:
+                return teclas[i + 1:]
+        return teclas if inicio else None
+
+
 class KeyboardSignals(QObject):
     show_popup   = pyqtSignal(int, int)
     update_popup = pyqtSignal(str)
     close_popup  = pyqtSignal()
     insert_text  = pyqtSignal(str, int)
+    aviso        = pyqtSignal(str)  # mensagem curta para o usuário, vinda das threads de execução
 
 
 class KeyboardListener:
-    def __init__(self, firebase, user_data):
+    def __init__(self, firebase, user_data, keyboard_controller=None, mouse_controller=None):
+        _carregar_pynput()
         self.firebase    = firebase
         self.user_data   = user_data
-        self.typed_text  = ""
-        self.keyboard_controller = KeyboardController()
-        self.mouse_controller    = MouseController()
+        self.digitado    = BufferDigitacao()
+        # controllers injetáveis: o bench.py passa versões falsas que não mexem no sistema
+        self.keyboard_controller = keyboard_controller or KeyboardController()
+        self.mouse_controller    = mouse_controller or MouseController()
         self.listener        = None
+        self.listener_mouse  = None
+        # montado fora do hook do teclado (ver _manter_registro); vazio até a primeira montagem
+        self._registro_gatilhos = RegistroGatilhos([], [], [])
+        self._chave_registro    = None
+        self.digitado.usar_registro(self._registro_gatilhos)
         self.templates_popup = None
         self.search_mode  = False
         self.search_query = ""
         self.signals      = KeyboardSignals()
         self.alt_pressed  = False
+        self.altgr_pressed = False
+        self.ctrl_pressed = False
+        self.injecao      = AdaptadorInjecao(firebase.config)
+        self._traco_popup = None  # traço do // ou do Enter, atravessa o sinal até o slot
+        self._execucoes      = set()  # ExecutorAcoes/TokenCancelamento rodando (recebem as teclas; Esc cancela)
+        self._lock_execucoes = threading.Lock()
+        self._notificacao    = None
 
         self.signals.show_popup.connect(self._show_popup_slot)
         self.signals.update_popup.connect(self._update_popup_slot)
         self.signals.close_popup.connect(self._close_popup_slot)
         self.signals.insert_text.connect(self._insert_text_slot)
+        self.signals.aviso.connect(self._aviso_slot)
 
     def start(self):
+        from pynput import mouse as _mouse
         self.listener = keyboard.Listener(on_press=self.on_key_press, on_release=self.on_key_release)
         self.listener.start()
+        threading.Thread(target=self._manter_registro, daemon=True).start()
+        self.listener_mouse = _mouse.Listener(on_click=self.on_click)
+        self.listener_mouse.start()
+
+    def on_click(self, x, y, button, pressed):
+        if pressed:
+            self.digitado.limpar(inicio=False)  # o cursor de texto pode ter ido para qualquer lugar
 
     def on_key_press(self, key):
+        if gravacao_ativa.is_set():
+            return
+        if self._execucoes and self._tecla_para_execucoes(key):
+            return
         try:
+            if _e_altgr(key, self.ctrl_pressed):
+                self.altgr_pressed = True  # o Ctrl (sintético no Windows) não faz dos caracteres um atalho
+                return
             if key in (Key.alt_l, Key.alt_r, Key.alt):
                 self.alt_pressed = True
                 return
+            if key in (Key.ctrl_l, Key.ctrl_r, Key.ctrl):
+                self.ctrl_pressed = True
+                return
+            if self.ctrl_pressed and not self.altgr_pressed and getattr(key, 'char', None):
+                if key.char in ('z', 'Z', '\x1a'):
+                    self._desfeito()
+                self.digitado.limpar(inicio=False)  # Ctrl+V, Ctrl+Z… mudam o texto de um jeito que não acompanhamos
+                return
 
             if self.search_mode:
                 if key in (Key.right, Key.enter):
@@ -813,6 +2419,7 @@ class KeyboardListener:
                         if item:
                             texto = item.data(Qt.ItemDataRole.UserRole)
                             if texto:
+                                self._traco_popup = rastreio.iniciar('insercao')
                                 self.signals.insert_text.emit(texto, 2 + len(self.search_query))
                 elif key in (Key.esc, Key.space):
                     self.cancel_search()
@@ -832,28 +2439,117 @@ class KeyboardListener:
                 return
 
             if self.alt_pressed and hasattr(key, 'char') and key.char:
-                self.check_alt_shortcuts(key.char.upper())
+                self.check_alt_shortcuts(key.char.upper(), rastreio.iniciar('atalho_alt'))
                 return
 
             if hasattr(key, 'char') and key.char:
-                self.typed_text += key.char
-                if self.typed_text.endswith('//'):
+                c = key.char
+                antes = self.digitado.no()
+                if (c in _PONTUACAO_FIM and RegistroGatilhos.avancar(antes, c) is None
+                        and RegistroGatilhos.achado(antes) and self._expandir(c)):
+                    return
+                no = self.digitado.caractere(c)
+                if self.digitado.termina_com('//'):
+                    self._traco_popup = rastreio.iniciar('popup')
                     pos = QCursor.pos()
                     self.signals.show_popup.emit(pos.x(), pos.y())
                     return
-                if len(self.typed_text) > 30:
-                    self.typed_text = self.typed_text[-30:]
+                if RegistroGatilhos.unico(no) and self.firebase.config.obter('expansao') == 'imediato':
+                    self._expandir('')
             elif key == Key.space:
-                self.check_text_shortcuts()
-                self.typed_text = ""
+                if not (RegistroGatilhos.achado(self.digitado.no()) and self._expandir(' ')):
+                    self.digitado.caractere(' ')
             elif key in (Key.enter, Key.tab):
-                self.typed_text = ""
+                self.digitado.caractere('\n' if key == Key.enter else '\t')
+            elif key == Key.backspace:
+                self.digitado.apagar()
+            elif getattr(key, 'name', None) in _TECLAS_NAVEGACAO:
+                self.digitado.limpar(inicio=False)
         except Exception as e:
             print(f"Erro no listener: {e}")
 
+    def _registro(self):
+        """RegistroGatilhos do setor já montado. Roda no hook do teclado, então só lê: montar
+        pode consultar o Firestore (cache invalidado) e fica com _manter_registro."""
+        return self._registro_gatilhos
+
+    _ESPERA_REGISTRO = 30.0  # s; confere a revisão mesmo sem aviso de mudança
+
+    def _manter_registro(self):
+        """Thread: remonta o registro sempre que as listas em cache mudam, enquanto o listener
+        do teclado estiver vivo."""
+        alterado = self.firebase.cache_alterado
+        while self.listener.is_alive():
+            alterado.clear()  # antes de montar: mudança durante a montagem refaz de novo
+            try:
+                self.atualizar_registro()
+            except Exception as e:
+                print(f"Erro ao montar gatilhos: {e}")
+            alterado.wait(self._ESPERA_REGISTRO)
+
+    def atualizar_registro(self):
+        """Monta o RegistroGatilhos do setor se as listas em cache mudaram desde o último, e
+        troca o do listener de uma vez. Síncrono (o bench chama direto, sem start())."""
+        chave = (self.firebase.revisao, self.user_data['setor'])  # lida antes das listas
+        if chave == self._chave_registro:
+            return
+        setor = self.user_data['setor']
+        registro = RegistroGatilhos(self.firebase.get_templates_setor(setor),
+                                    self.firebase.get_atalhos_setor(setor),
+                                    self.firebase.get_shortcuts_setor(setor))
+        self.digitado.usar_registro(registro)
+        self._registro_gatilhos, self._chave_registro = registro, chave
+
+    def _expandir(self, terminador):
+        """A palavra atual completou um gatilho; terminador é a tecla que a encerrou
+        ('' no modo imediato). False se o começo da palavra não é conhecido."""
+        palavra = self.digitado.palavra()
+        if not palavra:
+            return False
+        self.check_text_shortcuts(rastreio.iniciar('atalho_texto'), palavra, terminador)
+        self.digitado.limpar()
+        return True
+
+    def _tecla_para_execucoes(self, key):
+        """Entrega a tecla aos atalhos em execução. True se ela foi consumida (Esc ou a
+        tecla de pânico cancelando, ou a tecla que um bloco esperar_tecla/se_tecla aguardava)."""
+        with self._lock_execucoes:
+            execucoes = list(self._execucoes)
+        nome = _nome_tecla(key)
+        if key == Key.esc or nome == self.firebase.config.obter('tecla_panico'):
+            for execucao in execucoes:
+                execucao.cancelar()
+            return bool(execucoes)
+        return any([execucao.tecla_pressionada(nome) for execucao in execucoes])
+
+    @contextlib.contextmanager
+    def _em_execucao(self, execucao):
+        """Deixa execucao ao alcance do Esc e da tecla de pânico enquanto o bloco roda."""
+        with self._lock_execucoes:
+            self._execucoes.add(execucao)
+        try:
+            yield execucao
+        finally:
+            with self._lock_execucoes:
+                self._execucoes.discard(execucao)
+
+    def _aviso_slot(self, msg):
+        self._notificacao = NotificationWidget(msg)
+        self._notificacao.show()
+
     def on_key_release(self, key):
+        if key == Key.alt_gr:
+            self.altgr_pressed = False
         if key in (Key.alt_l, Key.alt_r, Key.alt):
             self.alt_pressed = False
+        elif key in (Key.ctrl_l, Key.ctrl_r, Key.ctrl):
+            self.ctrl_pressed = False
+
+    def _desfeito(self):
+        novo = self.injecao.desfeito()
+        if novo:
+            self.signals.aviso.emit(f"Inserção de texto por enquanto é “{dict(MODOS_INJECAO)[novo]}”: "
+                                    "o último texto foi desfeito")
 
     def _show_popup_slot(self, x, y):
         self.search_mode  = True
@@ -870,6 +2566,9 @@ class KeyboardListener:
         self.templates_popup.move(max(px, 10), py)
         self.templates_popup.show()
         self.templates_popup.raise_()
+        if self._traco_popup:
+            self._traco_popup.fim('popup_visivel')
+            self._traco_popup = None
 
     def _update_popup_slot(self, query):
         if self.templates_popup:
@@ -881,235 +2580,892 @@ class KeyboardListener:
             self.templates_popup = None
 
     def _insert_text_slot(self, texto, chars_to_delete):
+        traco, self._traco_popup = self._traco_popup, None
+        if traco:
+            traco.marcar('slot_ui')
         self.search_mode  = False
         self.search_query = ""
-        self.typed_text   = ""
+        self.digitado.limpar()
         if self.templates_popup:
             try: self.templates_popup.close()
             except: pass
             self.templates_popup = None
 
-        def digitar():
-            try:
-                time.sleep(0.05)
-                for _ in range(chars_to_delete):
-                    self.keyboard_controller.press(Key.backspace)
-                    self.keyboard_controller.release(Key.backspace)
-                    time.sleep(0.003)
-                time.sleep(0.05)
-                linhas = texto.split('\n')
-                for i, linha in enumerate(linhas):
-                    if linha:
-                        self.keyboard_controller.type(linha)
-                    if i < len(linhas) - 1 or texto.endswith('\n'):
-                        with self.keyboard_controller.pressed(Key.shift):
-                            self.keyboard_controller.press(Key.enter)
-                            self.keyboard_controller.release(Key.enter)
-                        time.sleep(0.05)
-            except Exception as e:
-                print(f"Erro ao digitar: {e}")
-
-        t = threading.Thread(target=digitar, daemon=True)
-        t.start()
+        perfil = self._perfil()
+        self._substituir(texto, chars_to_delete, perfil, perfil.apagar_popup, traco, perfil.antes_texto)
 
     def cancel_search(self):
         self.search_mode  = False
         self.search_query = ""
-        self.typed_text   = ""
+        self.digitado.limpar()
         self.signals.close_popup.emit()
 
-    def check_text_shortcuts(self):
-        if not self.typed_text.strip():
+    def check_text_shortcuts(self, traco=None, palavra='', terminador=' '):
+        """palavra: a palavra que acabou de ser encerrada (BufferDigitacao); terminador: a
+        tecla que a encerrou, que também já chegou ao aplicativo e é apagada junto."""
+        token = palavra.strip().lower()
+        achado = self._registro().buscar(token) if token else None
+        if not achado:
+            # sem match: só o custo da busca, para comparar com o caminho que acha
+            if traco:
+                traco.fluxo = 'sem_match'
+                traco.fim('busca')
             return
-        setor = self.user_data['setor']
+        tipo, s = achado
+        n = len(palavra) + len(terminador)
+        if traco: traco.marcar('match')
+
+        if tipo == 'template':
+            # pontuação volta depois do texto; o espaço é engolido, como sempre foi
+            sufixo = terminador if terminador in _PONTUACAO_FIM else ''
+            self._apagar_e_digitar(s.texto + sufixo, n, traco, palavra + terminador)
+
+        elif tipo == 'atalho':
+            def run(acoes=s.acoes_exec, nb=n, velocidade=s.velocidade):
+                perfil = self._perfil(velocidade)
+                if traco: traco.marcar('thread')
+                for _ in range(nb):
+                    self.keyboard_controller.press(Key.backspace)
+                    self.keyboard_controller.release(Key.backspace)
+                    time.sleep(perfil.apagar)
+                if traco: traco.marcar('backspaces')
+                time.sleep(perfil.antes_texto)
+                self.execute_atalho(acoes, traco, velocidade)
+            threading.Thread(target=run, daemon=True).start()
+
+        else:  # shortcut antigo
+            perfil = self._perfil()
+            for _ in range(n):
+                self.keyboard_controller.press(Key.backspace)
+                self.keyboard_controller.release(Key.backspace)
+                time.sleep(perfil.apagar)
+            if traco: traco.marcar('backspaces')
+            self.execute_shortcut(s.acoes, traco)
 
-        # Verificar templates
-        for t in self.firebase.get_templates_setor(setor):
-            if t['atalho'] and t['atalho'].lower() == self.typed_text.strip().lower():
-                self._apagar_e_digitar(t['texto'], len(self.typed_text) + 1)
-                return
+    def check_alt_shortcuts(self, char, traco=None):
+        achado = self._registro().alt.get(char.upper())
+        if not achado:
+            return
+        tipo, s = achado
+        if traco: traco.marcar('match')
+        if tipo == 'atalho':
+            def run(acoes=s.acoes_exec, velocidade=s.velocidade):
+                time.sleep(self._perfil(velocidade).inicio)
+                self.execute_atalho(acoes, traco, velocidade)
+        else:  # shortcut antigo
+            def run(acoes=s.acoes):
+                time.sleep(self._perfil().inicio)
+                self.execute_shortcut(acoes, traco)
+        threading.Thread(target=run, daemon=True).start()
+
+    def _perfil(self, velocidade=''):
+        """Perfil de velocidade do atalho; '' usa o perfil global da configuração."""
+        config = self.firebase.config
+        return perfil_velocidade(velocidade or config.obter('velocidade'), config.obter('velocidade_fator'))
+
+    def execute_atalho(self, acoes, traco=None, velocidade=''):
+        """Executa a lista de ações estruturadas numa thread (ver ExecutorAcoes)."""
+        perfil = self._perfil(velocidade)
+        token  = TokenCancelamento()
+        execucao = ExecutorAcoes(self.keyboard_controller, self.mouse_controller,
+                                 functools.partial(self._digitar, perfil=perfil, cancelado=token),
+                                 perfil=perfil, cancelado=token)
+        def run():
+            with self._em_execucao(execucao):
+                if traco: traco.marcar('thread_acoes')
+                if token.wait(perfil.inicio):
+                    return
+                erro = execucao.executar(acoes)
+                if erro:
+                    self.signals.aviso.emit('✗ ' + erro)
+                if traco: traco.fim('acoes')
+        threading.Thread(target=run, daemon=True).start()
 
-        # Verificar novos atalhos (shortcut)
-        for s in self.firebase.get_atalhos_setor(setor):
-            if not s.get('ativo', True): continue
-            if s.get('comando_tipo') == 'shortcut':
-                if s.get('comando_valor', '').lower() == self.typed_text.strip().lower():
-                    n = len(self.typed_text) + 1
-                    def run(acoes=s['acoes'], nb=n):
-                        for _ in range(nb):
+    def _apagar_e_digitar(self, texto, n_backspaces, traco=None, apagado=''):
+        perfil = self._perfil()
+        self._substituir(texto, n_backspaces, perfil, perfil.apagar, traco, apagado=apagado)
+
+    def _substituir(self, texto, n_backspaces, perfil, intervalo, traco=None, espera=0.0, apagado=''):
+        """Numa thread: apaga n_backspaces caracteres (apagado, se conhecido) e digita texto,
+        parando no Esc/pânico. Fora do modo 'cuidadosa' tudo sai numa rajada só, sem pausas
+        entre teclas; em 'selecao' o gatilho é selecionado e o texto digitado por cima."""
+        modo = self.injecao.modo()
+
+        def run():
+            token = TokenCancelamento()
+            with self._em_execucao(token):
+                try:
+                    if traco: traco.marcar('thread')
+                    token.pausa(espera)
+                    if modo == 'cuidadosa':
+                        for _ in range(n_backspaces):
                             self.keyboard_controller.press(Key.backspace)
                             self.keyboard_controller.release(Key.backspace)
-                            time.sleep(0.01)
-                        time.sleep(0.05)
-                        self.execute_atalho(acoes)
-                    threading.Thread(target=run, daemon=True).start()
-                    return
+                            token.pausa(intervalo)
+                        if traco: traco.marcar('backspaces')
+                        token.pausa(perfil.antes_texto)
+                        self._digitar(texto, perfil, token)
+                    else:
+                        self._apagar_rajada(n_backspaces, apagado if texto and modo == 'selecao' else '')
+                        if traco: traco.marcar('backspaces')
+                        self._digitar(texto, perfil, token, rajada=True)
+                    self.injecao.inserido(modo)
+                    if traco: traco.fim('digitado')
+                except ExecucaoCancelada as e:
+                    self.signals.aviso.emit(f"✗ Digitação interrompida{': ' + str(e) if str(e) else ''}")
+                except Exception as e:
+                    print(f"Erro ao digitar: {e}")
+        threading.Thread(target=run, daemon=True).start()
 
-        # Verificar shortcuts antigos
-        for s in self.firebase.get_shortcuts_setor(setor):
-            if not s['ativo']: continue
-            tecla = s.get('tecla_atalho', '')
-            if len(tecla) > 2 and tecla.lower() == self.typed_text.strip().lower():
-                for _ in range(len(self.typed_text) + 1):
-                    self.keyboard_controller.press(Key.backspace)
-                    self.keyboard_controller.release(Key.backspace)
-                    time.sleep(0.01)
-                self.execute_shortcut(s['acoes'])
-                return
+    def _apagar_rajada(self, n, apagado=''):
+        """Apaga n caracteres sem pausas. Com apagado (modo 'selecao'), Shift+← n vezes
+        seleciona exatamente o gatilho e o texto digitado em seguida o substitui; sem texto a
+        digitar, backspaces. Nunca Ctrl+Shift+←: onde a palavra começa depende do aplicativo."""
+        kb = self.keyboard_controller
+        if apagado:
+            with kb.pressed(Key.shift):
+                for _ in range(n):
+                    kb.press(Key.left); kb.release(Key.left)
+        else:
+            for _ in range(n):
+                kb.press(Key.backspace); kb.release(Key.backspace)
+
+    _BLOCO_DIGITACAO = 16  # caracteres digitados entre uma checagem de cancelamento e outra
+
+    def _digitar(self, texto, perfil=None, cancelado=None, rajada=False):
+        """Digita na thread atual; quebras de linha viram Shift+Enter. Com cancelado
+        (TokenCancelamento), para entre blocos de caracteres com ExecucaoCancelada.
+        rajada=True tira a pausa depois de cada quebra de linha."""
+        pausa  = 0 if rajada else (perfil or PERFIS_VELOCIDADE['normal']).quebra_linha
+        dormir = cancelado.pausa if cancelado else time.sleep
+        feitos = 0
+        linhas = texto.split('\n')
+        try:
+            for i, linha in enumerate(linhas):
+                for j in range(0, len(linha), self._BLOCO_DIGITACAO):
+                    if cancelado and cancelado.is_set():
+                        raise ExecucaoCancelada()
+                    bloco = linha[j:j + self._BLOCO_DIGITACAO]
+                    self.keyboard_controller.type(bloco)
+                    feitos += len(bloco)
+                if i < len(linhas) - 1 or texto.endswith('\n'):
+                    with self.keyboard_controller.pressed(Key.shift):
+                        self.keyboard_controller.press(Key.enter)
+                        self.keyboard_controller.release(Key.enter)
+                    feitos += 1
+                    if pausa:
+                        dormir(pausa)
+        except ExecucaoCancelada:
+            raise ExecucaoCancelada(f"{feitos} de {len(texto)} caracteres digitados") from None
 
-    def check_alt_shortcuts(self, char):
-        setor = self.user_data['setor']
+    def execute_shortcut(self, acoes, traco=None):
+        """Shortcuts antigos: as ações são convertidas e rodam no mesmo motor dos atalhos. No
+        perfil normal continuam com os tempos de antes (PERFIL_LEGADO)."""
+        legado = self.firebase.config.obter('velocidade') == 'normal'
+        self.execute_atalho(_converter_acoes_antigas(acoes), traco, velocidade='legado' if legado else '')
 
-        # Verificar novos atalhos (alt_tecla)
-        for s in self.firebase.get_atalhos_setor(setor):
-            if not s.get('ativo', True): continue
-            if s.get('comando_tipo') == 'alt_tecla':
-                teclas = [t.strip() for t in s.get('comando_valor', '').split(',')]
-                if any(t.upper() == char.upper() for t in teclas):
-                    def run(acoes=s['acoes']):
-                        time.sleep(0.1)
-                        self.execute_atalho(acoes)
-                    threading.Thread(target=run, daemon=True).start()
-                    return
 
-        # Verificar shortcuts antigos
-        for s in self.firebase.get_shortcuts_setor(setor):
-            if not s['ativo']: continue
-            tecla = s.get('tecla_atalho', '')
-            if len(tecla) <= 2 and tecla.upper() == char.upper():
-                def run(acoes=s['acoes']):
-                    time.sleep(0.1)
-                    self.execute_shortcut(acoes)
-                threading.Thread(target=run, daemon=True).start()
+# ---------------------------------------------------------------------------
+# Perfis de velocidade  — todos os atrasos implícitos da digitação e das ações
+# ---------------------------------------------------------------------------
+PerfilVelocidade = namedtuple('PerfilVelocidade', [
+    'inicio',        # antes de começar a executar um atalho
+    'apagar',        # entre backspaces que apagam o gatilho digitado
+    'apagar_popup',  # entre backspaces que apagam a busca do popup
+    'antes_texto',   # depois de apagar, antes de digitar
+    'quebra_linha',  # depois de cada Shift+Enter
+    'entre_acoes',   # depois de cada ação
+    'mover',         # depois de posicionar o mouse
+    'clique',        # entre cliques repetidos
+    'arraste',       # no arraste, entre apertar o botão e mover
+    'seta',          # entre setas repetidas
+    'pegar',         # no arraste, entre posicionar o mouse e apertar o botão
+    'soltar',        # no arraste, entre chegar ao destino e soltar o botão
+])
+
+PERFIS_VELOCIDADE = {
+    'turbo':  PerfilVelocidade(0.02, 0.002, 0.001, 0.01, 0.01, 0.01, 0.01, 0.02, 0.02, 0.005, 0.01, 0.02),
+    'normal': PerfilVelocidade(0.1,  0.01,  0.003, 0.05, 0.05, 0.05, 0.05, 0.08, 0.08, 0.03,  0.05, 0.08),
+    'seguro': PerfilVelocidade(0.3,  0.03,  0.01,  0.15, 0.15, 0.15, 0.15, 0.2,  0.2,  0.08,  0.15, 0.2),
+}
+# shortcuts antigos no perfil normal: os tempos fixos que o execute_shortcut usava antes dos perfis
+PERFIL_LEGADO = PERFIS_VELOCIDADE['normal']._replace(mover=0.0, clique=0.1, pegar=0.1, arraste=0.05, soltar=0.1)
+NOMES_VELOCIDADE = [('turbo', 'Turbo'), ('normal', 'Normal'), ('seguro', 'Seguro'), ('calibrado', 'Calibrado')]
+
+
+def perfil_velocidade(nome, fator_calibrado=1.0):
+    """'calibrado' é o perfil normal multiplicado pelo fator achado por calibrar_velocidade."""
+    if nome == 'calibrado':
+        return PerfilVelocidade(*(v * fator_calibrado for v in PERFIS_VELOCIDADE['normal']))
+    if nome == 'legado':
+        return PERFIL_LEGADO
+    return PERFIS_VELOCIDADE.get(nome, PERFIS_VELOCIDADE['normal'])
+
+
+_TEXTO_CALIBRACAO   = 'calibracao0123456789'
+_FATORES_CALIBRACAO = (1.0, 0.5, 0.25, 0.12, 0.06)  # do mais lento ao mais rápido
+
+
+class CampoOcupado(Exception):
+    """O campo focado já tinha texto: a calibração não roda para não apagá-lo."""
+
+
+def calibrar_velocidade(kb, ler_texto, limpar_copia, tentativas=2):
+    """Acha o fator mais rápido que o campo de texto focado aguenta. Antes confere (seleciona
+    tudo e copia) que o campo está vazio, senão levanta CampoOcupado. Para cada fator digita o
+    texto de teste, apaga o final com backspaces, redigita, seleciona tudo, copia e confere
+    com ler_texto() o que chegou; depois limpa o campo. Devolve o menor fator que passou em
+    todas as tentativas, com 50% de folga, ou None se nem o perfil normal passou.
+    ler_texto/limpar_copia leem e esvaziam a área de transferência."""
+    def ctrl(c):
+        with kb.pressed(Key.ctrl):
+            kb.press(c); kb.release(c)
+
+    def copiar():
+        limpar_copia()
+        ctrl('a'); ctrl('c')
+        time.sleep(0.15)  # o tempo da cópia não faz parte do que está sendo medido
+        return ler_texto()
+
+    if copiar():
+        kb.press(Key.right); kb.release(Key.right)  # desfaz a seleção sem mexer no texto
+        raise CampoOcupado()
+    esperado = _TEXTO_CALIBRACAO[:-6] + 'XYZ'
+    melhor = None
+    for fator in _FATORES_CALIBRACAO:
+        p = perfil_velocidade('calibrado', fator)
+        for _ in range(tentativas):
+            ctrl('a'); kb.press(Key.delete); kb.release(Key.delete)
+            time.sleep(p.antes_texto)
+            kb.type(_TEXTO_CALIBRACAO)
+            time.sleep(p.entre_acoes)
+            for _ in range(6):
+                kb.press(Key.backspace); kb.release(Key.backspace)
+                time.sleep(p.apagar)
+            time.sleep(p.antes_texto)
+            kb.type('XYZ')
+            time.sleep(p.entre_acoes)
+            ok = copiar() == esperado
+            ctrl('a'); kb.press(Key.delete); kb.release(Key.delete)
+            if not ok:
+                return min(1.0, melhor * 1.5) if melhor else None
+        melhor = fator
+    return min(1.0, melhor * 1.5)
+
+
+# ---------------------------------------------------------------------------
+# ExecutorAcoes  — motor das ações dos atalhos
+# ---------------------------------------------------------------------------
+class ExecucaoCancelada(Exception):
+    pass
+
+
+TECLAS_PANICO = [('pause', 'Pause'), ('scroll_lock', 'Scroll Lock'), ('f12', 'F12'), ('insert', 'Insert')]
+
+
+class TokenCancelamento(threading.Event):
+    """Sinal de parada de uma execução; fica em KeyboardListener._execucoes para o Esc e
+    a tecla de pânico o acharem. As esperas passam por pausa(), que acorda na hora."""
+
+    def cancelar(self):
+        self.set()
+
+    def tecla_pressionada(self, nome):
+        return False
+
+    def pausa(self, segundos):
+        if self.wait(segundos):
+            raise ExecucaoCancelada()
+
+
+def _e_altgr(key, ctrl_apertado):
+    """AltGr. No Windows chega como um Ctrl_L sintético seguido de Alt_R, e o pynput usa o
+    mesmo valor para alt_r e alt_gr: lá só é AltGr com o Ctrl apertado."""
+    if key != Key.alt_gr:
+        return False
+    return Key.alt_gr is not Key.alt_r or ctrl_apertado
+
+
+def _nome_tecla(key):
+    """Nome usado nos blocos esperar_tecla/se_tecla: o caractere ('x') ou o nome da tecla
+    do pynput sem o lado ('alt', 'ctrl', 'enter', 'f5'…)."""
+    char = getattr(key, 'char', None)
+    if char:
+        return char.lower()
+    nome = getattr(key, 'name', '') or ''
+    for lado in ('_l', '_r', '_gr'):
+        if nome.endswith(lado):
+            return nome[:-len(lado)]
+    return nome
+
+
+_LADO_ASSINATURA  = 8   # a região vira uma miniatura 8×8 em tons de cinza
+_DIFERENCA_CELULA = 24  # tons de diferença para uma célula da miniatura contar como mudada
+
+
+def _regiao_fisica(x, y, w, h):
+    """Retângulo em coordenadas lógicas do Qt → pixels físicos, pela escala (125%, 150%…)
+    da tela que contém o centro dele. O Qt mantém a origem de cada tela em pixels físicos."""
+    tela = QApplication.screenAt(QPoint(x + w // 2, y + h // 2)) or QApplication.primaryScreen()
+    g, escala = tela.geometry(), tela.devicePixelRatio()
+    return (round(g.x() + (x - g.x()) * escala), round(g.y() + (y - g.y()) * escala),
+            max(1, round(w * escala)), max(1, round(h * escala)))
+
+
+def _assinatura_regiao(x, y, w, h):
+    """Miniatura 8×8 em tons de cinza da região da tela, em hex. Barata de capturar e de
+    comparar, e pega tanto mudança de conteúdo quanto de cor (ex.: botão que fica ativo).
+    Com o mss só a região é copiada da tela; sem ele o ImageGrab copia a área de trabalho
+    inteira e recorta."""
+    from PIL import Image
+    esq, topo, larg, alt = _regiao_fisica(x, y, w, h)
+    try:
+        import mss
+    except ImportError:
+        from PIL import ImageGrab
+        img = ImageGrab.grab(bbox=(esq, topo, esq + larg, topo + alt), all_screens=True)
+    else:
+        with mss.mss() as sct:
+            shot = sct.grab({'left': esq, 'top': topo, 'width': larg, 'height': alt})
+        img = Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+    return img.convert('L').resize((_LADO_ASSINATURA, _LADO_ASSINATURA), Image.BOX).tobytes().hex()
+
+
+def _diferenca_assinaturas(a, b):
+    """Quantas células das duas miniaturas diferem mais que _DIFERENCA_CELULA tons."""
+    return sum(abs(p - q) > _DIFERENCA_CELULA for p, q in zip(bytes.fromhex(a), bytes.fromhex(b)))
+
+
+class ExecutorAcoes:
+    """Executa a lista de ações de um atalho. Além das ações simples (click, arraste, tecla,
+    digitar, template, esperar), entende blocos com ações aninhadas:
+        {'tipo': 'repetir', 'vezes': 3, 'acoes': [...]}
+        {'tipo': 'esperar_tecla', 'tecla': 'alt', 'ms': 0, 'acoes': [...], 'senao': [...]}
+            espera a tecla (ms=0: sem limite) e segue por 'acoes'; se o tempo acabar, por 'senao'
+        {'tipo': 'se_tecla', 'tecla': 'x', 'ms': 1500, 'acoes': [...], 'senao': [...]}
+            'acoes' se a tecla for pressionada em até ms, senão 'senao'
+    e a espera adaptativa:
+        {'tipo': 'aguardar_tela', 'x', 'y', 'w', 'h', 'modo': 'mudar' | 'igual', 'referencia': hex,
+         'ms': 10000, 'tolerancia': 2, 'ao_expirar': 'parar' | 'seguir'}
+            olha a região até ela mudar (ou ficar igual à referência capturada no editor)
+    cancelar() interrompe na próxima ação ou no meio de qualquer espera; executar() devolve
+    onde parou."""
+    MAX_VEZES        = 1000
+    MAX_PROFUNDIDADE = 8
+    _SE_TECLA_MS     = 1500  # se_tecla sem 'ms'
+    _INTERVALO_TELA  = 0.05  # entre capturas do aguardar_tela
+
+    def __init__(self, keyboard_controller, mouse_controller, digitar, capturar=None, perfil=None,
+                 cancelado=None):
+        self.keyboard_controller = keyboard_controller
+        self.mouse_controller    = mouse_controller
+        self.digitar     = digitar  # digitar(texto), síncrono
+        self.perfil      = perfil or PERFIS_VELOCIDADE['normal']
+        self.capturar    = capturar or _assinatura_regiao  # capturar(x, y, w, h) → assinatura
+        self._cancelado  = cancelado or TokenCancelamento()
+        self._lock       = threading.Lock()
+        self._aguardando = None   # nome da tecla que um bloco está esperando
+        self._recebida   = threading.Event()
+        self.posicao, self.total, self.tipo_atual = 0, 0, ''  # progresso no nível de cima
+
+    def cancelar(self):
+        self._cancelado.set()
+
+    def tecla_pressionada(self, nome):
+        """Chamado pelo listener de teclado; True se era a tecla aguardada."""
+        with self._lock:
+            if self._aguardando is None or nome != self._aguardando:
+                return False
+            self._aguardando = None
+        self._recebida.set()
+        return True
+
+    def executar(self, acoes):
+        """None se tudo rodou; senão a mensagem de onde e por que parou."""
+        self.posicao, self.total = 0, len(acoes)
+        try:
+            self._executar(acoes, 0)
+            return None
+        except ExecucaoCancelada as e:
+            msg = f"Atalho cancelado {self.parcial()}" + (f": {e}" if str(e) else '')
+        except Exception as e:
+            msg = f"Erro ao executar atalho {self.parcial()}: {e}"
+        return msg
+
+    def parcial(self):
+        return f"na ação {self.posicao} de {self.total} ({self.tipo_atual or '-'})"
+
+    def _pausa(self, segundos):
+        if self._cancelado.wait(segundos):
+            raise ExecucaoCancelada()
+
+    def _agora(self):
+        return time.monotonic()
+
+    def _executar(self, acoes, profundidade):
+        if profundidade > self.MAX_PROFUNDIDADE:
+            raise ValueError("blocos aninhados demais")
+        for i, acao in enumerate(acoes):
+            if self._cancelado.is_set():
+                raise ExecucaoCancelada()
+            tipo = acao.get('tipo', '')
+            if profundidade == 0:
+                self.posicao, self.tipo_atual = i + 1, tipo
+            if tipo == 'repetir':
+                for _ in range(max(0, min(int(acao.get('vezes', 1)), self.MAX_VEZES))):
+                    self._executar(acao.get('acoes', []), profundidade + 1)
+            elif tipo in ('esperar_tecla', 'se_tecla'):
+                padrao = 0 if tipo == 'esperar_tecla' else self._SE_TECLA_MS
+                veio = self._aguardar_tecla(str(acao.get('tecla', '')).lower(), int(acao.get('ms', padrao)))
+                self._executar(acao.get('acoes' if veio else 'senao', []), profundidade + 1)
+            else:
+                self._executar_simples(tipo, acao)
+            self._pausa(self.perfil.entre_acoes)
+
+    def _aguardar_tecla(self, nome, ms):
+        """True se a tecla veio; False se ms > 0 e o tempo acabou."""
+        self._recebida.clear()
+        with self._lock:
+            self._aguardando = nome
+        limite = self._agora() + ms / 1000.0 if ms > 0 else None
+        try:
+            while True:
+                restante = 0.1 if limite is None else min(0.1, limite - self._agora())
+                if restante <= 0:
+                    return False
+                if self._recebida.wait(restante):
+                    return True
+                if self._cancelado.is_set():
+                    raise ExecucaoCancelada()
+        finally:
+            with self._lock:
+                self._aguardando = None
+
+    def _executar_simples(self, tipo, acao):
+        kb, ms, p = self.keyboard_controller, self.mouse_controller, self.perfil
+        if tipo == 'click':
+            x, y = acao.get('x'), acao.get('y')
+            if x is not None and y is not None:
+                ms.position = (x, y)
+                self._pausa(p.mover)
+            botao = acao.get('botao', 'E')
+            qtd   = acao.get('qtd', 1)
+            btn   = Button.left if botao == 'E' else (Button.right if botao == 'D' else Button.middle)
+            for _ in range(qtd):
+                ms.click(btn, 1)
+                if qtd > 1: self._pausa(p.clique)
+        elif tipo == 'arraste':
+            x1, y1 = acao.get('x1'), acao.get('y1')
+            x2, y2 = acao.get('x2'), acao.get('y2')
+            if all(v is not None for v in [x1, y1, x2, y2]):
+                ms.position = (x1, y1)
+                self._pausa(p.pegar)
+                ms.press(Button.left)
+                try:
+                    self._pausa(p.arraste)
+                    ms.position = (x2, y2)
+                    self._pausa(p.soltar)
+                finally:
+                    ms.release(Button.left)  # nunca deixar o botão preso, mesmo cancelando
+        elif tipo == 'tecla':
+            tecla = acao.get('tecla', '')
+            if tecla == 'seta':
+                seta_map = {'Cima': Key.up, 'Baixo': Key.down, 'Esquerda': Key.left, 'Direita': Key.right}
+                k = seta_map.get(acao.get('seta', ''))
+                if k:
+                    for _ in range(acao.get('qtd', 1)):
+                        kb.press(k)
+                        kb.release(k)
+                        self._pausa(p.seta)
+            elif tecla in ('backspace', 'delete', 'tab', 'enter'):
+                k = getattr(Key, tecla)
+                kb.press(k); kb.release(k)
+            elif tecla in ('ctrl+c', 'ctrl+v', 'ctrl+x'):
+                with kb.pressed(Key.ctrl): kb.press(tecla[-1]); kb.release(tecla[-1])
+            texto = acao.get('texto', '')
+            if texto:
+                self.digitar(texto)
+        elif tipo in ('template', 'digitar'):
+            texto = acao.get('texto', '')
+            if texto:
+                self.digitar(texto)
+        elif tipo == 'esperar':
+            self._pausa(acao.get('ms', 0) / 1000.0)
+        elif tipo == 'aguardar_tela':
+            self._aguardar_tela(acao)
+
+    def _aguardar_tela(self, acao):
+        x, y, w, h = (int(acao[k]) for k in ('x', 'y', 'w', 'h'))
+        igual = acao.get('modo') == 'igual'
+        referencia = acao.get('referencia') if igual else self.capturar(x, y, w, h)
+        if not referencia:
+            return
+        tolerancia = acao.get('tolerancia', 2)
+        limite = self._agora() + acao.get('ms', 10000) / 1000.0
+        while self._agora() < limite:
+            if (_diferenca_assinaturas(self.capturar(x, y, w, h), referencia) <= tolerancia) == igual:
                 return
+            self._pausa(self._INTERVALO_TELA)
+        if acao.get('ao_expirar') != 'seguir':
+            raise ExecucaoCancelada(f"a tela não {'ficou como a captura' if igual else 'mudou'} em {acao.get('ms', 10000)} ms")
 
-    def execute_atalho(self, acoes):
-        """Executa lista de ações no formato estruturado (dicts com tipo, x, y, etc)."""
-        def run():
-            try:
-                time.sleep(0.1)
-                for acao in acoes:
-                    # suporte a formato antigo (string) e novo (dict)
-                    if isinstance(acao, str):
-                        import re
-                        m = re.match(r'Clicar com o bot[aã]o E (\d+) vez', acao)
-                        if m:
-                            for _ in range(int(m.group(1))): self.mouse_controller.click(Button.left, 1); time.sleep(0.08)
-                        elif re.search(r'bot[aã]o D\.', acao): self.mouse_controller.click(Button.right, 1)
-                        elif re.search(r'bot[aã]o do meio\.', acao): self.mouse_controller.click(Button.middle, 1)
-                        elif re.match(r'Esperar (\d+) ms', acao): time.sleep(int(re.match(r'Esperar (\d+) ms', acao).group(1)) / 1000.0)
-                        time.sleep(0.05)
-                        continue
-                    tipo = acao.get('tipo', '')
-                    if tipo == 'click':
-                        x, y = acao.get('x'), acao.get('y')
-                        if x is not None and y is not None:
-                            self.mouse_controller.position = (x, y)
-                            time.sleep(0.05)
-                        botao = acao.get('botao', 'E')
-                        qtd   = acao.get('qtd', 1)
-                        btn   = Button.left if botao == 'E' else (Button.right if botao == 'D' else Button.middle)
-                        for _ in range(qtd):
-                            self.mouse_controller.click(btn, 1)
-                            if qtd > 1: time.sleep(0.08)
-                    elif tipo == 'arraste':
-                        x1, y1 = acao.get('x1'), acao.get('y1')
-                        x2, y2 = acao.get('x2'), acao.get('y2')
-                        if all(v is not None for v in [x1, y1, x2, y2]):
-                            self.mouse_controller.position = (x1, y1)
-                            time.sleep(0.05)
-                            self.mouse_controller.press(Button.left)
-                            time.sleep(0.08)
-                            self.mouse_controller.position = (x2, y2)
-                            time.sleep(0.08)
-                            self.mouse_controller.release(Button.left)
-                    elif tipo == 'tecla':
-                        tecla = acao.get('tecla', '')
-                        if tecla == 'seta':
-                            seta_map = {'Cima': Key.up, 'Baixo': Key.down, 'Esquerda': Key.left, 'Direita': Key.right}
-                            k = seta_map.get(acao.get('seta', ''))
-                            if k:
-                                for _ in range(acao.get('qtd', 1)):
-                                    self.keyboard_controller.press(k)
-                                    self.keyboard_controller.release(k)
-                                    time.sleep(0.03)
-                        elif tecla == 'backspace':
-                            self.keyboard_controller.press(Key.backspace); self.keyboard_controller.release(Key.backspace)
-                        elif tecla == 'delete':
-                            self.keyboard_controller.press(Key.delete); self.keyboard_controller.release(Key.delete)
-                        elif tecla == 'tab':
-                            self.keyboard_controller.press(Key.tab); self.keyboard_controller.release(Key.tab)
-                        elif tecla == 'ctrl+c':
-                            with self.keyboard_controller.pressed(Key.ctrl): self.keyboard_controller.press('c'); self.keyboard_controller.release('c')
-                        elif tecla == 'ctrl+v':
-                            with self.keyboard_controller.pressed(Key.ctrl): self.keyboard_controller.press('v'); self.keyboard_controller.release('v')
-                        elif tecla == 'ctrl+x':
-                            with self.keyboard_controller.pressed(Key.ctrl): self.keyboard_controller.press('x'); self.keyboard_controller.release('x')
-                        texto = acao.get('texto', '')
-                        if texto:
-                            self._apagar_e_digitar(texto, 0)
-                            time.sleep(0.1 + len(texto) * 0.01)
-                    elif tipo == 'template':
-                        texto = acao.get('texto', '')
-                        if texto:
-                            self._apagar_e_digitar(texto, 0)
-                            time.sleep(0.1 + len(texto) * 0.01)
-                    elif tipo == 'esperar':
-                        time.sleep(acao.get('ms', 0) / 1000.0)
-                    time.sleep(0.05)
-            except Exception as e:
-                print(f"Erro ao executar atalho: {e}")
-        threading.Thread(target=run, daemon=True).start()
 
-    def _apagar_e_digitar(self, texto, n_backspaces):
-        def run():
-            for _ in range(n_backspaces):
-                self.keyboard_controller.press(Key.backspace)
-                self.keyboard_controller.release(Key.backspace)
-                time.sleep(0.01)
-            time.sleep(0.05)
-            linhas = texto.split('\n')
-            for i, linha in enumerate(linhas):
-                if linha:
-                    self.keyboard_controller.type(linha)
-                if i < len(linhas) - 1 or texto.endswith('\n'):
-                    with self.keyboard_controller.pressed(Key.shift):
-                        self.keyboard_controller.press(Key.enter)
-                        self.keyboard_controller.release(Key.enter)
-                    time.sleep(0.05)
-        threading.Thread(target=run, daemon=True).start()
+# ---------------------------------------------------------------------------
+# ExecutorSimulado  — roda ações sem mexer no mouse nem no teclado
+# ---------------------------------------------------------------------------
+EventoSimulado    = namedtuple('EventoSimulado', 't dispositivo acao detalhe')  # t em segundos virtuais
+ResultadoSimulado = namedtuple('ResultadoSimulado', 'duracao eventos erro')
+
+_SIM_POR_CARACTERE = 0.001  # s; estimativa do que o pynput leva para injetar cada caractere
+
+
+class ControladorSimulado:
+    """Faz as vezes dos controllers do pynput: anota cada chamada no relógio virtual do executor."""
+
+    def __init__(self, executor, dispositivo):
+        self._executor    = executor
+        self._dispositivo = dispositivo
+        self._posicao     = (0, 0)
+
+    def _anotar(self, acao, detalhe=''):
+        self._executor.eventos.append(EventoSimulado(self._executor.relogio, self._dispositivo, acao, detalhe))
+
+    @property
+    def position(self):
+        return self._posicao
+
+    @position.setter
+    def position(self, xy):
+        self._posicao = tuple(xy)
+        self._anotar('mover', self._posicao)
+
+    def press(self, k):
+        self._anotar('press', _nome_tecla(k) or str(k))
+
+    def release(self, k):
+        self._anotar('release', _nome_tecla(k) or str(k))
+
+    def click(self, botao, n=1):
+        self._anotar('click', (_nome_tecla(botao) or str(botao), n, self._posicao))
+
+    def scroll(self, dx, dy):
+        self._anotar('scroll', (dx, dy))
+
+    def type(self, texto):
+        self._anotar('type', texto)
+        self._executor.relogio += len(texto) * _SIM_POR_CARACTERE
+
+    @contextlib.contextmanager
+    def pressed(self, *teclas):
+        for k in teclas:
+            self.press(k)
+        try:
+            yield
+        finally:
+            for k in reversed(teclas):
+                self.release(k)
+
+
+class ExecutorSimulado(ExecutorAcoes):
+    """ExecutorAcoes com relógio virtual: as pausas só somam tempo e os controllers só anotam
+    eventos, então validar e cronometrar milhares de atalhos leva milissegundos.
+        teclas:  teclas que "chegam" nos blocos esperar_tecla/se_tecla (None = todas, na hora)
+        tela_ms: quanto a tela leva para satisfazer um aguardar_tela"""
+
+    def __init__(self, perfil=None, teclas=None, tela_ms=0):
+        _carregar_pynput()
+        super().__init__(ControladorSimulado(self, 'teclado'), ControladorSimulado(self, 'mouse'),
+                         self._digitar, perfil=perfil)
+        self.teclas  = None if teclas is None else {t.lower() for t in teclas}
+        self.tela_ms = tela_ms
+        self.relogio = 0.0
+        self.eventos = []
+
+    def simular(self, acoes):
+        """Roda acoes do zero; duracao inclui a espera inicial do execute_atalho."""
+        self.relogio, self.eventos = self.perfil.inicio, []
+        self.posicao, self.total = 0, len(acoes)
+        erro = ''
+        try:
+            self._executar(acoes, 0)
+        except ExecucaoCancelada as e:
+            erro = str(e) or 'cancelado'
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+        return ResultadoSimulado(self.relogio, self.eventos, erro)
+
+    def _pausa(self, segundos):
+        if self._cancelado.is_set():
+            raise ExecucaoCancelada()
+        self.relogio += max(0.0, segundos)
+
+    def _agora(self):
+        return self.relogio
+
+    def _digitar(self, texto):
+        # mesmo caminho do KeyboardListener._digitar, com a pausa do perfil
+        kb = self.keyboard_controller
+        linhas = texto.split('\n')
+        for i, linha in enumerate(linhas):
+            if linha:
+                kb.type(linha)
+            if i < len(linhas) - 1 or texto.endswith('\n'):
+                with kb.pressed(Key.shift):
+                    kb.press(Key.enter)
+                    kb.release(Key.enter)
+                self._pausa(self.perfil.quebra_linha)
+
+    def _aguardar_tecla(self, nome, ms):
+        if self.teclas is None or nome in self.teclas:
+            self.eventos.append(EventoSimulado(self.relogio, 'usuario', 'tecla', nome))
+            return True
+        if ms <= 0:
+            raise ExecucaoCancelada(f"esperaria para sempre pela tecla {nome!r}")
+        self._pausa(ms / 1000.0)
+        return False
+
+    def _aguardar_tela(self, acao):
+        ms = acao.get('ms', 10000)
+        self.eventos.append(EventoSimulado(self.relogio, 'tela', 'aguardar',
+                                           (acao.get('x'), acao.get('y'), acao.get('w'), acao.get('h'))))
+        if self.tela_ms <= ms:
+            self._pausa(self.tela_ms / 1000.0)
+            return
+        self._pausa(ms / 1000.0)
+        if acao.get('ao_expirar') != 'seguir':
+            raise ExecucaoCancelada(f"a tela não respondeu em {ms} ms")
+
+
+def simular_atalhos(atalhos, velocidade='normal', fator_calibrado=1.0, **opcoes):
+    """[(título, duração em s, erro)] de Atalho/ShortcutAntigo (ou dicts com os mesmos
+    campos), do mais lento ao mais rápido. Cada um usa o próprio perfil de velocidade
+    quando tem um e o perfil global (velocidade, com o fator do 'calibrado') quando não tem,
+    como execute_atalho/execute_shortcut fariam."""
+    executores = {}
+    saida = []
+    for a in atalhos:
+        acoes = _compilar_acoes(_carregar_acoes(a.get('acoes', [])))
+        nome = a.get('velocidade') or velocidade
+        if acoes and 'type' in acoes[0]:
+            acoes = _converter_acoes_antigas(acoes)
+            if nome == 'normal':
+                nome = 'legado'
+        if nome not in executores:
+            executores[nome] = ExecutorSimulado(perfil_velocidade(nome, fator_calibrado), **opcoes)
+        r = executores[nome].simular(acoes)
+        saida.append((a.get('titulo') or a.get('nome', ''), r.duracao, r.erro))
+    saida.sort(key=lambda t: -t[1])
+    return saida
+
+
+def relatorio_simulacao(resultados, mais_lentos=10):
+    """Texto do resultado de simular_atalhos: os que param com erro e os mais lentos."""
+    erros  = [(t, e) for t, _, e in resultados if e]
+    lentos = [(t, d) for t, d, e in resultados if not e][:mais_lentos]
+    linhas = []
+    if erros:
+        linhas.append(f"Com erro ({len(erros)}):")
+        linhas += [f"  {t or '(sem nome)'}: {e}" for t, e in erros]
+    if lentos:
+        linhas.append("Mais lentos:")
+        linhas += [f"  {t or '(sem nome)'}: {d:.2f} s" for t, d in lentos]
+    return '\n'.join(linhas) or "Nenhum atalho para verificar."
+
+
+def _converter_acoes_antigas(acoes):
+    """Ações do formato antigo dos shortcuts ('type': click/right_click/drag/type/sleep) →
+    formato do ExecutorAcoes."""
+    novas = []
+    for a in acoes:
+        t = a.get('type')
+        if t in ('click', 'right_click'):
+            novas.append({'tipo': 'click', 'x': a['x'], 'y': a['y'],
+                          'botao': 'E' if t == 'click' else 'D', 'qtd': a.get('vezes', 1)})
+        elif t == 'drag':
+            novas.append({'tipo': 'arraste', 'x1': a['x1'], 'y1': a['y1'], 'x2': a['x2'], 'y2': a['y2']})
+        elif t == 'type':
+            novas.append({'tipo': 'digitar', 'texto': a.get('text', '')})
+        elif t == 'sleep':
+            novas.append({'tipo': 'esperar', 'ms': a.get('ms', 0)})
+    return novas
 
-    def execute_shortcut(self, acoes):
-        def run():
-            try:
-                time.sleep(0.1)
-                for acao in acoes:
-                    if acao['type'] == 'click':
-                        vezes = acao.get('vezes', 1)
-                        self.mouse_controller.position = (acao['x'], acao['y'])
-                        for _ in range(vezes):
-                            self.mouse_controller.click(Button.left, 1)
-                            if vezes > 1: time.sleep(0.1)
-                    elif acao['type'] == 'right_click':
-                        self.mouse_controller.position = (acao['x'], acao['y'])
-                        self.mouse_controller.click(Button.right, 1)
-                    elif acao['type'] == 'drag':
-                        self.mouse_controller.position = (acao['x1'], acao['y1'])
-                        time.sleep(0.1)
-                        self.mouse_controller.press(Button.left)
-                        time.sleep(0.05)
-                        self.mouse_controller.position = (acao['x2'], acao['y2'])
-                        time.sleep(0.1)
-                        self.mouse_controller.release(Button.left)
-                    elif acao['type'] == 'type':
-                        self._apagar_e_digitar(acao['text'], 0)
-                        time.sleep(0.1 + len(acao['text']) * 0.01)
-                    elif acao['type'] == 'sleep':
-                        time.sleep(acao['ms'] / 1000.0)
-                    time.sleep(0.05)
-            except Exception as e:
-                print(f"Erro ao executar ações: {e}")
-        threading.Thread(target=run, daemon=True).start()
+
+# ---------------------------------------------------------------------------
+# GravadorMacro  — modo "Aprender" do editor de atalhos
+# ---------------------------------------------------------------------------
+# ligado enquanto uma gravação acontece: o KeyboardListener não expande nada,
+# senão o texto injetado pela expansão entraria na gravação
+gravacao_ativa = threading.Event()
+
+_SETAS_GRAVACAO = {'up': 'Cima', 'down': 'Baixo', 'left': 'Esquerda', 'right': 'Direita'}
+_TECLAS_GRAVACAO = {'backspace': 'backspace', 'delete': 'delete', 'tab': 'tab', 'enter': 'enter'}
+_CTRL_GRAVACAO = {'c': 'ctrl+c', 'v': 'ctrl+v', 'x': 'ctrl+x',
+                  '\x03': 'ctrl+c', '\x16': 'ctrl+v', '\x18': 'ctrl+x'}  # Windows entrega o caractere de controle
+
+
+class GravadorMacro:
+    """Grava cliques, arrastes e teclas com listeners do pynput até o Alt ser pressionado
+    e entrega a gravação já compactada no formato de ações do atalho. AltGr não para a
+    gravação: os caracteres compostos com ele (/, @, {…) são gravados como texto."""
+
+    def __init__(self, ao_terminar, templates=()):
+        self.ao_terminar = ao_terminar  # callback(acoes), chamado da thread do pynput
+        self.templates   = templates
+        self.eventos     = []  # ('mouse', t, pressionado, x, y, botao) | ('char', t, c) | ('tecla', t, nome)
+        self._ctrl       = False
+        self._altgr      = False
+        self._listeners  = []
+
+    def iniciar(self):
+        _carregar_pynput()
+        from pynput import mouse as _mouse
+        self.eventos = []
+        gravacao_ativa.set()
+        self._listeners = [_mouse.Listener(on_click=self._on_click),
+                           keyboard.Listener(on_press=self._on_press, on_release=self._on_release)]
+        for l in self._listeners:
+            l.start()
+
+    def parar(self):
+        gravacao_ativa.clear()
+        for l in self._listeners:
+            l.stop()
+        self._listeners = []
+        return _compactar_gravacao(self.eventos, self.templates)
+
+    def _on_click(self, x, y, button, pressed):
+        botao = 'E' if button == Button.left else ('D' if button == Button.right else 'M')
+        self.eventos.append(('mouse', time.monotonic(), pressed, int(x), int(y), botao))
+
+    def _on_press(self, key):
+        agora = time.monotonic()
+        if _e_altgr(key, self._ctrl):
+            self._altgr = True
+            return
+        if key in (Key.alt_l, Key.alt_r, Key.alt):
+            self.ao_terminar(self.parar())
+            return False
+        if key in (Key.ctrl_l, Key.ctrl_r, Key.ctrl):
+            self._ctrl = True
+            return
+        char = getattr(key, 'char', None)
+        if char is not None:
+            if self._ctrl and not self._altgr:
+                if char.lower() in _CTRL_GRAVACAO:
+                    self.eventos.append(('tecla', agora, _CTRL_GRAVACAO[char.lower()]))
+            else:
+                self.eventos.append(('char', agora, char))
+            return
+        nome = getattr(key, 'name', '')
+        if nome == 'space':
+            self.eventos.append(('char', agora, ' '))
+        elif nome in _SETAS_GRAVACAO:
+            self.eventos.append(('tecla', agora, 'seta:' + _SETAS_GRAVACAO[nome]))
+        elif nome in _TECLAS_GRAVACAO:
+            self.eventos.append(('tecla', agora, _TECLAS_GRAVACAO[nome]))
+
+    def _on_release(self, key):
+        if key in (Key.ctrl_l, Key.ctrl_r, Key.ctrl):
+            self._ctrl = False
+        elif key == Key.alt_gr:
+            self._altgr = False
+
+
+_TOLERANCIA_CLIQUE = 6     # px entre apertar e soltar para ainda ser clique (e não arraste)
+_INTERVALO_DUPLO   = 0.4   # s entre cliques no mesmo ponto para virar qtd 2, 3…
+_ESPERA_MIN        = 0.4   # s; pausas menores entre ações não viram "esperar"
+_ESPERA_MAX        = 3.0   # s; pausas maiores (o usuário pensando) ficam limitadas a isso
+
+
+def _compactar_gravacao(eventos, templates=()):
+    """Eventos crus do GravadorMacro → ações do atalho. Movimento do mouse não é gravado
+    (só onde apertou e soltou), caracteres seguidos viram um único 'digitar', backspace
+    apaga do texto em vez de virar ação, setas repetidas somam qtd e cliques no mesmo ponto
+    somam qtd. Pausas entre ações viram 'esperar' arredondado a 100 ms."""
+    acoes = []
+    fim = None         # instante em que a última ação terminou
+    apertado = None    # (t, x, y, botao) do botão do mouse ainda pressionado
+
+    def esperar(t):
+        if fim is not None and t - fim >= _ESPERA_MIN:
+            acoes.append({'tipo': 'esperar', 'ms': int(round(min(t - fim, _ESPERA_MAX) * 10)) * 100})
+
+    for ev in eventos:
+        tipo, t = ev[0], ev[1]
+        ultima = acoes[-1] if acoes else {}
+        if tipo == 'mouse':
+            _, _, pressionado, x, y, botao = ev
+            if pressionado:
+                apertado = (t, x, y, botao)
+                continue
+            if not apertado or apertado[3] != botao:
+                continue
+            t0, x0, y0, _ = apertado
+            apertado = None
+            parado = abs(x - x0) <= _TOLERANCIA_CLIQUE and abs(y - y0) <= _TOLERANCIA_CLIQUE
+            if not parado and botao == 'E':
+                esperar(t0)
+                acoes.append({'tipo': 'arraste', 'x1': x0, 'y1': y0, 'x2': x, 'y2': y})
+            elif (ultima.get('tipo') == 'click' and ultima['botao'] == botao and t0 - fim <= _INTERVALO_DUPLO
+                  and abs(ultima['x'] - x0) <= _TOLERANCIA_CLIQUE and abs(ultima['y'] - y0) <= _TOLERANCIA_CLIQUE):
+                ultima['qtd'] += 1
+            else:
+                esperar(t0)
+                acoes.append({'tipo': 'click', 'botao': botao, 'qtd': 1, 'x': x0, 'y': y0})
+        elif tipo == 'char':
+            if ultima.get('tipo') == 'digitar':
+                ultima['texto'] += ev[2]
+            else:
+                esperar(t)
+                acoes.append({'tipo': 'digitar', 'texto': ev[2]})
+        else:
+            nome = ev[2]
+            if nome == 'backspace' and ultima.get('tipo') == 'digitar':
+                ultima['texto'] = ultima['texto'][:-1]
+                if not ultima['texto']:
+                    acoes.pop()
+            elif nome.startswith('seta:'):
+                direcao = nome[5:]
+                if ultima.get('tecla') == 'seta' and ultima['seta'] == direcao and t - fim < _ESPERA_MIN:
+                    ultima['qtd'] += 1
+                else:
+                    esperar(t)
+                    acoes.append({'tipo': 'tecla', 'tecla': 'seta', 'seta': direcao, 'qtd': 1})
+            else:
+                esperar(t)
+                acoes.append({'tipo': 'tecla', 'tecla': nome})
+        fim = t
+
+    if templates:
+        acoes = [a for acao in acoes
+                 for a in (_separar_templates(acao['texto'], templates) if acao['tipo'] == 'digitar' else [acao])]
+    return acoes
+
+
+def _separar_templates(texto, templates):
+    """Divide um 'digitar' gravado nos gatilhos de template que aparecem nele: cada gatilho
+    vira uma ação 'template'. Como ao vivo, só conta o gatilho que começa uma palavra e é
+    seguido de espaço (engolido pela expansão) ou de pontuação (que fica no texto)."""
+    por_gatilho = {t.gatilho: t for t in templates if t.gatilho}
+    acoes = []
+    inicio_palavra = inicio_pendente = 0
+    for i, c in enumerate(texto):
+        if c == ' ' or c in _PONTUACAO_FIM:
+            palavra = texto[inicio_palavra:i].lower()
+            tpl = por_gatilho.get(palavra) if palavra else None
+            # a pontuação só encerra o gatilho se nenhum outro continuar com ela
+            if tpl and (c == ' ' or not any(g.startswith(palavra + c) for g in por_gatilho)):
+                if inicio_palavra > inicio_pendente:
+                    acoes.append({'tipo': 'digitar', 'texto': texto[inicio_pendente:inicio_palavra]})
+                acoes.append({'tipo': 'template', 'tpl_id': tpl.id, 'nome': tpl.nome, 'texto': tpl.texto})
+                inicio_pendente = i + 1 if c == ' ' else i
+                inicio_palavra  = i + 1
+                continue
+        if c.isspace():
+            inicio_palavra = i + 1
+    if inicio_pendente < len(texto):
+        acoes.append({'tipo': 'digitar', 'texto': texto[inicio_pendente:]})
+    return acoes
 
 
 # ---------------------------------------------------------------------------
@@ -1176,9 +3532,8 @@ class TemplatesPopup(QWidget):
         if self.current_templates:
             for t in self.current_templates:
                 item = QListWidgetItem()
-                preview = t['texto'][:50] + '...' if len(t['texto']) > 50 else t['texto']
-                item.setText(f"{t['nome']}\n{preview}")
-                item.setData(Qt.ItemDataRole.UserRole, t['texto'])
+                item.setText(f"{t.nome}\n{t.preview}")
+                item.setData(Qt.ItemDataRole.UserRole, t.texto)
                 self.list_widget.addItem(item)
             self.list_widget.setCurrentRow(0)
         else:
@@ -1198,7 +3553,7 @@ class TemplatesPopup(QWidget):
             chars = 2 + len(self.listener.search_query)
             self.listener.search_mode  = False
             self.listener.search_query = ""
-            self.listener.typed_text   = ""
+            self.listener.digitado.limpar()
             self.close()
             QTimer.singleShot(50, lambda: self.listener.signals.insert_text.emit(texto, chars))
 
@@ -1207,10 +3562,14 @@ class TemplatesPopup(QWidget):
 # FloatingCircle
 # ---------------------------------------------------------------------------
 class FloatingCircle(QWidget):
+    _sincronizado = pyqtSignal(int, int)  # (aplicadas, conflitos) da fila offline
+
     def __init__(self, firebase, user_data):
         super().__init__()
         self.firebase   = firebase
         self.user_data  = user_data
+        self._sincronizado.connect(self._on_sincronizado)
+        firebase.ao_sincronizar = self._sincronizado.emit  # vem da thread de sincronização
         self.dragging   = False
         self.drag_start_position = QPoint()
         self.click_position      = QPoint()
@@ -1228,6 +3587,15 @@ class FloatingCircle(QWidget):
         self.opacity_animation.setDuration(200)
         self.opacity_animation.setEasingCurve(QEasingCurve.Type.OutCubic)
 
+    def _on_sincronizado(self, aplicadas, conflitos):
+        if conflitos:
+            msg = (f'⚠ {conflitos} alteração(ões) não foi(ram) aplicada(s): o item mudou no servidor '
+                   'ou a gravação foi recusada. Veja em Configurações')
+        else:
+            msg = f'✓ {aplicadas} alteração(ões) feita(s) offline sincronizada(s)'
+        self._notification = NotificationWidget(msg)
+        self._notification.show()
+
     @pyqtProperty(float)
     def scale(self):
         return self._scale
@@ -1352,6 +3720,7 @@ class FloatingCircle(QWidget):
 # helpers de ícones SVG
 # ---------------------------------------------------------------------------
 def create_svg_icon(svg_code, size=20):
+    from PyQt6.QtSvg import QSvgRenderer
     svg_bytes = QByteArray(svg_code.encode())
     renderer  = QSvgRenderer(svg_bytes)
     pixmap    = QPixmap(size, size)
@@ -1394,6 +3763,7 @@ class OverlayDialog(QWidget):
         super().__init__(parent)
         if parent:
             self.setGeometry(0, 0, parent.width(), parent.height())
+        self.background_pixmap = None  # parent.grab() pinta os filhos, este inclusive, antes de voltar
         self.background_pixmap = parent.grab() if parent else None
 
         layout = QVBoxLayout()
@@ -1422,6 +3792,7 @@ class OverlayDialog(QWidget):
             buf.open(QIODevice.OpenModeFlag.WriteOnly)
             self.background_pixmap.save(buf, 'PNG')
             buf.close()
+            from PIL import Image, ImageFilter
             pil = Image.open(BytesIO(ba.data()))
             blurred = pil.filter(ImageFilter.GaussianBlur(radius=5))
             bb = BytesIO(); blurred.save(bb, 'PNG'); bb.seek(0)
@@ -1523,6 +3894,9 @@ class MainMenu(QWidget):
     _last_sub_tab_atalhos   = 'meus'
     _templates_loaded  = pyqtSignal(list, bool)
     _usuarios_loaded   = pyqtSignal(list)
+    _feed_alterado     = pyqtSignal(str)  # coleção alterada por outra pessoa
+    _gravacao_terminada = pyqtSignal(list)  # ações do GravadorMacro (thread do pynput → UI)
+    _na_ui             = pyqtSignal(object)  # função a rodar na thread da UI (ver _na_ui_e_esperar)
 
     def __init__(self, firebase, user_data, parent=None):
         super().__init__(parent)
@@ -1532,6 +3906,14 @@ class MainMenu(QWidget):
         self.add_window  = None
         self._templates_loaded.connect(self._on_templates_loaded)
         self._usuarios_loaded.connect(self._on_usuarios_loaded)
+        self._feed_alterado.connect(self._on_feed_alterado)
+        self._gravacao_terminada.connect(self._on_gravacao_terminada)
+        self._na_ui.connect(lambda funcao: funcao())
+        self._gravador   = None
+        self._timer_feed = QTimer(self)
+        self._timer_feed.setSingleShot(True)
+        self._timer_feed.timeout.connect(self._recarregar_por_feed)
+        self.firebase.assinar(self._on_evento_feed)
         self.init_ui()
         self.init_ui_content()
 
@@ -1577,6 +3959,7 @@ class MainMenu(QWidget):
         threading.Thread(target=_start_listener, daemon=True).start()
 
     def closeEvent(self, event):
+        self.firebase.cancelar_assinatura(self._on_evento_feed)
         if hasattr(self, '_pynput_listener') and self._pynput_listener:
             self._pynput_listener.stop()
             self._pynput_listener = None
@@ -2827,6 +5210,7 @@ class MainMenu(QWidget):
             ('Colar',      'ctrl+v'),
             ('Recortar',   'ctrl+x'),
             ('Tab',        'tab'),
+            ('Enter',      'enter'),
         ]
 
         def _mostrar_editor_teclas(wrapper_existente=None, tecla_inicial=None, qtd_inicial=1, seta_inicial=None):
@@ -3028,6 +5412,347 @@ class MainMenu(QWidget):
 
         btn_teclas.clicked.connect(_iniciar_teclas)
 
+        btn_aprender = QPushButton("Aprender (gravar ações)")
+        btn_aprender.setStyleSheet(_btn_style)
+        btn_aprender.setCursor(Qt.CursorShape.PointingHandCursor)
+        add_acao_opts.addWidget(btn_aprender)
+
+        def _iniciar_gravacao():
+            self._add_acao_expanded = False
+            self._add_acao_container.setVisible(False)
+            self._ao_gravar = _receber_gravacao
+            self.hide()
+            self._notification = NotificationWidget('⏺ Gravando… pressione Alt para terminar')
+            self._notification.show()
+            self._gravador = GravadorMacro(self._gravacao_terminada.emit,
+                                           self.firebase.get_templates_setor(self.user_data['setor']))
+            QTimer.singleShot(300, self._gravador.iniciar)  # não gravar o clique que abriu
+
+        def _receber_gravacao(acoes):
+            self.show(); self.raise_()
+            _adicionar_cards(acoes)
+            self._notification = NotificationWidget(f'⏺ {len(acoes)} ações gravadas' if acoes else 'Nada foi gravado')
+            self._notification.show()
+
+        btn_aprender.clicked.connect(_iniciar_gravacao)
+
+        btn_bloco = QPushButton("Repetir / esperar tecla")
+        btn_bloco.setStyleSheet(_btn_style)
+        btn_bloco.setCursor(Qt.CursorShape.PointingHandCursor)
+        add_acao_opts.addWidget(btn_bloco)
+
+        TIPOS_BLOCO = [('repetir', 'Repetir'), ('esperar_tecla', 'Esperar a tecla'), ('se_tecla', 'Se apertar a tecla')]
+
+        def _descrever_bloco(acao):
+            n = len(acao.get('acoes', []))
+            if acao['tipo'] == 'repetir':
+                return f"Repetir {acao.get('vezes', 1)}× ({n} {'ação' if n == 1 else 'ações'})"
+            ms = acao.get('ms', 0)
+            if acao['tipo'] == 'esperar_tecla':
+                limite = f" (até {ms} ms)" if ms else ""
+                senao = f", senão {len(acao['senao'])}" if ms and acao.get('senao') else ""
+                return f"Esperar a tecla {acao.get('tecla', '')}{limite} → {n} {'ação' if n == 1 else 'ações'}{senao}"
+            senao = len(acao.get('senao', []))
+            return f"Se apertar {acao.get('tecla', '')} em até {ms or ExecutorAcoes._SE_TECLA_MS} ms → {n}, senão {senao}"
+
+        def _iniciar_bloco():
+            self._add_acao_expanded = False
+            self._add_acao_container.setVisible(False)
+            _mostrar_editor_bloco()
+
+        def _mostrar_editor_bloco(wrapper_existente=None):
+            dados = json.loads(wrapper_existente.property('acao_data')) if wrapper_existente else {'tipo': 'repetir', 'vezes': 2}
+            wrapper = QWidget(); wrapper.setStyleSheet("background:transparent;")
+            wl = QVBoxLayout(wrapper); wl.setContentsMargins(0,0,0,2); wl.setSpacing(2)
+
+            card = QWidget(); card.setStyleSheet("background:#C2C0B6; border-radius:6px;")
+            cv = QVBoxLayout(card); cv.setContentsMargins(8,6,8,6); cv.setSpacing(4)
+            linha = QHBoxLayout(); linha.setContentsMargins(0,0,0,0); linha.setSpacing(6)
+
+            estilo_campo = "QLineEdit{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px;}"
+            combo = QComboBox()
+            combo.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+            for tipo, nome in TIPOS_BLOCO:
+                combo.addItem(nome, tipo)
+            combo.setCurrentIndex(next((i for i, (t, _) in enumerate(TIPOS_BLOCO) if t == dados['tipo']), 0))
+            campo_vezes = QLineEdit(str(dados.get('vezes', 2))); campo_vezes.setFixedWidth(40)
+            campo_vezes.setAlignment(Qt.AlignmentFlag.AlignCenter); campo_vezes.setStyleSheet(estilo_campo)
+            lbl_vezes = QLabel("vezes")
+            lbl_vezes.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+            campo_tecla = QLineEdit(dados.get('tecla', '')); campo_tecla.setFixedWidth(70)
+            campo_tecla.setPlaceholderText("alt, x…"); campo_tecla.setStyleSheet(estilo_campo)
+            campo_ms = QLineEdit(str(dados['ms']) if dados.get('ms') else ''); campo_ms.setFixedWidth(60)
+            campo_ms.setPlaceholderText("ms"); campo_ms.setAlignment(Qt.AlignmentFlag.AlignCenter); campo_ms.setStyleSheet(estilo_campo)
+            lbl_hint = QLabel()
+            lbl_hint.setStyleSheet("font-family:'Inter'; font-size:10px; color:#666; background:transparent; border:none;")
+
+            def _atualizar_campos():
+                tipo = combo.currentData()
+                for w in (campo_vezes, lbl_vezes):
+                    w.setVisible(tipo == 'repetir')
+                for w in (campo_tecla, campo_ms):
+                    w.setVisible(tipo != 'repetir')
+                for cs in caixas_senao:
+                    cs.setVisible(tipo != 'repetir')
+                lbl_hint.setText({'repetir': "As ações marcadas abaixo rodam N vezes seguidas.",
+                                  'esperar_tecla': "Pausa até a tecla ser apertada (ms vazio = sem limite); "
+                                                   "as marcadas em \"senão\" rodam se o tempo acabar.",
+                                  'se_tecla': "Roda as ações marcadas só se a tecla vier dentro do tempo; "
+                                              "senão, as marcadas em \"senão\"."}[tipo])
+            combo.currentIndexChanged.connect(lambda _: _atualizar_campos())
+
+            btn_ok3 = QPushButton(); btn_ok3.setIcon(create_svg_icon(svg_check, 13)); btn_ok3.setIconSize(QSize(13,13)); btn_ok3.setFixedSize(22,22)
+            btn_ok3.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(73,151,20,0.1);border-radius:4px;}")
+            btn_cx3 = QPushButton(); btn_cx3.setIcon(create_svg_icon(svg_xmark, 13)); btn_cx3.setIconSize(QSize(13,13)); btn_cx3.setFixedSize(22,22)
+            btn_cx3.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(144,11,9,0.1);border-radius:4px;}")
+            linha.addWidget(combo); linha.addWidget(campo_vezes); linha.addWidget(lbl_vezes)
+            linha.addWidget(campo_tecla); linha.addWidget(campo_ms); linha.addStretch()
+            linha.addWidget(btn_ok3); linha.addWidget(btn_cx3)
+            cv.addLayout(linha)
+
+            # escolhe quais cards da lista vão para dentro do bloco ('acoes') ou para o ramo
+            # "senão"; ao editar, os marcados entram depois dos que o bloco já tinha
+            marcados, caixas_senao = [], []
+            for i in range(self._acoes_lista_layout.count()):
+                w = self._acoes_lista_layout.itemAt(i).widget()
+                if w is None or w is wrapper_existente or w.isHidden() or not w.property('acao_data'):
+                    continue
+                desc = w.findChild(QLabel)
+                cb = QCheckBox(desc.text() if desc else '')
+                cb.setStyleSheet(self._ESTILO_CHECK_LOTE)
+                cs = QCheckBox("senão")
+                cs.setStyleSheet(self._ESTILO_CHECK_LOTE)
+                cb.toggled.connect(lambda v, cs=cs: v and cs.setChecked(False))
+                cs.toggled.connect(lambda v, cb=cb: v and cb.setChecked(False))
+                lin_cb = QHBoxLayout(); lin_cb.setContentsMargins(0,0,0,0); lin_cb.setSpacing(6)
+                lin_cb.addWidget(cb, 1); lin_cb.addWidget(cs)
+                cv.addLayout(lin_cb); marcados.append((cb, cs, w))
+                caixas_senao.append(cs)
+            _atualizar_campos()
+
+            def _confirmar_bloco():
+                tipo = combo.currentData()
+                novo = {'tipo': tipo}
+                try:
+                    if tipo == 'repetir':
+                        novo['vezes'] = max(1, int(campo_vezes.text()))
+                    else:
+                        novo['tecla'] = campo_tecla.text().strip().lower()
+                        novo['ms'] = max(0, int(campo_ms.text() or 0))
+                except ValueError:
+                    return
+                if tipo != 'repetir' and not novo['tecla']:
+                    campo_tecla.setFocus(); return
+                entao = [w for cb, cs, w in marcados if cb.isChecked()]
+                senao = [w for cb, cs, w in marcados if cs.isChecked()] if tipo != 'repetir' else []
+                novo['acoes'] = dados.get('acoes', []) + [json.loads(w.property('acao_data')) for w in entao]
+                if tipo != 'repetir':
+                    novo['senao'] = dados.get('senao', []) + [json.loads(w.property('acao_data')) for w in senao]
+                descartar = entao + senao + ([wrapper_existente] if wrapper_existente else [])
+                idx = min([self._acoes_lista_layout.indexOf(w) for w in descartar + [wrapper]])
+                for w in descartar + [wrapper]:
+                    w.setParent(None); w.deleteLater()
+                self._acoes_lista_layout.insertWidget(max(0, idx), _criar_card_bloco(novo))
+
+            def _cancelar_bloco():
+                if wrapper_existente: wrapper_existente.setVisible(True)
+                wrapper.setParent(None); wrapper.deleteLater()
+
+            btn_ok3.clicked.connect(_confirmar_bloco)
+            btn_cx3.clicked.connect(_cancelar_bloco)
+            wl.addWidget(card); wl.addWidget(lbl_hint)
+
+            if wrapper_existente:
+                wrapper_existente.setVisible(False)
+                idx = self._acoes_lista_layout.indexOf(wrapper_existente)
+                self._acoes_lista_layout.insertWidget(idx, wrapper)
+            else:
+                self._acoes_lista_layout.addWidget(wrapper)
+
+        def _criar_card_bloco(acao):
+            wrapper = QWidget(); wrapper.setStyleSheet("background:transparent;")
+            wrapper.setProperty('acao_data', json.dumps(acao))
+            wl = QHBoxLayout(wrapper); wl.setContentsMargins(0,0,0,0); wl.setSpacing(4)
+            btn_ed = QPushButton(); btn_ed.setIcon(create_svg_icon(svg_edit_a, 14)); btn_ed.setIconSize(QSize(14,14)); btn_ed.setFixedSize(22,22)
+            btn_ed.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(0,0,0,0.06);border-radius:4px;}")
+            btn_rm = QPushButton(); btn_rm.setIcon(create_svg_icon(svg_del_a, 14)); btn_rm.setIconSize(QSize(14,14)); btn_rm.setFixedSize(22,22)
+            btn_rm.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(144,11,9,0.08);border-radius:4px;}")
+            btn_ed.clicked.connect(lambda: _mostrar_editor_bloco(wrapper))
+            btn_rm.clicked.connect(lambda: (wrapper.setParent(None), wrapper.deleteLater()))
+            card = _montar_card(_descrever_bloco(acao), btn_ed, btn_rm, wrapper)
+            wl.addWidget(card)
+            return wrapper
+
+        btn_bloco.clicked.connect(_iniciar_bloco)
+
+        btn_tela = QPushButton("Esperar a tela")
+        btn_tela.setStyleSheet(_btn_style)
+        btn_tela.setCursor(Qt.CursorShape.PointingHandCursor)
+        add_acao_opts.addWidget(btn_tela)
+
+        def _iniciar_aguardar_tela():
+            self._add_acao_expanded = False
+            self._add_acao_container.setVisible(False)
+            self.hide()
+            _capturar_regiao_tela()
+
+        def _capturar_regiao_tela():
+            # um overlay por tela: cada uma tem a sua escala, e o retângulo fica numa tela só
+            overlays = []
+            origem = [None, None, None]  # x, y, overlay onde o arraste começou
+            cursor_pos = [0, 0]
+
+            def _fechar_overlays():
+                for ov in overlays:
+                    ov.close()
+                overlays.clear()
+
+            def _novo_overlay(tela):
+                geo = tela.geometry()
+                ov = QWidget(None)
+                ov.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Tool)
+                ov.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+                ov.setGeometry(geo)
+
+                def _paint_regiao(ev):
+                    p = QPainter(ov)
+                    p.fillRect(ov.rect(), QColor(0, 0, 0, 80))
+                    if origem[2] is ov:
+                        p.setPen(QPen(QColor("#88C22B"), 2, Qt.PenStyle.DashLine))
+                        p.drawRect(QRect(QPoint(origem[0], origem[1]), QPoint(cursor_pos[0], cursor_pos[1])).normalized())
+                    p.end()
+                ov.paintEvent = _paint_regiao
+
+                lbl_reg = QLabel("Arraste um retângulo sobre a parte da tela que deve mudar", ov)
+                lbl_reg.setStyleSheet("color:white; font-family:'Inter'; font-size:14px; background:transparent;")
+                lbl_reg.adjustSize(); lbl_reg.move(geo.width()//2 - lbl_reg.width()//2, 30)
+
+                def _on_press(ev):
+                    pos = ev.position().toPoint()
+                    origem[0], origem[1], origem[2] = pos.x(), pos.y(), ov
+                    cursor_pos[0], cursor_pos[1] = pos.x(), pos.y()
+                def _on_move(ev):
+                    # o arraste não passa da borda da tela em que começou
+                    pos = ev.position().toPoint()
+                    cursor_pos[0] = min(max(pos.x(), 0), geo.width() - 1)
+                    cursor_pos[1] = min(max(pos.y(), 0), geo.height() - 1)
+                    if origem[2] is ov:
+                        ov.update()
+                def _on_release(ev):
+                    if origem[2] is not ov:
+                        return
+                    _on_move(ev)
+                    r = QRect(QPoint(origem[0], origem[1]), QPoint(cursor_pos[0], cursor_pos[1])).normalized()
+                    r.translate(geo.topLeft())
+                    _fechar_overlays()
+                    if r.width() < 4 or r.height() < 4:
+                        self.show(); self.raise_()
+                        return
+                    # espera o overlay sumir da tela antes de capturar a referência
+                    QTimer.singleShot(200, lambda: _regiao_escolhida(r.x(), r.y(), r.width(), r.height()))
+
+                ov.mousePressEvent   = _on_press
+                ov.mouseMoveEvent    = _on_move
+                ov.mouseReleaseEvent = _on_release
+                ov.setCursor(Qt.CursorShape.CrossCursor)
+                return ov
+
+            for tela in QApplication.screens():
+                overlays.append(_novo_overlay(tela))
+            self._overlays_regiao = overlays  # sem pai: precisam de uma referência viva
+            for ov in overlays:
+                ov.show()
+
+        def _regiao_escolhida(x, y, w, h):
+            try:
+                referencia = _assinatura_regiao(x, y, w, h)
+            except Exception as e:
+                self.show(); self.raise_()
+                QMessageBox.warning(self, "Esperar a tela", f"Não foi possível capturar a tela: {e}")
+                return
+            self.show(); self.raise_()
+            _mostrar_editor_tela({'tipo': 'aguardar_tela', 'x': x, 'y': y, 'w': w, 'h': h,
+                                  'modo': 'mudar', 'referencia': referencia, 'ms': 10000})
+
+        def _descrever_tela(acao):
+            oque = 'ficar como na captura' if acao.get('modo') == 'igual' else 'mudar'
+            return f"Esperar a tela {oque} (até {acao.get('ms', 10000) / 1000:g} s)"
+
+        def _mostrar_editor_tela(dados, wrapper_existente=None):
+            wrapper = QWidget(); wrapper.setStyleSheet("background:transparent;")
+            wl = QVBoxLayout(wrapper); wl.setContentsMargins(0,0,0,2); wl.setSpacing(2)
+            card = QWidget(); card.setStyleSheet("background:#C2C0B6; border-radius:6px;")
+            cl = QHBoxLayout(card); cl.setContentsMargins(8,6,8,6); cl.setSpacing(6)
+
+            lbl_pre = QLabel("Esperar a tela")
+            lbl_pre.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+            combo = QComboBox()
+            combo.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+            combo.addItem("mudar", 'mudar'); combo.addItem("ficar como agora", 'igual')
+            combo.setCurrentIndex(1 if dados.get('modo') == 'igual' else 0)
+            lbl_ate = QLabel("até")
+            lbl_ate.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+            campo_ms = QLineEdit(str(dados.get('ms', 10000))); campo_ms.setFixedWidth(60)
+            campo_ms.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            campo_ms.setStyleSheet("QLineEdit{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px;}")
+            lbl_ms = QLabel("ms")
+            lbl_ms.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+            chk_seguir = QCheckBox("Se o tempo acabar, continuar o atalho (senão ele para)")
+            chk_seguir.setStyleSheet(self._ESTILO_CHECK_LOTE.replace('font-size:12px', 'font-size:10px'))
+            chk_seguir.setChecked(dados.get('ao_expirar') == 'seguir')
+
+            btn_ok4 = QPushButton(); btn_ok4.setIcon(create_svg_icon(svg_check, 13)); btn_ok4.setIconSize(QSize(13,13)); btn_ok4.setFixedSize(22,22)
+            btn_ok4.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(73,151,20,0.1);border-radius:4px;}")
+            btn_cx4 = QPushButton(); btn_cx4.setIcon(create_svg_icon(svg_xmark, 13)); btn_cx4.setIconSize(QSize(13,13)); btn_cx4.setFixedSize(22,22)
+            btn_cx4.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(144,11,9,0.1);border-radius:4px;}")
+
+            def _confirmar_tela():
+                try: ms = max(100, int(campo_ms.text()))
+                except ValueError: return
+                novo = dict(dados, modo=combo.currentData(), ms=ms,
+                            ao_expirar='seguir' if chk_seguir.isChecked() else 'parar')
+                coment_salvo = _pegar_comentario(wrapper_existente)
+                idx = self._acoes_lista_layout.indexOf(wrapper)
+                wrapper.setParent(None); wrapper.deleteLater()
+                if wrapper_existente:
+                    wrapper_existente.setParent(None); wrapper_existente.deleteLater()
+                card_conf = _criar_card_tela(novo)
+                self._acoes_lista_layout.insertWidget(max(0, idx), card_conf)
+                _aplicar_comentario(card_conf, coment_salvo)
+
+            def _cancelar_tela():
+                if wrapper_existente: wrapper_existente.setVisible(True)
+                wrapper.setParent(None); wrapper.deleteLater()
+
+            btn_ok4.clicked.connect(_confirmar_tela)
+            btn_cx4.clicked.connect(_cancelar_tela)
+            cl.addWidget(lbl_pre); cl.addWidget(combo); cl.addWidget(lbl_ate); cl.addWidget(campo_ms); cl.addWidget(lbl_ms)
+            cl.addStretch(); cl.addWidget(btn_ok4); cl.addWidget(btn_cx4)
+            wl.addWidget(card); wl.addWidget(chk_seguir)
+
+            if wrapper_existente:
+                wrapper_existente.setVisible(False)
+                idx = self._acoes_lista_layout.indexOf(wrapper_existente)
+                self._acoes_lista_layout.insertWidget(idx, wrapper)
+            else:
+                self._acoes_lista_layout.addWidget(wrapper)
+
+        def _criar_card_tela(acao):
+            wrapper = QWidget(); wrapper.setStyleSheet("background:transparent;")
+            wrapper.setProperty('acao_data', json.dumps(acao))
+            wl = QHBoxLayout(wrapper); wl.setContentsMargins(0,0,0,0); wl.setSpacing(4)
+            btn_ed = QPushButton(); btn_ed.setIcon(create_svg_icon(svg_edit_a, 14)); btn_ed.setIconSize(QSize(14,14)); btn_ed.setFixedSize(22,22)
+            btn_ed.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(0,0,0,0.06);border-radius:4px;}")
+            btn_rm = QPushButton(); btn_rm.setIcon(create_svg_icon(svg_del_a, 14)); btn_rm.setIconSize(QSize(14,14)); btn_rm.setFixedSize(22,22)
+            btn_rm.setStyleSheet("QPushButton{background:transparent;border:none;}QPushButton:hover{background:rgba(144,11,9,0.08);border-radius:4px;}")
+            btn_ed.clicked.connect(lambda: _mostrar_editor_tela(json.loads(wrapper.property('acao_data')), wrapper))
+            btn_rm.clicked.connect(lambda: (wrapper.setParent(None), wrapper.deleteLater()))
+            card = _montar_card(_descrever_tela(acao), btn_ed, btn_rm, wrapper)
+            wl.addWidget(card)
+            return wrapper
+
+        btn_tela.clicked.connect(_iniciar_aguardar_tela)
+
         def _toggle_add_acao():
             self._add_acao_expanded = not self._add_acao_expanded
             self._add_acao_container.setVisible(self._add_acao_expanded)
@@ -3437,6 +6162,21 @@ class MainMenu(QWidget):
         acoes_frame_layout.addWidget(acoes_scroll)
         self.overlay_widget.add_content(acoes_frame)
 
+        vel_w = QWidget(); vel_w.setStyleSheet("background:transparent;")
+        vel_l = QHBoxLayout(vel_w); vel_l.setContentsMargins(0, 0, 0, 0); vel_l.setSpacing(8)
+        lbl_vel = QLabel("Velocidade")
+        lbl_vel.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent;")
+        self._atl_velocidade = QComboBox()
+        self._atl_velocidade.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+        self._atl_velocidade.addItem("Padrão (global)", '')
+        for chave, nome in NOMES_VELOCIDADE:
+            self._atl_velocidade.addItem(nome, chave)
+        if editando:
+            i_vel = self._atl_velocidade.findData(atl_existente.get('velocidade', ''))
+            self._atl_velocidade.setCurrentIndex(max(0, i_vel))
+        vel_l.addWidget(lbl_vel); vel_l.addWidget(self._atl_velocidade); vel_l.addStretch()
+        self.overlay_widget.add_content(vel_w)
+
         btns = QHBoxLayout(); btns.setSpacing(10); btns.addStretch()
         b_criar = QPushButton("Salvar" if editando else "Criar"); b_criar.setFixedWidth(90)
         b_criar.setStyleSheet("QPushButton{font-family:'Inter';font-size:13px;color:white;background:#499714;border:none;border-radius:6px;padding:8px 16px;}QPushButton:hover{background:#3d8010;}")
@@ -3448,48 +6188,31 @@ class MainMenu(QWidget):
         bw = QWidget(); bw.setStyleSheet("background:transparent;"); bw.setLayout(btns)
         self.overlay_widget.add_content(bw)
 
-        self.overlay_widget.show()
-
-        # pré-preencher tipo e ações se editando
-        if editando:
-            cmd_tipo  = atl_existente.get('comando_tipo', '')
-            cmd_valor = atl_existente.get('comando_valor', '')
-            if cmd_tipo == 'alt_tecla':
-                _on_opcao(op="Alt + tecla")
-                if hasattr(self, 'atl_teclas'): self.atl_teclas.setText(cmd_valor)
-            elif cmd_tipo == 'shortcut':
-                _on_opcao(op="Atalho como dos templates")
-                if hasattr(self, 'atl_shortcut'): self.atl_shortcut.setText(cmd_valor)
-            # fechar o dropdown após selecionar
-            self._atl_tipo_container.setVisible(False)
-            self._atl_tipo_expanded = False
-            from PyQt6.QtGui import QTransform, QIcon
-            px = create_svg_icon(svg_chevron_s, 12).pixmap(12, 12)
-            self._btn_tipo_chevron.setIcon(QIcon(px.transformed(QTransform().rotate(0))))
-            # pré-carregar ações
-            def _restaurar_comentario(card_widget, acao):
-                coment = acao.get('comentario', '')
-                if not coment: return
-                card_inner = card_widget.findChild(QWidget, 'card_inner')
-                if not card_inner: return
-                coment_w = QWidget(); coment_w.setObjectName('coment_widget')
-                coment_w.setStyleSheet("background:transparent;")
-                cl2 = QHBoxLayout(coment_w); cl2.setContentsMargins(0, 0, 0, 0); cl2.setSpacing(0)
-                field = QLineEdit(); field.setObjectName('coment_field')
-                field.setStyleSheet("QLineEdit{font-family:'Instrument Sans';font-size:11px;color:#828282;background:transparent;border:none;border-bottom:1px solid #C2C0B6;padding:1px 0;}QLineEdit::placeholder{color:#aaa;}")
+        # cards das ações já existentes (edição) ou gravadas pelo "Aprender"
+        def _restaurar_comentario(card_widget, acao):
+            coment = acao.get('comentario', '')
+            if not coment: return
+            card_inner = card_widget.findChild(QWidget, 'card_inner')
+            if not card_inner: return
+            coment_w = QWidget(); coment_w.setObjectName('coment_widget')
+            coment_w.setStyleSheet("background:transparent;")
+            cl2 = QHBoxLayout(coment_w); cl2.setContentsMargins(0, 0, 0, 0); cl2.setSpacing(0)
+            field = QLineEdit(); field.setObjectName('coment_field')
+            field.setStyleSheet("QLineEdit{font-family:'Instrument Sans';font-size:11px;color:#828282;background:transparent;border:none;border-bottom:1px solid #C2C0B6;padding:1px 0;}QLineEdit::placeholder{color:#aaa;}")
+            field.setVisible(False)
+            lbl = QLabel(coment); lbl.setObjectName('coment_label')
+            lbl.setStyleSheet("font-family:'Instrument Sans';font-size:11px;color:#828282;background:transparent;border:none;")
+            def _salvar():
+                t = field.text().strip()
                 field.setVisible(False)
-                lbl = QLabel(coment); lbl.setObjectName('coment_label')
-                lbl.setStyleSheet("font-family:'Instrument Sans';font-size:11px;color:#828282;background:transparent;border:none;")
-                def _salvar():
-                    t = field.text().strip()
-                    field.setVisible(False)
-                    if t: lbl.setText(t); lbl.setVisible(True)
-                    else: coment_w.setVisible(False)
-                field.returnPressed.connect(_salvar)
-                cl2.addWidget(field); cl2.addWidget(lbl)
-                card_inner.layout().addWidget(coment_w)
+                if t: lbl.setText(t); lbl.setVisible(True)
+                else: coment_w.setVisible(False)
+            field.returnPressed.connect(_salvar)
+            cl2.addWidget(field); cl2.addWidget(lbl)
+            card_inner.layout().addWidget(coment_w)
 
-            for acao in atl_existente.get('acoes', []):
+        def _adicionar_cards(acoes):
+            for acao in acoes:
                 if isinstance(acao, dict) and acao.get('tipo') == 'click':
                     card = _criar_card_conf(acao['x'], acao['y'], acao['botao'], acao.get('qtd', 1))
                     self._acoes_lista_layout.addWidget(card)
@@ -3514,10 +6237,39 @@ class MainMenu(QWidget):
                     if acao.get('tecla') == 'seta':
                         nome_card = f"Seta {acao.get('seta', '')} {acao.get('qtd', 1)} {'vez' if acao.get('qtd', 1) == 1 else 'vezes'}"
                     else:
-                        nome_card = next((n for n, k in [('Backspace','backspace'),('Delete','delete'),('Copiar','ctrl+c'),('Colar','ctrl+v'),('Recortar','ctrl+x'),('Tab','tab')] if k == acao.get('tecla')), acao.get('tecla',''))
+                        nome_card = next((n for n, k in TECLAS_SIMPLES if k == acao.get('tecla')), acao.get('tecla',''))
                     card = _criar_card_tecla(nome_card, acao)
                     self._acoes_lista_layout.addWidget(card)
                     _restaurar_comentario(card, acao)
+                elif isinstance(acao, dict) and acao.get('tipo') == 'aguardar_tela':
+                    card = _criar_card_tela(acao)
+                    self._acoes_lista_layout.addWidget(card)
+                    _restaurar_comentario(card, acao)
+                elif isinstance(acao, dict) and acao.get('tipo') in ('repetir', 'esperar_tecla', 'se_tecla'):
+                    card = _criar_card_bloco(acao)
+                    self._acoes_lista_layout.addWidget(card)
+                    _restaurar_comentario(card, acao)
+
+        self.overlay_widget.show()
+
+        # pré-preencher tipo e ações se editando
+        if editando:
+            cmd_tipo  = atl_existente.get('comando_tipo', '')
+            cmd_valor = atl_existente.get('comando_valor', '')
+            if cmd_tipo == 'alt_tecla':
+                _on_opcao(op="Alt + tecla")
+                if hasattr(self, 'atl_teclas'): self.atl_teclas.setText(cmd_valor)
+            elif cmd_tipo == 'shortcut':
+                _on_opcao(op="Atalho como dos templates")
+                if hasattr(self, 'atl_shortcut'): self.atl_shortcut.setText(cmd_valor)
+            # fechar o dropdown após selecionar
+            self._atl_tipo_container.setVisible(False)
+            self._atl_tipo_expanded = False
+            from PyQt6.QtGui import QTransform, QIcon
+            px = create_svg_icon(svg_chevron_s, 12).pixmap(12, 12)
+            self._btn_tipo_chevron.setIcon(QIcon(px.transformed(QTransform().rotate(0))))
+            # pré-carregar ações
+            _adicionar_cards(atl_existente.get('acoes', []))
 
     def _salvar_atalho(self, atl_existente=None):
         editando = atl_existente is not None
@@ -3573,17 +6325,19 @@ class MainMenu(QWidget):
                             if texto_c:
                                 acao['comentario'] = texto_c
                         acoes.append(acao)
+        velocidade = self._atl_velocidade.currentData() or ''
         if editando:
             ok = self.firebase.update_atalho(
                 atl_existente['id'], titulo, cmd_tipo, cmd_valor, acoes,
-                getattr(self, '_atl_compartilhar', None) and self._atl_compartilhar.isChecked()
+                getattr(self, '_atl_compartilhar', None) and self._atl_compartilhar.isChecked(),
+                velocidade
             )
             msg = '✓ Atalho atualizado!'
         else:
             ok = self.firebase.add_atalho(
                 titulo, cmd_tipo, cmd_valor, acoes,
                 self.user_data['uid'], self.user_data['setor'],
-                self._atl_compartilhar.isChecked()
+                self._atl_compartilhar.isChecked(), velocidade
             )
             msg = '✓ Atalho criado!'
         if ok:
@@ -3908,6 +6662,125 @@ class MainMenu(QWidget):
         anim_w = QWidget(); anim_w.setStyleSheet("background:transparent;"); anim_w.setLayout(anim_row)
         self.config_content_layout.addWidget(anim_w)
 
+        # ── Seção: Velocidade dos atalhos ─────────────────────────────────────
+        linha_v = QFrame(); linha_v.setFrameShape(QFrame.Shape.HLine)
+        linha_v.setStyleSheet("color:#C0C0C0; background:#C0C0C0; border:none; max-height:1px;")
+        self.config_content_layout.addWidget(linha_v)
+
+        vel_row = QHBoxLayout(); vel_row.setContentsMargins(0, 4, 0, 4)
+        lbl_vel = QLabel("Velocidade dos atalhos")
+        lbl_vel.setStyleSheet("font-family:'Inter'; font-size:14px; font-weight:600; color:black; background:transparent; border:none;")
+        vel_row.addWidget(lbl_vel); vel_row.addStretch()
+
+        combo_vel = QComboBox()
+        combo_vel.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+        for chave, nome in NOMES_VELOCIDADE:
+            combo_vel.addItem(nome, chave)
+        combo_vel.setCurrentIndex(max(0, combo_vel.findData(self.firebase.get_config('velocidade', 'normal'))))
+        combo_vel.currentIndexChanged.connect(lambda _: self.firebase.set_config('velocidade', combo_vel.currentData()))
+        vel_row.addWidget(combo_vel)
+
+        vel_w = QWidget(); vel_w.setStyleSheet("background:transparent;"); vel_w.setLayout(vel_row)
+        self.config_content_layout.addWidget(vel_w)
+
+        btn_calibrar = QPushButton("Calibrar…")
+        btn_calibrar.setStyleSheet("QPushButton{font-family:'Inter';font-size:11px;color:#499714;background:transparent;border:none;text-decoration:underline;padding:0;}QPushButton:hover{color:#3d8010;}")
+        btn_calibrar.setCursor(Qt.CursorShape.PointingHandCursor)
+        btn_calibrar.setFixedHeight(20)
+        btn_calibrar.clicked.connect(lambda: show_confirm(
+            self, "Clique num campo de texto vazio do aplicativo. A calibração começa em 3 segundos.",
+            self._calibrar_velocidade))
+        self.config_content_layout.addWidget(btn_calibrar, alignment=Qt.AlignmentFlag.AlignLeft)
+
+        btn_verificar = QPushButton("Verificar atalhos…")
+        btn_verificar.setStyleSheet(btn_calibrar.styleSheet())
+        btn_verificar.setCursor(Qt.CursorShape.PointingHandCursor)
+        btn_verificar.setFixedHeight(20)
+        btn_verificar.clicked.connect(self._verificar_atalhos)
+        self.config_content_layout.addWidget(btn_verificar, alignment=Qt.AlignmentFlag.AlignLeft)
+
+        panico_row = QHBoxLayout(); panico_row.setContentsMargins(0, 4, 0, 4)
+        lbl_panico = QLabel("Parar atalho em andamento: Esc ou")
+        lbl_panico.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+        panico_row.addWidget(lbl_panico); panico_row.addStretch()
+        combo_panico = QComboBox()
+        combo_panico.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+        for chave, nome in TECLAS_PANICO:
+            combo_panico.addItem(nome, chave)
+        combo_panico.setCurrentIndex(max(0, combo_panico.findData(self.firebase.get_config('tecla_panico', 'pause'))))
+        combo_panico.currentIndexChanged.connect(lambda _: self.firebase.set_config('tecla_panico', combo_panico.currentData()))
+        panico_row.addWidget(combo_panico)
+        panico_w = QWidget(); panico_w.setStyleSheet("background:transparent;"); panico_w.setLayout(panico_row)
+        self.config_content_layout.addWidget(panico_w)
+
+        injecao_row = QHBoxLayout(); injecao_row.setContentsMargins(0, 4, 0, 4)
+        lbl_injecao = QLabel("Inserção de texto")
+        lbl_injecao.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+        injecao_row.addWidget(lbl_injecao); injecao_row.addStretch()
+        combo_injecao = QComboBox()
+        combo_injecao.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+        for chave, nome in MODOS_INJECAO:
+            combo_injecao.addItem(nome, chave)
+        combo_injecao.setCurrentIndex(max(0, combo_injecao.findData(self.firebase.get_config('injecao', 'cuidadosa'))))
+        combo_injecao.currentIndexChanged.connect(lambda _: self.firebase.set_config('injecao', combo_injecao.currentData()))
+        injecao_row.addWidget(combo_injecao)
+        injecao_w = QWidget(); injecao_w.setStyleSheet("background:transparent;"); injecao_w.setLayout(injecao_row)
+        self.config_content_layout.addWidget(injecao_w)
+
+        expansao_row = QHBoxLayout(); expansao_row.setContentsMargins(0, 4, 0, 4)
+        lbl_expansao = QLabel("Expandir gatilhos")
+        lbl_expansao.setStyleSheet("font-family:'Inter'; font-size:12px; color:#1D1B20; background:transparent; border:none;")
+        expansao_row.addWidget(lbl_expansao); expansao_row.addStretch()
+        combo_expansao = QComboBox()
+        combo_expansao.setStyleSheet("QComboBox{font-family:'Inter';font-size:12px;color:#1D1B20;background:white;border:1px solid #aaa;border-radius:4px;padding:2px 6px;}")
+        for chave, nome in MODOS_EXPANSAO:
+            combo_expansao.addItem(nome, chave)
+        combo_expansao.setCurrentIndex(max(0, combo_expansao.findData(self.firebase.get_config('expansao', 'espaco'))))
+        combo_expansao.currentIndexChanged.connect(lambda _: self.firebase.set_config('expansao', combo_expansao.currentData()))
+        expansao_row.addWidget(combo_expansao)
+        expansao_w = QWidget(); expansao_w.setStyleSheet("background:transparent;"); expansao_w.setLayout(expansao_row)
+        self.config_content_layout.addWidget(expansao_w)
+
+        # ── Seção: Alterações offline recusadas ───────────────────────────────
+        conflitos_offline = self.firebase.conflitos_offline()
+        if conflitos_offline:
+            linha_off = QFrame(); linha_off.setFrameShape(QFrame.Shape.HLine)
+            linha_off.setStyleSheet("color:#C0C0C0; background:#C0C0C0; border:none; max-height:1px;")
+            self.config_content_layout.addWidget(linha_off)
+
+            lbl_off = QLabel(f"Alterações não aplicadas ({len(conflitos_offline)})")
+            lbl_off.setStyleSheet("font-family:'Inter'; font-size:14px; font-weight:600; color:black; background:transparent; border:none;")
+            self.config_content_layout.addWidget(lbl_off)
+
+            def _resolver(conflito, aplicar):
+                if aplicar:
+                    self.firebase.reaplicar_conflito(conflito)
+                else:
+                    self.firebase.descartar_conflito(conflito)
+                self.show_config_tab()
+
+            for c in reversed(conflitos_offline):
+                row = QHBoxLayout(); row.setContentsMargins(0, 2, 0, 2); row.setSpacing(6)
+                em = datetime.fromtimestamp(c.get('em', 0)).strftime('%d/%m %H:%M')
+                lbl = QLabel(f"{c.get('desc', '?')} ({em}): {c.get('motivo', '')}")
+                lbl.setWordWrap(True)
+                lbl.setStyleSheet("font-family:'Inter'; font-size:11px; color:#1D1B20; background:transparent; border:none;")
+                row.addWidget(lbl, 1)
+
+                btn_apl = QPushButton("Aplicar mesmo assim")
+                btn_apl.setStyleSheet("QPushButton{font-family:'Inter';font-size:11px;color:#2d8a2d;background:transparent;border:none;text-decoration:underline;}QPushButton:hover{color:#1a5c1a;}")
+                btn_apl.setCursor(Qt.CursorShape.PointingHandCursor)
+                btn_apl.setToolTip("Grava a alteração por cima da versão que está no servidor")
+                btn_desc = QPushButton("Descartar")
+                btn_desc.setStyleSheet("QPushButton{font-family:'Inter';font-size:11px;color:#900B09;background:transparent;border:none;text-decoration:underline;}QPushButton:hover{color:#6a0807;}")
+                btn_desc.setCursor(Qt.CursorShape.PointingHandCursor)
+                btn_apl.clicked.connect(lambda checked=False, _c=c: _resolver(_c, True))
+                btn_desc.clicked.connect(lambda checked=False, _c=c: _resolver(_c, False))
+                row.addWidget(btn_apl); row.addWidget(btn_desc)
+
+                rw = QWidget(); rw.setStyleSheet("background:transparent;"); rw.setLayout(row)
+                self.config_content_layout.addWidget(rw)
+
         # ── Seção: Administração de usuários (só para admins) ─────────────────
         if self.user_data.get('is_admin', False):
             linha_adm = QFrame(); linha_adm.setFrameShape(QFrame.Shape.HLine)
@@ -3936,6 +6809,7 @@ class MainMenu(QWidget):
 
             _uc_layout_ref     = uc_layout
             _uc_container_ref  = self._usuarios_container
+            self._usuarios_todos = None
             self._svg_del_u    = svg_del_u
             self._uc_layout_ref    = _uc_layout_ref
             self._uc_container_ref = _uc_container_ref
@@ -4048,9 +6922,14 @@ class MainMenu(QWidget):
 
             pend_w.setCursor(Qt.CursorShape.ArrowCursor)
 
+            pendentes_atuais = [[]]
+
             def _atualizar_pendentes(lista):
+                pendentes_atuais[0] = lista
                 pendentes_ref[0] = len(lista)
                 bolinha.setVisible(len(lista) > 0)
+                if not lista:
+                    self._pend_container.setVisible(False)
 
                 # limpar container
                 while pc_layout.count():
@@ -4058,16 +6937,15 @@ class MainMenu(QWidget):
                     if item.widget(): item.widget().deleteLater()
 
                 # popular com os pendentes
+                itens = []
                 for u in lista:
-                    _uid   = str(u.get('uid', ''))
-                    _nome  = u.get('nome', '?')
-                    _setor = u.get('setor', '')
-                    _email = u.get('email', '')
+                    _nome = u.get('nome', '?')
 
                     row = QHBoxLayout(); row.setContentsMargins(16, 2, 0, 2); row.setSpacing(6)
-                    lbl_nome = QLabel(_nome)
-                    lbl_nome.setStyleSheet("font-family:'Inter'; font-size:12px; color:black; background:transparent; border:none;")
-                    row.addWidget(lbl_nome); row.addStretch()
+                    chk = QCheckBox(_nome)
+                    chk.setStyleSheet(self._ESTILO_CHECK_LOTE)
+                    row.addWidget(chk); row.addStretch()
+                    itens.append((chk, u))
 
                     btn_apr = QPushButton("Aprovar")
                     btn_apr.setStyleSheet("QPushButton{font-family:'Inter';font-size:12px;color:#2d8a2d;background:transparent;border:none;text-decoration:underline;}QPushButton:hover{color:#1a5c1a;}")
@@ -4077,28 +6955,19 @@ class MainMenu(QWidget):
                     btn_rec.setStyleSheet("QPushButton{font-family:'Inter';font-size:12px;color:#900B09;background:transparent;border:none;text-decoration:underline;}QPushButton:hover{color:#6a0807;}")
                     btn_rec.setCursor(Qt.CursorShape.PointingHandCursor)
 
-                    def _aprovar(checked=False, uid=_uid, nome=_nome, setor=_setor, email=_email):
-                        self.firebase.approve_user(uid, nome, setor, email)
-                        self._notification = NotificationWidget(f'✓ {nome} aprovado!')
-                        self._notification.show()
-                        self.show_config_tab()
-
-                    def _recusar(checked=False, uid=_uid, nome=_nome):
-                        show_confirm(self, f'Recusar {nome}?', lambda uid=uid, nome=nome: _do_recusar(uid, nome))
-
-                    def _do_recusar(uid, nome):
-                        self.firebase.reject_user(uid)
-                        self._notification = NotificationWidget(f'✗ {nome} recusado!')
-                        self._notification.show()
-                        self.show_config_tab()
-
-                    btn_apr.clicked.connect(_aprovar)
-                    btn_rec.clicked.connect(_recusar)
+                    btn_apr.clicked.connect(lambda checked=False, _u=u: _aprovar_lote([_u]))
+                    btn_rec.clicked.connect(lambda checked=False, _u=u: _recusar_lote([_u]))
                     row.addWidget(btn_apr); row.addWidget(btn_rec)
 
                     rw = QWidget(); rw.setStyleSheet("background:transparent;"); rw.setLayout(row)
                     pc_layout.addWidget(rw)
 
+                if len(lista) > 1:
+                    pc_layout.insertWidget(0, self._barra_lote(itens, [
+                        ("Aprovar selecionados", "#2d8a2d", _aprovar_lote),
+                        ("Recusar selecionados", "#900B09", _recusar_lote),
+                    ]))
+
                 if len(lista) > 0:
                     pend_w.setCursor(Qt.CursorShape.PointingHandCursor)
                     pend_w.setToolTip("")
@@ -4108,6 +6977,40 @@ class MainMenu(QWidget):
                     pend_w.setToolTip("Nenhum usuário pendente de aprovação")
                     pend_w.mousePressEvent = lambda e: None
 
+            def _remover_pendentes(usuarios):
+                uids = {str(u.get('uid', '')) for u in usuarios}
+                _atualizar_pendentes([u for u in pendentes_atuais[0] if str(u.get('uid', '')) not in uids])
+
+            def _aprovar_lote(usuarios):
+                if not usuarios:
+                    return
+                if not self.firebase.approve_users(usuarios):
+                    QMessageBox.critical(self, "Erro", "Falha ao aprovar. Verifique sua conexão.")
+                    return
+                msg = (f'✓ {usuarios[0].get("nome", "?")} aprovado!' if len(usuarios) == 1
+                       else f'✓ {len(usuarios)} usuários aprovados!')
+                self._notification = NotificationWidget(msg)
+                self._notification.show()
+                _remover_pendentes(usuarios)
+                self._adicionar_aprovados(usuarios)
+
+            def _recusar_lote(usuarios):
+                if not usuarios:
+                    return
+                pergunta = (f'Recusar {usuarios[0].get("nome", "?")}?' if len(usuarios) == 1
+                            else f'Recusar {len(usuarios)} usuários?')
+                show_confirm(self, pergunta, lambda: _do_recusar(usuarios))
+
+            def _do_recusar(usuarios):
+                if not self.firebase.reject_users([str(u.get('uid', '')) for u in usuarios]):
+                    QMessageBox.critical(self, "Erro", "Falha ao recusar. Verifique sua conexão.")
+                    return
+                msg = (f'✗ {usuarios[0].get("nome", "?")} recusado!' if len(usuarios) == 1
+                       else f'✗ {len(usuarios)} usuários recusados!')
+                self._notification = NotificationWidget(msg)
+                self._notification.show()
+                _remover_pendentes(usuarios)
+
             # buscar pendentes em thread para não bloquear UI
             self.config_content_layout.addWidget(pend_w)
             self.config_content_layout.addWidget(self._pend_container)
@@ -4122,6 +7025,96 @@ class MainMenu(QWidget):
             import threading as _threading
             _threading.Thread(target=_buscar_pendentes, daemon=True).start()
 
+            # ── Conflitos de gatilhos ─────────────────────────────────────────
+            conf_row = QHBoxLayout(); conf_row.setContentsMargins(0, 8, 0, 4)
+            lbl_conf = QLabel("Conflitos de gatilhos")
+            lbl_conf.setStyleSheet("font-family:'Inter'; font-size:13px; font-weight:600; color:black; background:transparent; border:none;")
+            conf_row.addWidget(lbl_conf); conf_row.addStretch()
+            btn_conf = QPushButton("Ver")
+            btn_conf.setStyleSheet("QPushButton{font-family:'Inter';font-size:11px;color:#1D1B20;background:transparent;border:none;text-decoration:underline;padding:0;}QPushButton:hover{color:#444;}")
+            btn_conf.setCursor(Qt.CursorShape.PointingHandCursor)
+            conf_row.addWidget(btn_conf)
+            conf_w = QWidget(); conf_w.setStyleSheet("background:transparent;"); conf_w.setLayout(conf_row)
+            self.config_content_layout.addWidget(conf_w)
+
+            lbl_conflitos = QLabel()
+            lbl_conflitos.setWordWrap(True)
+            lbl_conflitos.setStyleSheet("font-family:'Inter'; font-size:11px; color:#1D1B20; background:transparent; border:none;")
+            lbl_conflitos.setVisible(False)
+            self.config_content_layout.addWidget(lbl_conflitos)
+
+            def _ver_conflitos():
+                visivel = not lbl_conflitos.isVisible()
+                if visivel:
+                    setor = self.user_data['setor']
+                    linhas = RegistroGatilhos(self.firebase.get_templates_setor(setor),
+                                              self.firebase.get_atalhos_setor(setor),
+                                              self.firebase.get_shortcuts_setor(setor)).relatorio()
+                    lbl_conflitos.setText('\n'.join('• ' + l for l in linhas) if linhas
+                                          else "Nenhum conflito entre os gatilhos do setor.")
+                lbl_conflitos.setVisible(visivel)
+                btn_conf.setText("Ocultar" if visivel else "Ver")
+
+            btn_conf.clicked.connect(_ver_conflitos)
+
+        # ── Seção: Diagnóstico de rede ────────────────────────────────────────
+        linha_diag = QFrame(); linha_diag.setFrameShape(QFrame.Shape.HLine)
+        linha_diag.setStyleSheet("color:#C0C0C0; background:#C0C0C0; border:none; max-height:1px;")
+        self.config_content_layout.addWidget(linha_diag)
+
+        diag_row = QHBoxLayout(); diag_row.setContentsMargins(0, 4, 0, 4)
+        lbl_diag = QLabel("Requisições ao Firebase")
+        lbl_diag.setStyleSheet("font-family:'Inter'; font-size:14px; font-weight:600; color:black; background:transparent; border:none;")
+        diag_row.addWidget(lbl_diag); diag_row.addStretch()
+        estilo_link = "QPushButton{font-family:'Inter';font-size:11px;color:#1D1B20;background:transparent;border:none;text-decoration:underline;padding:0;}QPushButton:hover{color:#444;}"
+        btn_diag_ver = QPushButton("Ver"); btn_diag_ver.setStyleSheet(estilo_link)
+        btn_diag_ver.setCursor(Qt.CursorShape.PointingHandCursor)
+        btn_diag_salvar = QPushButton("Salvar em arquivo"); btn_diag_salvar.setStyleSheet(estilo_link)
+        btn_diag_salvar.setCursor(Qt.CursorShape.PointingHandCursor)
+        diag_row.addWidget(btn_diag_ver); diag_row.addWidget(btn_diag_salvar)
+        diag_w = QWidget(); diag_w.setStyleSheet("background:transparent;"); diag_w.setLayout(diag_row)
+        self.config_content_layout.addWidget(diag_w)
+
+        lbl_tabela = QLabel()
+        lbl_tabela.setTextFormat(Qt.TextFormat.RichText)
+        lbl_tabela.setStyleSheet("font-family:'Inter'; font-size:11px; color:#1D1B20; background:transparent; border:none;")
+        lbl_tabela.setVisible(False)
+        self.config_content_layout.addWidget(lbl_tabela)
+
+        def _tabela_telemetria():
+            resumo = self.firebase.telemetria.resumo(janela=600)
+            if not resumo:
+                return "Nenhuma requisição nos últimos 10 min."
+            linhas = "".join(
+                f"<tr><td>{op}</td><td align='right'>{d['chamadas']}</td><td align='right'>{d['erros']}</td>"
+                f"<td align='right'>{d['p50_ms']:.0f}</td><td align='right'>{d['p95_ms']:.0f}</td>"
+                f"<td align='right'>{d['recebidos'] / 1024:.1f}</td></tr>"
+                for op, d in list(resumo.items())[:12])
+            return ("<b>Últimos 10 min</b><table cellspacing='0' cellpadding='2'>"
+                    "<tr><th align='left'>operação</th><th>n</th><th>erros</th><th>p50 ms</th>"
+                    "<th>p95 ms</th><th>KB rec.</th></tr>" + linhas + "</table>")
+
+        def _ver_telemetria():
+            visivel = not lbl_tabela.isVisible()
+            if visivel:
+                lbl_tabela.setText(_tabela_telemetria())
+            lbl_tabela.setVisible(visivel)
+            btn_diag_ver.setText("Ocultar" if visivel else "Ver")
+
+        def _salvar_telemetria():
+            caminho = 'at_telemetria.json'
+            try:
+                self.firebase.telemetria.salvar(caminho, {'diagnostico': self.firebase.diagnostico(),
+                                                          'latencia_expansao': rastreio.resumo()})
+            except OSError as e:
+                QMessageBox.critical(self, "Erro", f"Não foi possível salvar: {e}")
+                return
+            self._notification = NotificationWidget(f'✓ Salvo em {caminho}')
+            self._notification.show()
+
+        btn_diag_ver.clicked.connect(_ver_telemetria)
+        btn_diag_salvar.clicked.connect(_salvar_telemetria)
+
         self.config_content_layout.addStretch()
         self.stack.setCurrentIndex(1)
 
@@ -4130,28 +7123,31 @@ class MainMenu(QWidget):
         container = getattr(self, '_uc_container_ref', None)
         if lay is None or container is None:
             return
+        self._usuarios_todos = list(todos)
 
         while lay.count():
             item = lay.takeAt(0)
             if item.widget(): item.widget().deleteLater()
 
         meu_uid = self.user_data.get('uid', '')
-        outros = [u for u in todos if str(u.get('uid','')) != meu_uid]
+        outros = [u for u in self._usuarios_todos if str(u.get('uid','')) != meu_uid]
 
         if not outros:
             vazio = QLabel("Nenhum outro usuário cadastrado.")
             vazio.setStyleSheet("font-family:'Inter'; font-size:11px; color:#888; background:transparent; border:none; padding-left:8px;")
             lay.addWidget(vazio)
         else:
+            itens = []
             for u in outros:
                 _uid      = str(u.get('uid', ''))
                 _nome     = u.get('nome', '?')
                 _setor    = u.get('setor', '')
                 _is_admin = u.get('is_admin', False)
                 row = QHBoxLayout(); row.setContentsMargins(0, 5, 0, 5); row.setSpacing(6)
-                lbl = QLabel(f"{_nome} - {_setor}")
-                lbl.setStyleSheet("font-family:'Inter'; font-size:12px; color:black; background:transparent; border:none;")
-                row.addWidget(lbl); row.addStretch()
+                chk = QCheckBox(f"{_nome} - {_setor}")
+                chk.setStyleSheet(self._ESTILO_CHECK_LOTE)
+                row.addWidget(chk); row.addStretch()
+                itens.append((chk, u))
                 btn_admin = QPushButton("Tornar admin")
                 btn_admin.setStyleSheet("QPushButton{font-family:'Inter';font-size:12px;color:#1D1B20;background:transparent;border:none;text-decoration:underline;}QPushButton:hover{color:#444;}")
                 btn_admin.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -4171,6 +7167,21 @@ class MainMenu(QWidget):
                 rw = QWidget(); rw.setStyleSheet("background:transparent;"); rw.setLayout(row)
                 lay.addWidget(rw)
 
+            if len(outros) > 1:
+                def _admin_lote(usuarios):
+                    usuarios = [u for u in usuarios if not u.get('is_admin', False)]
+                    if usuarios:
+                        show_confirm(self, f'Tornar {len(usuarios)} usuários administradores?',
+                                     lambda: self._do_admin_lote(usuarios))
+                def _excluir_lote(usuarios):
+                    if usuarios:
+                        show_confirm(self, f'Excluir {len(usuarios)} usuários?',
+                                     lambda: self._do_excluir_lote(usuarios))
+                lay.insertWidget(0, self._barra_lote(itens, [
+                    ("Tornar admin", "#1D1B20", _admin_lote),
+                    ("Excluir", "#900B09", _excluir_lote),
+                ]))
+
         container.adjustSize()
         container.updateGeometry()
         if container.isVisible():
@@ -4179,17 +7190,149 @@ class MainMenu(QWidget):
         if hasattr(self, 'scroll_area'):
             self.scroll_area.widget().adjustSize()
 
+    _ESTILO_CHECK_LOTE = "QCheckBox{font-family:'Inter';font-size:12px;color:black;background:transparent;border:none;}QCheckBox::indicator{width:13px;height:13px;border:2px solid #1D1B20;border-radius:3px;background:white;}QCheckBox::indicator:checked{background:#499714;border:2px solid #499714;}"
+
+    def _barra_lote(self, itens, acoes):
+        """Linha 'Todos' + botões que agem sobre os usuários marcados.
+        itens: [(QCheckBox, usuario)]; acoes: [(texto, cor, callback(lista_de_usuarios))]."""
+        bar = QWidget(); bar.setStyleSheet("background:transparent;")
+        row = QHBoxLayout(bar); row.setContentsMargins(0, 0, 0, 2); row.setSpacing(8)
+        chk_todos = QCheckBox("Todos")
+        chk_todos.setStyleSheet(self._ESTILO_CHECK_LOTE)
+        row.addWidget(chk_todos); row.addStretch()
+
+        def _marcados():
+            return [u for chk, u in itens if chk.isChecked()]
+
+        botoes = []
+        for texto, cor, callback in acoes:
+            b = QPushButton(texto)
+            b.setStyleSheet(f"QPushButton{{font-family:'Inter';font-size:11px;color:{cor};background:transparent;border:none;text-decoration:underline;}}QPushButton:disabled{{color:#aaa;}}")
+            b.setCursor(Qt.CursorShape.PointingHandCursor)
+            b.clicked.connect(lambda checked=False, cb=callback: cb(_marcados()))
+            row.addWidget(b); botoes.append(b)
+
+        def _atualizar():
+            marcados = len(_marcados())
+            for b in botoes: b.setEnabled(marcados > 0)
+            chk_todos.blockSignals(True)
+            chk_todos.setChecked(marcados == len(itens))
+            chk_todos.blockSignals(False)
+
+        def _todos(marcar):
+            for chk, _ in itens:
+                chk.blockSignals(True); chk.setChecked(marcar); chk.blockSignals(False)
+            _atualizar()
+
+        chk_todos.clicked.connect(_todos)
+        for chk, _ in itens:
+            chk.toggled.connect(lambda checked=False: _atualizar())
+        _atualizar()
+        return bar
+
+    def _adicionar_aprovados(self, usuarios):
+        todos = getattr(self, '_usuarios_todos', None)
+        if todos is None:
+            return  # lista ainda carregando — já virá do servidor com os aprovados
+        for u in usuarios:
+            todos.append({**u, 'aprovado': True, 'is_admin': False})
+        self._on_usuarios_loaded(todos)
+
     def _do_admin(self, uid, nome):
-        self.firebase.promote_to_admin(uid)
-        self._notification = NotificationWidget(f'✓ {nome} é admin agora!')
+        self._do_admin_lote([{'uid': uid, 'nome': nome}])
+
+    def _do_admin_lote(self, usuarios):
+        uids = {str(u.get('uid', '')) for u in usuarios}
+        if not self.firebase.promote_users_to_admin(list(uids)):
+            QMessageBox.critical(self, "Erro", "Falha ao salvar. Verifique sua conexão.")
+            return
+        msg = (f'✓ {usuarios[0].get("nome", "?")} é admin agora!' if len(usuarios) == 1
+               else f'✓ {len(usuarios)} usuários são admins agora!')
+        self._notification = NotificationWidget(msg)
         self._notification.show()
-        self.show_config_tab()
+        todos = getattr(self, '_usuarios_todos', None) or []
+        for u in todos:
+            if str(u.get('uid', '')) in uids:
+                u['is_admin'] = True
+        self._on_usuarios_loaded(todos)
 
     def _do_excluir_user(self, uid, nome):
-        self.firebase.delete_user(uid)
-        self._notification = NotificationWidget(f'✗ {nome} excluído!')
+        self._do_excluir_lote([{'uid': uid, 'nome': nome}])
+
+    def _do_excluir_lote(self, usuarios):
+        uids = {str(u.get('uid', '')) for u in usuarios}
+        if not self.firebase.delete_users(list(uids)):
+            QMessageBox.critical(self, "Erro", "Falha ao excluir. Verifique sua conexão.")
+            return
+        msg = (f'✗ {usuarios[0].get("nome", "?")} excluído!' if len(usuarios) == 1
+               else f'✗ {len(usuarios)} usuários excluídos!')
+        self._notification = NotificationWidget(msg)
         self._notification.show()
-        self.show_config_tab()
+        todos = getattr(self, '_usuarios_todos', None) or []
+        self._on_usuarios_loaded([u for u in todos if str(u.get('uid', '')) not in uids])
+
+    def _na_ui_e_esperar(self, funcao):
+        """Roda funcao na thread da UI e devolve o resultado; para threads de trabalho que
+        precisam de algo que só a UI pode tocar (ex.: a área de transferência)."""
+        pronto, resultado = threading.Event(), []
+        def rodar():
+            try:
+                resultado.append(funcao())
+            finally:
+                pronto.set()
+        self._na_ui.emit(rodar)
+        pronto.wait(5)
+        return resultado[0] if resultado else None
+
+    def _verificar_atalhos(self):
+        """Simula (sem mexer em nada) todos os atalhos e shortcuts do setor com o perfil de
+        velocidade atual e mostra os que dão erro e os mais lentos."""
+        setor  = self.user_data['setor']
+        config = self.firebase.config
+        resultados = simular_atalhos(self.firebase.get_atalhos_setor(setor) + self.firebase.get_shortcuts_setor(setor),
+                                     config.obter('velocidade'), config.obter('velocidade_fator'))
+        QMessageBox.information(self, "Verificar atalhos", relatorio_simulacao(resultados))
+
+    def _calibrar_velocidade(self):
+        """Esconde o menu e, 3 s depois, roda calibrar_velocidade no campo que estiver focado,
+        numa thread (são uns 10 s de pausas e teclas); só a área de transferência passa pela UI."""
+        self.hide()
+        clipboard = QApplication.clipboard()
+        anterior = clipboard.text()
+
+        def terminar(msg, fator):
+            clipboard.setText(anterior)
+            if fator is not None:
+                self.firebase.set_config('velocidade_fator', fator)
+                self.firebase.set_config('velocidade', 'calibrado')
+            self.show()
+            self._notification = NotificationWidget(msg)
+            self._notification.show()
+            if MainMenu._last_tab == 'config':
+                self.show_config_tab()  # atualiza o combo de velocidade
+
+        def rodar():
+            gravacao_ativa.set()  # o listener não deve reagir ao texto de teste
+            fator = None
+            try:
+                fator = calibrar_velocidade(KeyboardController(),
+                                            lambda: self._na_ui_e_esperar(clipboard.text),
+                                            lambda: self._na_ui_e_esperar(clipboard.clear))
+                msg = (f'✓ Calibrado: {1 / fator:.1f}x o normal' if fator is not None
+                       else '✗ O aplicativo não acompanhou nem o perfil normal')
+            except CampoOcupado:
+                msg = '✗ O campo não estava vazio; nada foi apagado'
+            except Exception as e:
+                msg = f'✗ Erro na calibração: {e}'
+            finally:
+                gravacao_ativa.clear()
+            self._na_ui.emit(lambda: terminar(msg, fator))
+
+        def comecar():
+            _carregar_pynput()
+            threading.Thread(target=rodar, daemon=True).start()
+
+        QTimer.singleShot(3000, comecar)
 
     def do_logout(self):
         self.firebase.logout()
@@ -4247,9 +7390,28 @@ class MainMenu(QWidget):
         if tab == 'templates':
             source = (self.firebase.get_templates_meus(uid) if apenas_meus
                       else self.firebase.get_templates_setor(setor))
-            filtered = [t for t in source if q in t['nome'].lower() or q in t['texto'].lower()]
+            filtered = [t for t in source if q in t.nome_lower or q in t.texto_lower]
             self._on_templates_loaded(filtered, apenas_meus)
 
+    def _on_evento_feed(self, tipo, colecao, registro):
+        self._feed_alterado.emit(colecao)  # thread do feed → thread da UI
+
+    def _on_gravacao_terminada(self, acoes):
+        self._gravador = None
+        ao_gravar = getattr(self, '_ao_gravar', None)
+        if ao_gravar:
+            ao_gravar(acoes)
+
+    def _on_feed_alterado(self, colecao):
+        aba = 'templates' if colecao == 'templates' else 'atalhos'
+        if (self.isVisible() and self.stack.currentIndex() == 0 and not self._search_open
+                and MainMenu._last_tab == aba):
+            self._timer_feed.start(300)  # junta rajadas de eventos num único recarregamento
+
+    def _recarregar_por_feed(self):
+        if self.isVisible() and self.stack.currentIndex() == 0 and not self._search_open:
+            self._reload_current_tab()
+
     def _reload_current_tab(self):
         if MainMenu._last_tab == 'templates':
             sub = MainMenu._last_sub_tab_templates
@@ -4342,13 +7504,17 @@ class EditTemplateWindow(QWidget):
 # main
 # ---------------------------------------------------------------------------
 def main():
+    perfil_inicio.marcar('definições do módulo')
     app = QApplication(sys.argv)
+    perfil_inicio.marcar('QApplication')
     firebase = FirebaseAuth()
+    perfil_inicio.marcar('FirebaseAuth')
 
     global circle
     circle = None
 
     login_window = LoginWindow(firebase)
+    perfil_inicio.marcar('LoginWindow')
 
     def on_login_success(user_data):
         global circle
@@ -4360,6 +7526,17 @@ def main():
 
     login_window.login_success.connect(on_login_success)
     login_window.show()
+    perfil_inicio.marcar('LoginWindow.show')
+
+    def apos_primeiro_paint():
+        perfil_inicio.marcar('primeiro paint')
+        if perfil_inicio.ativo:
+            print(perfil_inicio.relatorio(), file=sys.stderr)
+            app.quit()
+            return
+        threading.Thread(target=_aquecer_imports, daemon=True).start()
+
+    QTimer.singleShot(0, apos_primeiro_paint)
     sys.exit(app.exec())
 
 
@@ -0,0 +1,292 @@
+"""
+Benchmarks dos caminhos quentes, sem tela e sem rede.
+
+    python bench.py                 # roda tudo, compara com o histórico e grava o resultado
+    python bench.py --rapido        # menos repetições (para conferir rápido)
+    python bench.py --limite 0.3    # regressão só acima de +30%
+    python bench.py --nao-gravar    # compara sem acrescentar ao histórico
+
+Usa a plataforma offscreen do Qt, FirestoreFake no lugar do Firebase e controllers falsos
+no lugar do pynput (nada é digitado nem clicado de verdade).
+
+Cada execução vira uma linha em bench_history.jsonl, ao lado deste arquivo. A referência de cada medida é a
+mediana das últimas execuções; se a mediana atual passar da referência por mais que
+--limite, a medida é listada como regressão e o script sai com código 1.
+"""
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+    os.environ.setdefault('PYNPUT_BACKEND', 'dummy')  # sem X: o pynput não consegue abrir o display
+
+try:
+    import firebase_config  # noqa: F401
+except ImportError:
+    # o bench não fala com o Firebase de verdade; só o import do app precisa existir
+    sys.modules['firebase_config'] = types.SimpleNamespace(
+        FIREBASE_CONFIG={'apiKey': 'bench', 'projectId': 'bench'}, SETORES=['Bench'])
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QPixmap
+from pynput.keyboard import Key, KeyCode
+
+import assistivetouch as at
+from fake_firestore import FirestoreFake
+
+HISTORICO   = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_history.jsonl')
+REFERENCIA  = 5     # execuções anteriores usadas na referência
+SETOR       = 'Bench'
+# fila offline e config de cada FirebaseAuth do bench; nunca o at_config.json do app
+_PASTA      = tempfile.TemporaryDirectory(prefix='assistivetouch-bench-')
+
+
+class ControladorFake:
+    """Faz as vezes de pynput.keyboard.Controller e pynput.mouse.Controller: só conta as chamadas."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self.position = (0, 0)
+
+    def press(self, *_):
+        self.chamadas += 1
+
+    def release(self, *_):
+        self.chamadas += 1
+
+    def type(self, texto):
+        self.chamadas += len(texto)
+
+    def click(self, *_):
+        self.chamadas += 1
+
+    def scroll(self, *_):
+        self.chamadas += 1
+
+    def pressed(self, *_):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+def medir(fn, repeticoes, aquecimento=3):
+    """Mediana e p95 (segundos) de fn() em repeticoes chamadas."""
+    for _ in range(aquecimento):
+        fn()
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+    tempos.sort()
+    return {'mediana': statistics.median(tempos), 'p95': tempos[int(0.95 * (len(tempos) - 1))]}
+
+
+# ── dados ────────────────────────────────────────────────────────────────────
+def _templates(n):
+    return ({'nome': f'Template {i}', 'texto': f'Olá, este é o texto padrão número {i}. ' * 4,
+             'atalho': f'//t{i}', 'usuario_id': 'bench', 'setor': SETOR, 'compartilhado': True}
+            for i in range(n))
+
+
+def _atalhos(n):
+    return ({'titulo': f'Atalho {i}', 'comando_tipo': 'shortcut', 'comando_valor': f'/a{i}',
+             'acoes': [{'tipo': 'click', 'x': i, 'y': i, 'botao': 'E'}, {'tipo': 'esperar', 'ms': 10}],
+             'ativo': True, 'usuario_id': 'bench', 'setor': SETOR, 'compartilhado': True}
+            for i in range(n))
+
+
+def preparar_firebase(n_templates, n_atalhos):
+    fake = FirestoreFake(seed=42)
+    pasta = tempfile.mkdtemp(dir=_PASTA.name)
+    firebase = at.FirebaseAuth(transporte=fake, arq_outbox=os.path.join(pasta, 'outbox.json'),
+                               arq_config=os.path.join(pasta, 'config.json'))
+    firebase.signup('bench@bench', 'bench123', 'Bench', SETOR)
+    fake.semear('templates', _templates(n_templates))
+    fake.semear('atalhos', _atalhos(n_atalhos))
+    return fake, firebase
+
+
+# ── casos ────────────────────────────────────────────────────────────────────
+def bench_decodificacao(reps):
+    fake, firebase = preparar_firebase(10_000, 0)
+    r = medir(lambda: firebase._query_templates('setor', SETOR), max(3, reps // 10), aquecimento=1)
+    # por documento, para a medida não depender do tamanho do lote
+    return {'decodificar_runquery_por_doc': {k: v / 10_000 for k, v in r.items()}}
+
+
+def bench_teclado(reps, firebase):
+    user = {'uid': 'bench', 'setor': SETOR, 'nome': 'Bench'}
+    listener = at.KeyboardListener(firebase, user, keyboard_controller=ControladorFake(),
+                                   mouse_controller=ControladorFake())
+    listener.atualizar_registro()  # sem start(): a thread que mantém o registro não roda
+    letras = [KeyCode.from_char(c) for c in 'palavra']
+
+    def tecla():
+        listener.on_key_press(letras[0])
+
+    def palavra_sem_match():
+        for k in letras:
+            listener.on_key_press(k)
+        listener.on_key_press(Key.space)  # a palavra não está no registro de gatilhos
+
+    def so_match():
+        listener.check_text_shortcuts(None, 'xyz')  # desce a trie e não acha gatilho
+
+    return {
+        'tecla_caractere':        medir(tecla, reps * 10),
+        'tecla_espaco_sem_match': medir(palavra_sem_match, reps),
+        'check_text_shortcuts':   medir(so_match, reps),
+    }
+
+
+def bench_simulacao(reps, firebase):
+    atalhos = firebase.get_atalhos_setor(SETOR)
+    config  = firebase.config
+    r = medir(lambda: at.simular_atalhos(atalhos, config.obter('velocidade'), config.obter('velocidade_fator')),
+              max(3, reps // 10), aquecimento=1)
+    # por atalho, como na decodificação
+    return {'simular_atalho': {k: v / max(1, len(atalhos)) for k, v in r.items()}}
+
+
+def bench_busca_popup(reps, firebase):
+    user = {'uid': 'bench', 'setor': SETOR, 'nome': 'Bench'}
+    popup = at.TemplatesPopup(firebase, user, None)
+    consultas = ['t', 'te', 'tex', 'text', 'texto', 'texto p', 'número 9']
+    i = [0]
+
+    def busca():
+        popup.update_search(consultas[i[0] % len(consultas)])
+        i[0] += 1
+
+    r = medir(busca, reps)
+    popup.close()
+    return {'popup_update_search': r}
+
+
+def bench_render_templates(reps, app):
+    saida = {}
+    user = {'uid': 'bench', 'setor': SETOR, 'nome': 'Bench', 'is_admin': False}
+    for n in (100, 1_000):
+        _, firebase = preparar_firebase(n, 0)
+        lista = firebase._query_templates('setor', SETOR)
+        menu = at.MainMenu(firebase, user)
+
+        def render():
+            menu._on_templates_loaded(lista, True)
+            app.processEvents()
+
+        saida[f'render_templates_{n}'] = medir(render, max(3, reps // (n // 100)), aquecimento=1)
+        menu.close()
+        menu.deleteLater()
+        app.processEvents()
+    return saida
+
+
+def bench_overlay(reps, app, firebase):
+    user = {'uid': 'bench', 'setor': SETOR, 'nome': 'Bench', 'is_admin': False}
+    menu = at.MainMenu(firebase, user)
+    menu.resize(450, 520)
+    overlay = at.OverlayDialog(menu)
+    alvo = QPixmap(overlay.size())
+
+    r = medir(lambda: overlay.render(alvo), reps)
+    overlay.close(); menu.close()
+    app.processEvents()
+    return {'overlay_paint': r}
+
+
+# ── histórico ────────────────────────────────────────────────────────────────
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def carregar_historico(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return [json.loads(l) for l in f if l.strip()]
+    except OSError:
+        return []
+
+
+def comparar(resultados, historico, limite):
+    """Lista de (medida, referência, atual) que pioraram mais que o limite."""
+    regressoes = []
+    anteriores = historico[-REFERENCIA:]
+    for nome, r in resultados.items():
+        valores = [h['resultados'][nome]['mediana'] for h in anteriores if nome in h.get('resultados', {})]
+        if not valores:
+            continue
+        ref = statistics.median(valores)
+        if r['mediana'] > ref * (1 + limite):
+            regressoes.append((nome, ref, r['mediana']))
+    return regressoes
+
+
+def _fmt(s):
+    return f"{s * 1e6:9.1f} µs" if s < 1e-3 else f"{s * 1e3:9.2f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--repeticoes', type=int, default=50)
+    ap.add_argument('--rapido', action='store_true', help='10 repetições por caso')
+    ap.add_argument('--limite', type=float, default=0.2, help='regressão tolerada (0.2 = +20%%)')
+    ap.add_argument('--historico', default=HISTORICO)
+    ap.add_argument('--nao-gravar', action='store_true')
+    args = ap.parse_args()
+    reps = 10 if args.rapido else args.repeticoes
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    _, firebase = preparar_firebase(1_000, 1_000)
+
+    resultados = {}
+    resultados.update(bench_decodificacao(reps))
+    resultados.update(bench_teclado(reps, firebase))
+    resultados.update(bench_simulacao(reps, firebase))
+    resultados.update(bench_busca_popup(reps, firebase))
+    resultados.update(bench_render_templates(reps, app))
+    resultados.update(bench_overlay(reps, app, firebase))
+
+    historico  = carregar_historico(args.historico)
+    regressoes = comparar(resultados, historico, args.limite)
+
+    for nome, r in resultados.items():
+        print(f"{nome:32s} mediana {_fmt(r['mediana'])}   p95 {_fmt(r['p95'])}")
+
+    if not args.nao_gravar:
+        with open(args.historico, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'em':         time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commit':     _commit_atual(),
+                'python':     platform.python_version(),
+                'plataforma': platform.platform(),
+                'resultados': resultados,
+            }) + '\n')
+
+    if regressoes:
+        print(f"\nRegressões acima de {args.limite:.0%}:")
+        for nome, ref, atual in regressoes:
+            print(f"  {nome:32s} {_fmt(ref)} → {_fmt(atual)}  (+{atual / ref - 1:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""
+Firestore + Identity Toolkit em memória, no mesmo formato REST que o FirebaseAuth usa.
+
+Serve para testes e benchmarks sem rede:
+
+    from fake_firestore import FirestoreFake
+    fake = FirestoreFake(latencia=0.02, taxa_falha=0.05)
+    fake.semear('templates', ({'nome': f't{i}', 'setor': 'SAC', ...} for i in range(100_000)))
+    firebase = FirebaseAuth(transporte=fake, arq_outbox='/tmp/outbox.json')
+
+Cobre: signUp, signInWithPassword, sendOobCode, refresh do securetoken, GET/PATCH/DELETE de
+documento (com updateMask e currentDocument), POST de criação, listagem de coleção,
+runQuery (fieldFilter, compositeFilter AND/OR, unaryFilter, select, orderBy, limit),
+runAggregationQuery (COUNT), batchGet, beginTransaction e commit (pré-condições, transformação REQUEST_TIME e
+transações otimistas que abortam com 409 se um documento lido mudou).
+"""
+import json
+import time
+import random
+import string
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+import requests
+
+
+class RespostaFake:
+    """O pedaço de requests.Response que o FirebaseAuth usa."""
+
+    def __init__(self, status_code, corpo=None, headers=None):
+        self.status_code = status_code
+        self.headers     = headers or {}
+        self.content     = json.dumps(corpo if corpo is not None else {}).encode('utf-8')
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class PedidoFake:
+    """O pedaço de requests.PreparedRequest que o TransporteMedido lê: o corpo serializado."""
+
+    def __init__(self, json_=None, data=None):
+        self._json = json_
+        self._data = data
+
+    @property
+    def body(self):
+        if self._json is not None:
+            return json.dumps(self._json).encode('utf-8')
+        if isinstance(self._data, dict):
+            return urlencode(self._data)
+        return self._data
+
+
+def _erro(status, codigo, mensagem):
+    return RespostaFake(status, {"error": {"code": status, "status": codigo, "message": mensagem}})
+
+
+# ordem entre tipos diferentes, como no Firestore
+_ORDEM_TIPOS = ('nullValue', 'booleanValue', 'integerValue', 'doubleValue', 'timestampValue',
+                'stringValue', 'bytesValue', 'referenceValue', 'geoPointValue',
+                'arrayValue', 'mapValue')
+
+
+def _chave(valor):
+    """Chave de comparação de um valor tipado do Firestore."""
+    tipo, v = next(iter(valor.items()))
+    if tipo in ('integerValue', 'doubleValue'):
+        return (2, float(v))  # números se comparam entre si
+    if tipo == 'arrayValue':
+        return (_ORDEM_TIPOS.index(tipo), tuple(_chave(x) for x in v.get('values', [])))
+    if tipo == 'mapValue':
+        campos = v.get('fields', {})
+        return (_ORDEM_TIPOS.index(tipo), tuple((k, _chave(campos[k])) for k in sorted(campos)))
+    if tipo == 'geoPointValue':
+        return (_ORDEM_TIPOS.index(tipo), (v.get('latitude', 0), v.get('longitude', 0)))
+    return (_ORDEM_TIPOS.index(tipo), v)
+
+
+class FirestoreFake:
+    """Transporte no formato do requests (request(metodo, url, **kwargs)) que responde em memória.
+
+    latencia/jitter: segundos somados a cada chamada.
+    taxa_falha:      probabilidade de responder status_falha (503 por padrão).
+    offline:         True faz toda chamada levantar requests.ConnectionError.
+    falhar_proximas(n): as próximas n chamadas falham, independente da taxa.
+    """
+
+    def __init__(self, latencia=0.0, jitter=0.0, taxa_falha=0.0, status_falha=503, seed=None):
+        self.latencia     = latencia
+        self.jitter       = jitter
+        self.taxa_falha   = taxa_falha
+        self.status_falha = status_falha
+        self.offline      = False
+        self.chamadas     = 0
+        self._falhar      = 0
+        self._rand        = random.Random(seed)
+        self._lock        = threading.RLock()
+        self._docs        = {}  # caminho "colecao/id" → {'fields', 'createTime', 'updateTime'}
+        self._contas      = {}  # email → {'senha', 'uid'}
+        self._tokens      = {}  # idToken → uid
+        self._refresh     = {}  # refreshToken → uid
+        self._transacoes  = {}  # id → {caminho: updateTime lido (None = não existia)}
+        self._ultimo_ts   = 0.0
+        self._banco       = 'projects/fake/databases/(default)'  # do pedido em andamento (ver _nome)
+
+    # ── controle ─────────────────────────────────────────────────────────────
+    def falhar_proximas(self, n, status=None):
+        with self._lock:
+            self._falhar = n
+            if status is not None:
+                self.status_falha = status
+
+    def expirar_tokens(self):
+        """Invalida todos os idTokens emitidos (o próximo uso recebe 401)."""
+        with self._lock:
+            self._tokens.clear()
+
+    def semear(self, colecao, registros, campos_tipados=False):
+        """Insere documentos direto no armazenamento, sem latência nem falha.
+        registros: dicts de campos (python) ou, com campos_tipados, já no formato do Firestore."""
+        ids = []
+        with self._lock:
+            for dados in registros:
+                doc_id = self._novo_id()
+                ts = self._carimbo()
+                fields = dados if campos_tipados else {k: _codificar(v) for k, v in dados.items()}
+                self._docs[f"{colecao}/{doc_id}"] = {'fields': fields, 'createTime': ts, 'updateTime': ts}
+                ids.append(doc_id)
+        return ids
+
+    def documento(self, colecao, doc_id):
+        with self._lock:
+            d = self._docs.get(f"{colecao}/{doc_id}")
+            return json.loads(json.dumps(d)) if d else None
+
+    # ── transporte ───────────────────────────────────────────────────────────
+    def request(self, method, url, headers=None, json=None, data=None, params=None,
+                stream=False, timeout=None, **_):
+        resp = self._responder(method, url, headers, json, data, params)
+        resp.request = PedidoFake(json, data)
+        return resp
+
+    def _responder(self, method, url, headers, json, data, params):
+        espera = self.latencia + (self._rand.uniform(0, self.jitter) if self.jitter else 0)
+        if espera:
+            time.sleep(espera)
+        with self._lock:
+            self.chamadas += 1
+            if self.offline:
+                raise requests.ConnectionError("FirestoreFake offline")
+            if self._falhar > 0 or (self.taxa_falha and self._rand.random() < self.taxa_falha):
+                self._falhar = max(0, self._falhar - 1)
+                return _erro(self.status_falha, 'UNAVAILABLE', 'falha injetada')
+
+            partes = urlsplit(url)
+            query  = parse_qs(partes.query)
+            if params:
+                query.update({k: v if isinstance(v, list) else [v] for k, v in params.items()})
+            metodo = method.upper()
+
+            if partes.netloc == 'identitytoolkit.googleapis.com':
+                return self._auth(partes.path.rsplit(':', 1)[-1], json or {})
+            if partes.netloc == 'securetoken.googleapis.com':
+                return self._renovar(data or {})
+
+            token = (headers or {}).get('Authorization', '').removeprefix('Bearer ')
+            if token not in self._tokens:
+                return _erro(401, 'UNAUTHENTICATED', 'token inválido ou expirado')
+
+            banco, _, caminho = partes.path.partition('/documents')
+            self._banco = banco.removeprefix('/v1/').strip('/')  # o projectId do cliente, devolvido nos nomes
+            if caminho.startswith(':'):
+                return self._metodo_documentos(caminho[1:], json or {})
+            return self._documento_rest(metodo, caminho.strip('/'), query, json or {})
+
+    # ── auth ─────────────────────────────────────────────────────────────────
+    def _sessao(self, uid):
+        id_token = f"fake-id-{uid}-{self._novo_id()}"
+        refresh  = f"fake-refresh-{uid}-{self._novo_id()}"
+        self._tokens[id_token] = uid
+        self._refresh[refresh] = uid
+        return id_token, refresh
+
+    def _auth(self, acao, corpo):
+        email, senha = corpo.get('email', ''), corpo.get('password', '')
+        if acao == 'signUp':
+            if email in self._contas:
+                return _erro(400, 'INVALID_ARGUMENT', 'EMAIL_EXISTS')
+            uid = self._novo_id(28)
+            self._contas[email] = {'senha': senha, 'uid': uid}
+        elif acao == 'signInWithPassword':
+            conta = self._contas.get(email)
+            if not conta or conta['senha'] != senha:
+                return _erro(400, 'INVALID_ARGUMENT', 'INVALID_LOGIN_CREDENTIALS')
+            uid = conta['uid']
+        elif acao == 'sendOobCode':
+            return RespostaFake(200, {"email": email})
+        else:
+            return _erro(404, 'NOT_FOUND', acao)
+        id_token, refresh = self._sessao(uid)
+        return RespostaFake(200, {"localId": uid, "email": email, "idToken": id_token,
+                                  "refreshToken": refresh, "expiresIn": "3600"})
+
+    def _renovar(self, corpo):
+        uid = self._refresh.get(corpo.get('refresh_token'))
+        if uid is None:
+            return _erro(400, 'INVALID_ARGUMENT', 'INVALID_REFRESH_TOKEN')
+        id_token, refresh = self._sessao(uid)
+        return RespostaFake(200, {"id_token": id_token, "refresh_token": refresh,
+                                  "expires_in": "3600", "user_id": uid})
+
+    # ── documentos ───────────────────────────────────────────────────────────
+    def _nome(self, caminho):
+        return f"{self._banco}/documents/{caminho}"
+
+    def _doc_json(self, caminho):
+        d = self._docs[caminho]
+        return {"name": self._nome(caminho), "fields": d['fields'],
+                "createTime": d['createTime'], "updateTime": d['updateTime']}
+
+    def _documento_rest(self, metodo, caminho, query, corpo):
+        segmentos = caminho.split('/')
+        if len(segmentos) % 2 == 1:  # coleção
+            if metodo == 'GET':
+                prefixo = caminho + '/'
+                docs = [self._doc_json(c) for c in self._docs
+                        if c.startswith(prefixo) and '/' not in c[len(prefixo):]]
+                return RespostaFake(200, {"documents": docs} if docs else {})
+            if metodo == 'POST':
+                caminho = f"{caminho}/{self._novo_id()}"
+                return self._gravar_rest(caminho, corpo.get('fields', {}), None)
+            return _erro(400, 'INVALID_ARGUMENT', metodo)
+
+        existe = caminho in self._docs
+        if metodo == 'GET':
+            return RespostaFake(200, self._doc_json(caminho)) if existe else _erro(404, 'NOT_FOUND', caminho)
+        pre = self._pre_condicao_query(query)
+        erro = self._checar(caminho, pre)
+        if erro:
+            return erro
+        if metodo == 'DELETE':
+            self._docs.pop(caminho, None)
+            return RespostaFake(200, {})
+        if metodo == 'PATCH':
+            mask = query.get('updateMask.fieldPaths')
+            return self._gravar_rest(caminho, corpo.get('fields', {}), mask)
+        return _erro(400, 'INVALID_ARGUMENT', metodo)
+
+    def _gravar_rest(self, caminho, fields, mask):
+        self._aplicar_update(caminho, fields, mask, [])
+        return RespostaFake(200, self._doc_json(caminho))
+
+    @staticmethod
+    def _pre_condicao_query(query):
+        pre = {}
+        if 'currentDocument.exists' in query:
+            pre['exists'] = query['currentDocument.exists'][0].lower() == 'true'
+        if 'currentDocument.updateTime' in query:
+            pre['updateTime'] = query['currentDocument.updateTime'][0]
+        return pre
+
+    def _checar(self, caminho, pre):
+        atual = self._docs.get(caminho)
+        if pre.get('exists') is False and atual is not None:
+            return _erro(409, 'ALREADY_EXISTS', f"Document already exists: {self._nome(caminho)}")
+        if pre.get('exists') is True and atual is None:
+            return _erro(404, 'NOT_FOUND', f"No document to update: {self._nome(caminho)}")
+        if 'updateTime' in pre and (atual is None or atual['updateTime'] != pre['updateTime']):
+            return _erro(400, 'FAILED_PRECONDITION', 'the stored version does not match the required base version')
+        return None
+
+    def _aplicar_update(self, caminho, fields, mask, transforms, ts=None):
+        ts = ts or self._carimbo()
+        atual = self._docs.get(caminho)
+        if mask is None or atual is None:
+            novos = dict(fields) if mask is None else {k: fields[k] for k in mask if k in fields}
+        else:
+            novos = dict(atual['fields'])
+            for campo in mask:
+                if campo in fields:
+                    novos[campo] = fields[campo]
+                else:
+                    novos.pop(campo, None)
+        for t in transforms:
+            if t.get('setToServerValue') == 'REQUEST_TIME':
+                novos[t['fieldPath']] = {"timestampValue": ts}
+        self._docs[caminho] = {'fields': novos, 'updateTime': ts,
+                               'createTime': atual['createTime'] if atual else ts}
+        return ts
+
+    # ── documents:<metodo> ───────────────────────────────────────────────────
+    def _metodo_documentos(self, metodo, corpo):
+        if metodo == 'runQuery':
+            return self._run_query(corpo.get('structuredQuery', {}))
+        if metodo == 'runAggregationQuery':
+            return self._run_aggregation(corpo.get('structuredAggregationQuery', {}))
+        if metodo == 'batchGet':
+            return self._batch_get(corpo)
+        if metodo == 'beginTransaction':
+            tx = self._novo_id()
+            self._transacoes[tx] = {}
+            return RespostaFake(200, {"transaction": tx})
+        if metodo == 'commit':
+            return self._commit(corpo)
+        return _erro(404, 'NOT_FOUND', metodo)
+
+    def _caminho(self, nome):
+        return nome.split('/documents/', 1)[1]
+
+    def _batch_get(self, corpo):
+        tx = corpo.get('transaction')
+        saida = []
+        if 'newTransaction' in corpo:
+            tx = self._novo_id()
+            self._transacoes[tx] = {}
+        elif tx is not None and tx not in self._transacoes:
+            return _erro(400, 'INVALID_ARGUMENT', 'transação inválida')
+        leitura = self._carimbo()
+        for nome in corpo.get('documents', []):
+            caminho = self._caminho(nome)
+            if tx is not None:
+                d = self._docs.get(caminho)
+                self._transacoes[tx][caminho] = d['updateTime'] if d else None
+            item = ({"found": self._doc_json(caminho)} if caminho in self._docs else {"missing": nome})
+            item["readTime"] = leitura
+            saida.append(item)
+        if 'newTransaction' in corpo and saida:
+            saida[0]["transaction"] = tx
+        return RespostaFake(200, saida)
+
+    def _commit(self, corpo):
+        tx = corpo.get('transaction')
+        if tx is not None:
+            lidos = self._transacoes.pop(tx, None)
+            if lidos is None:
+                return _erro(400, 'INVALID_ARGUMENT', 'transação inválida')
+            for caminho, versao in lidos.items():
+                d = self._docs.get(caminho)
+                if (d['updateTime'] if d else None) != versao:
+                    return _erro(409, 'ABORTED', 'Transaction lock timeout / contention')
+        writes = corpo.get('writes', [])
+        # valida tudo antes de aplicar: commit é atômico
+        for w in writes:
+            nome = w['update']['name'] if 'update' in w else w.get('delete')
+            erro = self._checar(self._caminho(nome), w.get('currentDocument', {}))
+            if erro:
+                return erro
+        ts = self._carimbo()
+        resultados = []
+        for w in writes:
+            if 'update' in w:
+                caminho = self._caminho(w['update']['name'])
+                mask = w.get('updateMask', {}).get('fieldPaths') if 'updateMask' in w else None
+                self._aplicar_update(caminho, w['update'].get('fields', {}), mask,
+                                     w.get('updateTransforms', []), ts)
+                resultados.append({"updateTime": ts})
+            else:
+                self._docs.pop(self._caminho(w['delete']), None)
+                resultados.append({"updateTime": ts})
+        return RespostaFake(200, {"writeResults": resultados, "commitTime": ts})
+
+    # ── runQuery ─────────────────────────────────────────────────────────────
+    def _run_query(self, q):
+        leitura = self._carimbo()
+        colecoes = {f['collectionId'] for f in q.get('from', [])}
+        docs = [c for c in self._docs if c.rsplit('/', 2)[-2] in colecoes and c.count('/') == 1]
+        filtro = q.get('where')
+        if filtro:
+            docs = [c for c in docs if self._passa(self._docs[c]['fields'], filtro)]
+        for ordem in reversed(q.get('orderBy', [])):
+            campo = ordem['field']['fieldPath']
+            docs.sort(key=lambda c: (campo in self._docs[c]['fields'],
+                                     _chave(self._docs[c]['fields'].get(campo, {'nullValue': None}))),
+                      reverse=ordem.get('direction') == 'DESCENDING')
+        docs = docs[q.get('offset', 0):]
+        if 'limit' in q:
+            docs = docs[:int(q['limit'])]
+        select = q.get('select')
+        saida = []
+        for c in docs:
+            doc = self._doc_json(c)
+            if select is not None:
+                campos = [f['fieldPath'] for f in select.get('fields', []) if f['fieldPath'] != '__name__']
+                doc = dict(doc, fields={k: v for k, v in doc['fields'].items() if k in campos})
+            saida.append({"document": doc, "readTime": leitura})
+        return RespostaFake(200, saida or [{"readTime": leitura}])
+
+    def _run_aggregation(self, q):
+        """Só COUNT, que é o que o FirebaseAuth usa."""
+        docs = [item for item in self._run_query(q.get('structuredQuery', {})).json() if 'document' in item]
+        campos = {a['alias']: {"integerValue": str(len(docs))} for a in q.get('aggregations', []) if 'count' in a}
+        return RespostaFake(200, [{"result": {"aggregateFields": campos}, "readTime": self._carimbo()}])
+
+    def _passa(self, fields, filtro):
+        if 'compositeFilter' in filtro:
+            cf = filtro['compositeFilter']
+            resultados = (self._passa(fields, f) for f in cf.get('filters', []))
+            return any(resultados) if cf.get('op') == 'OR' else all(resultados)
+        if 'unaryFilter' in filtro:
+            uf = filtro['unaryFilter']
+            v = fields.get(uf['field']['fieldPath'])
+            op = uf['op']
+            if v is None:
+                return False
+            if op == 'IS_NULL':
+                return 'nullValue' in v
+            if op == 'IS_NOT_NULL':
+                return 'nullValue' not in v
+            nan = 'doubleValue' in v and v['doubleValue'] != v['doubleValue']
+            return nan if op == 'IS_NAN' else not nan
+        ff = filtro['fieldFilter']
+        campo, op, alvo = ff['field']['fieldPath'], ff['op'], ff['value']
+        v = fields.get(campo)
+        if v is None:
+            return False  # documento sem o campo não entra em nenhum filtro, nem NOT_EQUAL
+        if op == 'ARRAY_CONTAINS':
+            return _chave(alvo) in [_chave(x) for x in v.get('arrayValue', {}).get('values', [])]
+        if op == 'ARRAY_CONTAINS_ANY':
+            dentro = {_chave(x) for x in v.get('arrayValue', {}).get('values', [])}
+            return any(_chave(x) in dentro for x in alvo['arrayValue'].get('values', []))
+        if op in ('IN', 'NOT_IN'):
+            opcoes = {_chave(x) for x in alvo['arrayValue'].get('values', [])}
+            return (_chave(v) in opcoes) == (op == 'IN')
+        a, b = _chave(v), _chave(alvo)
+        if op not in ('EQUAL', 'NOT_EQUAL') and a[0] != b[0]:
+            return False  # desigualdade só compara valores do mesmo tipo
+        return {'EQUAL': a == b, 'NOT_EQUAL': a != b, 'LESS_THAN': a < b,
+                'LESS_THAN_OR_EQUAL': a <= b, 'GREATER_THAN': a > b,
+                'GREATER_THAN_OR_EQUAL': a >= b}[op]
+
+    # ── utilitários ──────────────────────────────────────────────────────────
+    def _novo_id(self, n=20):
+        return ''.join(self._rand.choices(string.ascii_letters + string.digits, k=n))
+
+    def _carimbo(self):
+        """Horário do servidor em RFC 3339; estritamente crescente, como o updateTime real."""
+        agora = max(time.time(), self._ultimo_ts + 1e-6)
+        self._ultimo_ts = agora
+        return datetime.fromtimestamp(agora, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _codificar(v):
+    """Valor python → valor tipado (só o necessário para semear dados de teste)."""
+    if v is None:
+        return {"nullValue": None}
+    if isinstance(v, bool):
+        return {"booleanValue": v}
+    if isinstance(v, int):
+        return {"integerValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    if isinstance(v, datetime):
+        return {"timestampValue": v.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')}
+    if isinstance(v, (list, tuple)):
+        return {"arrayValue": {"values": [_codificar(x) for x in v]}}
+    if isinstance(v, dict):
+        return {"mapValue": {"fields": {k: _codificar(x) for k, x in v.items()}}}
+    return {"stringValue": str(v)}
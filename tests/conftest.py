@@ -0,0 +1,32 @@
+"""Ambiente dos testes: como no bench.py, Qt offscreen, pynput sem display e um
+firebase_config falso quando o do projeto não existe (os testes nunca falam com o Firebase)."""
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+    os.environ.setdefault('PYNPUT_BACKEND', 'dummy')
+
+try:
+    import firebase_config  # noqa: F401
+except ImportError:
+    sys.modules['firebase_config'] = types.SimpleNamespace(
+        FIREBASE_CONFIG={'apiKey': 'teste', 'projectId': 'teste'}, SETORES=['Teste'])
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def firebase_fake(tmp_path):
+    """(FirestoreFake, FirebaseAuth logado nele) com fila offline e config em tmp_path."""
+    import assistivetouch as at
+    from fake_firestore import FirestoreFake
+    fake = FirestoreFake(seed=1)
+    firebase = at.FirebaseAuth(transporte=fake, arq_outbox=str(tmp_path / 'outbox.json'),
+                               arq_config=str(tmp_path / 'config.json'))
+    assert firebase.signup('teste@teste', 'teste123', 'Teste', 'Teste')['success']
+    return fake, firebase
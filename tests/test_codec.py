@@ -0,0 +1,47 @@
+"""Codec de valores do Firestore e decodificação dos registros."""
+from datetime import datetime, timezone
+
+import assistivetouch as at
+
+
+def test_ida_e_volta_de_todos_os_tipos():
+    dados = {
+        'nada': None, 'sim': True, 'nao': False, 'inteiro': -(2 ** 40), 'real': 1.5,
+        'texto': 'olá', 'bytes': b'\x00\xff', 'quando': datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc),
+        'ref': at.Referencia('projects/p/databases/(default)/documents/templates/x'),
+        'geo': at.GeoPoint(-23.5, -46.6), 'lista': [1, 'a', [None, {'k': 2.0}]],
+        'mapa': {'aninhado': {'vazio': {}, 'lista_vazia': []}},
+    }
+    volta = at._fields_to_dict(at._dict_to_fields(dados))
+    assert volta == dados
+    assert type(volta['ref']) is at.Referencia and type(volta['inteiro']) is int
+
+
+def test_inteiro_vai_como_string_e_bool_nao_vira_inteiro():
+    campos = at._dict_to_fields({'n': 7, 'b': True})
+    assert campos == {'n': {'integerValue': '7'}, 'b': {'booleanValue': True}}
+
+
+def test_timestamp_com_nanossegundos_e_sem_fracao():
+    assert at._decodificar_valor({'timestampValue': '2024-01-02T03:04:05.123456789Z'}) == \
+        datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    assert at._decodificar_valor({'timestampValue': '2024-01-02T03:04:05Z'}) == \
+        datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def test_tipo_desconhecido_vira_none():
+    assert at._fields_to_dict({'x': {'tipoNovoValue': 1}}) == {'x': None}
+
+
+def test_registro_com_campo_nulo_usa_o_padrao():
+    t = at.Template.from_doc({'name': 'projects/p/databases/(default)/documents/templates/t1',
+                              'fields': {'atalho': {'nullValue': None}, 'texto': {'nullValue': None},
+                                         'nome': {'stringValue': 'Oi'}}})
+    assert (t.id, t.nome, t.atalho, t.gatilho, t.preview) == ('t1', 'Oi', '', '', '')
+
+
+def test_acoes_do_atalho_em_string_ou_nativas():
+    acoes = [{'tipo': 'click', 'x': 1, 'y': 2, 'botao': 'E', 'qtd': 1}]
+    for valor in ({'stringValue': at.json.dumps(acoes)}, at._codificar_valor(acoes)):
+        a = at.Atalho.from_doc({'name': 'x/atalhos/a1', 'fields': {'acoes': valor}})
+        assert a.acoes == acoes
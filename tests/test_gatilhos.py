@@ -0,0 +1,56 @@
+"""RegistroGatilhos: prioridade entre os formatos e relatório de conflitos."""
+import assistivetouch as at
+
+
+def _doc(classe, id_, **campos):
+    return classe.from_doc({'name': f'x/{classe.__name__.lower()}/{id_}', 'fields': at._dict_to_fields(campos)})
+
+
+def _tpl(id_, atalho):
+    return _doc(at.Template, id_, nome=f'tpl {id_}', atalho=atalho, texto='...')
+
+
+def _atalho(id_, valor, tipo='shortcut', ativo=True):
+    return _doc(at.Atalho, id_, titulo=f'atalho {id_}', comando_tipo=tipo, comando_valor=valor, ativo=ativo)
+
+
+def _shortcut(id_, tecla, ativo=True):
+    return _doc(at.ShortcutAntigo, id_, nome=f'sc {id_}', tecla_atalho=tecla, ativo=ativo)
+
+
+def _conflitos(registro):
+    return sorted((c.tipo, c.gatilho, [r.id for _, r in c.donos]) for c in registro.conflitos)
+
+
+def test_template_encobre_atalho_e_shortcut_com_o_mesmo_gatilho():
+    reg = at.RegistroGatilhos([_tpl('t1', '/oi')], [_atalho('a1', '/OI')], [_shortcut('s1', '/oi')])
+    tipo, dono = reg.buscar('/oi')
+    assert (tipo, dono.id) == ('template', 't1')
+    assert _conflitos(reg) == [('duplicado', '/oi', ['t1', 'a1', 's1'])]
+    assert reg.relatorio() == ['“/oi” está em template “tpl t1”, atalho “atalho a1”, '
+                               'shortcut antigo “sc s1”; só o primeiro dispara.']
+
+
+def test_alt_duplicado_e_inativos_ignorados():
+    reg = at.RegistroGatilhos([], [_atalho('a1', 'q, w', tipo='alt_tecla'), _atalho('a2', 'w', 'alt_tecla', ativo=False)],
+                              [_shortcut('s1', 'q'), _shortcut('s2', '/sem', ativo=False)])
+    assert reg.alt['Q'][1].id == 'a1' and reg.alt['W'][1].id == 'a1'
+    assert reg.buscar('/sem') is None
+    assert _conflitos(reg) == [('alt_duplicado', 'Q', ['a1', 's1'])]
+
+
+def test_gatilhos_que_nunca_disparam():
+    reg = at.RegistroGatilhos([_tpl('t1', 'a//b'), _tpl('t2', 'bom dia')], [], [])
+    assert _conflitos(reg) == [('espaco', 'bom dia', ['t2']), ('popup', 'a//b', ['t1'])]
+
+
+def test_trie_anda_uma_tecla_por_vez():
+    reg = at.RegistroGatilhos([_tpl('t1', 'ab'), _tpl('t2', 'abc')], [], [])
+    no = reg.raiz
+    for c in 'AB':
+        no = at.RegistroGatilhos.avancar(no, c)
+    assert at.RegistroGatilhos.achado(no)[1].id == 't1'
+    assert not at.RegistroGatilhos.unico(no)  # 'abc' continua a partir daqui
+    no = at.RegistroGatilhos.avancar(no, 'c')
+    assert at.RegistroGatilhos.unico(no)
+    assert at.RegistroGatilhos.avancar(no, 'x') is None
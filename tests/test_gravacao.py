@@ -0,0 +1,69 @@
+"""Modo "Aprender": eventos crus do GravadorMacro → ações do atalho."""
+import assistivetouch as at
+
+
+def _tpl(id_, gatilho, texto='TEXTO'):
+    return at.Template.from_doc({'name': f'x/templates/{id_}', 'fields': at._dict_to_fields(
+        {'nome': f'T {gatilho}', 'atalho': gatilho, 'texto': texto})})
+
+
+def _chars(t, texto, passo=0.05):
+    return [('char', t + i * passo, c) for i, c in enumerate(texto)]
+
+
+def test_caracteres_viram_um_digitar_e_backspace_apaga_do_texto():
+    eventos = _chars(0.0, 'olaa') + [('tecla', 0.3, 'backspace')] + _chars(0.35, '!')
+    assert at._compactar_gravacao(eventos) == [{'tipo': 'digitar', 'texto': 'ola!'}]
+
+
+def test_cliques_no_mesmo_ponto_somam_e_arraste_e_pausa():
+    eventos = [
+        ('mouse', 0.0, True, 100, 100, 'E'), ('mouse', 0.05, False, 101, 100, 'E'),
+        ('mouse', 0.2, True, 102, 101, 'E'), ('mouse', 0.25, False, 102, 101, 'E'),
+        ('mouse', 1.55, True, 10, 10, 'E'), ('mouse', 1.85, False, 300, 200, 'E'),
+        ('mouse', 9.0, True, 5, 5, 'D'), ('mouse', 9.1, False, 5, 5, 'D'),
+    ]
+    assert at._compactar_gravacao(eventos) == [
+        {'tipo': 'click', 'botao': 'E', 'qtd': 2, 'x': 100, 'y': 100},
+        {'tipo': 'esperar', 'ms': 1300},
+        {'tipo': 'arraste', 'x1': 10, 'y1': 10, 'x2': 300, 'y2': 200},
+        {'tipo': 'esperar', 'ms': 3000},  # pausa longa limitada a _ESPERA_MAX
+        {'tipo': 'click', 'botao': 'D', 'qtd': 1, 'x': 5, 'y': 5},
+    ]
+
+
+def test_setas_seguidas_somam_qtd():
+    eventos = [('tecla', 0.0, 'seta:Baixo'), ('tecla', 0.1, 'seta:Baixo'), ('tecla', 0.2, 'seta:Baixo'),
+               ('tecla', 0.3, 'enter')]
+    assert at._compactar_gravacao(eventos) == [
+        {'tipo': 'tecla', 'tecla': 'seta', 'seta': 'Baixo', 'qtd': 3}, {'tipo': 'tecla', 'tecla': 'enter'}]
+
+
+def test_gatilho_expandido_vira_acao_de_template():
+    tpl = _tpl('t1', 'ola')
+    assert at._separar_templates('diga ola tchau', [tpl]) == [
+        {'tipo': 'digitar', 'texto': 'diga '},
+        {'tipo': 'template', 'tpl_id': 't1', 'nome': 'T ola', 'texto': 'TEXTO'},
+        {'tipo': 'digitar', 'texto': 'tchau'},
+    ]
+
+
+def test_pontuacao_fica_no_texto_e_meio_de_palavra_nao_conta():
+    tpl = _tpl('t1', 'ola')
+    assert at._separar_templates('ola. hola ola', [tpl]) == [
+        {'tipo': 'template', 'tpl_id': 't1', 'nome': 'T ola', 'texto': 'TEXTO'},
+        {'tipo': 'digitar', 'texto': '. hola ola'},  # sem espaço/pontuação depois, o último não expandiu
+    ]
+
+
+def test_pontuacao_que_continua_outro_gatilho_nao_encerra():
+    curto, longo = _tpl('t1', 'oi'), _tpl('t2', 'oi.tchau')
+    assert at._separar_templates('oi.tchau ', [curto, longo]) == [
+        {'tipo': 'template', 'tpl_id': 't2', 'nome': 'T oi.tchau', 'texto': 'TEXTO'}]
+
+
+def test_compactar_separa_templates_dos_digitar():
+    eventos = _chars(0.0, 'ola fim')
+    acoes = at._compactar_gravacao(eventos, [_tpl('t1', 'ola')])
+    assert [a['tipo'] for a in acoes] == ['template', 'digitar']
+    assert acoes[1]['texto'] == 'fim'
@@ -0,0 +1,114 @@
+"""ExecutorSimulado/simular_atalhos: eventos e durações no relógio virtual."""
+import pytest
+
+import assistivetouch as at
+
+
+def _eventos(resultado):
+    return [(round(e.t, 3), e.dispositivo, e.acao, e.detalhe) for e in resultado.eventos]
+
+
+def test_acoes_antigas_convertidas_com_tempos_legados():
+    acoes = at._converter_acoes_antigas([
+        {'type': 'click', 'x': 10, 'y': 20, 'vezes': 2},
+        {'type': 'drag', 'x1': 1, 'y1': 2, 'x2': 3, 'y2': 4},
+        {'type': 'type', 'text': 'oi'},
+        {'type': 'sleep', 'ms': 200},
+    ])
+    r = at.ExecutorSimulado(at.PERFIL_LEGADO).simular(acoes)
+    assert r.erro == ''
+    assert _eventos(r) == [
+        (0.1,  'mouse', 'mover', (10, 20)),
+        (0.1,  'mouse', 'click', ('left', 1, (10, 20))),
+        (0.2,  'mouse', 'click', ('left', 1, (10, 20))),   # 0.1 s entre cliques repetidos
+        (0.35, 'mouse', 'mover', (1, 2)),
+        (0.45, 'mouse', 'press', 'left'),                  # 0.1 / 0.05 / 0.1 no arraste
+        (0.5,  'mouse', 'mover', (3, 4)),
+        (0.6,  'mouse', 'release', 'left'),
+        (0.65, 'teclado', 'type', 'oi'),
+    ]
+    # + 2 caracteres, o sleep de 200 ms e a pausa depois de cada ação
+    assert r.duracao == pytest.approx(0.65 + 2 * at._SIM_POR_CARACTERE + 0.05 + 0.2 + 0.05)
+
+
+def test_esperar_tecla_sem_limite_segue_quando_a_tecla_chega():
+    acoes = [{'tipo': 'esperar_tecla', 'tecla': 'alt', 'ms': 0,
+              'acoes': [{'tipo': 'digitar', 'texto': 'ok'}]}]
+    r = at.ExecutorSimulado(teclas=['alt']).simular(acoes)
+    assert r.erro == ''
+    assert [(e.acao, e.detalhe) for e in r.eventos] == [('tecla', 'alt'), ('type', 'ok')]
+
+
+def test_esperar_tecla_sem_limite_que_nunca_chega_e_erro():
+    acoes = [{'tipo': 'esperar_tecla', 'tecla': 'alt', 'ms': 0, 'acoes': [{'tipo': 'digitar', 'texto': 'ok'}]}]
+    r = at.ExecutorSimulado(teclas=[]).simular(acoes)
+    assert 'para sempre' in r.erro
+    assert r.eventos == []
+
+
+def test_se_tecla_vai_para_o_senao_quando_o_tempo_acaba():
+    perfil = at.PERFIS_VELOCIDADE['normal']
+    acoes = [{'tipo': 'se_tecla', 'tecla': 'x', 'ms': 500,
+              'acoes': [{'tipo': 'digitar', 'texto': 'sim'}], 'senao': [{'tipo': 'digitar', 'texto': 'nao'}]}]
+    r = at.ExecutorSimulado(teclas=[]).simular(acoes)
+    assert [e.detalhe for e in r.eventos] == ['nao']
+    assert r.eventos[0].t == pytest.approx(perfil.inicio + 0.5)
+
+
+@pytest.mark.parametrize('ao_expirar, erro', [('parar', True), ('seguir', False)])
+def test_aguardar_tela_ao_expirar(ao_expirar, erro):
+    acoes = [{'tipo': 'aguardar_tela', 'x': 0, 'y': 0, 'w': 10, 'h': 10, 'ms': 1000, 'ao_expirar': ao_expirar},
+             {'tipo': 'digitar', 'texto': 'depois'}]
+    r = at.ExecutorSimulado(tela_ms=5000).simular(acoes)
+    perfil = at.PERFIS_VELOCIDADE['normal']
+    assert bool(r.erro) is erro
+    digitados = [e for e in r.eventos if e.acao == 'type']
+    if erro:
+        assert digitados == []
+    else:
+        assert [e.detalhe for e in digitados] == ['depois']
+        assert digitados[0].t == pytest.approx(perfil.inicio + 1.0 + perfil.entre_acoes)
+
+
+def test_aguardar_tela_que_responde_a_tempo_nao_espera_o_limite():
+    acoes = [{'tipo': 'aguardar_tela', 'x': 0, 'y': 0, 'w': 10, 'h': 10, 'ms': 1000}]
+    r = at.ExecutorSimulado(tela_ms=300).simular(acoes)
+    perfil = at.PERFIS_VELOCIDADE['normal']
+    assert r.erro == ''
+    assert r.duracao == pytest.approx(perfil.inicio + 0.3 + perfil.entre_acoes)
+
+
+def test_simular_atalhos_usa_o_perfil_global_e_o_fator():
+    atalhos = [{'titulo': 'a', 'acoes': [{'tipo': 'esperar', 'ms': 100}]},
+               {'titulo': 'b', 'velocidade': 'seguro', 'acoes': [{'tipo': 'esperar', 'ms': 100}]}]
+    normal, seguro = at.PERFIS_VELOCIDADE['normal'], at.PERFIS_VELOCIDADE['seguro']
+    r = dict((t, d) for t, d, _ in at.simular_atalhos(atalhos, 'calibrado', 0.5))
+    assert r['a'] == pytest.approx((normal.inicio + normal.entre_acoes) * 0.5 + 0.1)
+    assert r['b'] == pytest.approx(seguro.inicio + seguro.entre_acoes + 0.1)
+
+
+def test_relatorio_lista_erros_e_os_mais_lentos():
+    texto = at.relatorio_simulacao([('lento', 3.0, ''), ('quebrado', 1.0, 'a tela não respondeu'),
+                                    ('rapido', 0.2, '')], mais_lentos=1)
+    assert 'quebrado: a tela não respondeu' in texto
+    assert 'lento: 3.00 s' in texto and 'rapido' not in texto
+
+
+def test_simular_atalhos_guardados_no_firestore(firebase_fake):
+    fake, firebase = firebase_fake
+    fake.semear('atalhos', [
+        {'titulo': 'rapido', 'comando_tipo': 'shortcut', 'comando_valor': '/r', 'ativo': True,
+         'setor': 'Teste', 'compartilhado': True, 'usuario_id': 'x',
+         'acoes': at.json.dumps([{'tipo': 'click', 'x': 1, 'y': 1, 'botao': 'E', 'qtd': 1}])},
+        {'titulo': 'trava', 'comando_tipo': 'shortcut', 'comando_valor': '/t', 'ativo': True,
+         'setor': 'Teste', 'compartilhado': True, 'usuario_id': 'x',
+         'acoes': [{'tipo': 'esperar_tecla', 'tecla': 'f9', 'ms': 0}]},
+    ])
+    fake.semear('shortcuts', [{'nome': 'antigo', 'tecla_atalho': '/ant', 'ativo': True, 'setor': 'Teste',
+                               'usuario_id': 'x', 'acoes': at.json.dumps([{'type': 'sleep', 'ms': 2000}])}])
+    guardados = firebase.get_atalhos_setor('Teste') + firebase.get_shortcuts_setor('Teste')
+    resultados = at.simular_atalhos(guardados, teclas=[])
+    assert [t for t, _, _ in resultados] == ['antigo', 'rapido', 'trava']
+    erros = {t: e for t, _, e in resultados}
+    assert erros['rapido'] == '' and erros['antigo'] == '' and 'f9' in erros['trava']
+    assert resultados[0][1] == pytest.approx(at.PERFIL_LEGADO.inicio + 2.0 + at.PERFIL_LEGADO.entre_acoes)
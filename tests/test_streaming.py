@@ -0,0 +1,40 @@
+"""_iter_json_array: o array do runQuery decodificado enquanto chega, em qualquer corte."""
+import json
+
+import pytest
+
+import assistivetouch as at
+
+_ITENS = [{"document": {"name": "a", "fields": {"texto": {"stringValue": "olá, [ação] \"x\""}}}},
+          {"readTime": "2024-01-01T00:00:00Z"}, [1, 2, {"k": "]"}], "ç€😀"]
+
+
+def _pedacos(dados, n):
+    return [dados[i:i + n] for i in range(0, len(dados), n)]
+
+
+@pytest.mark.parametrize('tamanho', [1, 2, 3, 5, 7, 16, 10_000])
+def test_qualquer_corte_devolve_os_mesmos_itens(tamanho):
+    # cortes de 1 byte partem também os caracteres UTF-8 de vários bytes
+    dados = json.dumps(_ITENS, ensure_ascii=False, indent=1).encode('utf-8')
+    assert list(at._iter_json_array(_pedacos(dados, tamanho))) == _ITENS
+
+
+def test_array_vazio_e_espacos():
+    assert list(at._iter_json_array([b' \n [', b' ', b']\n'])) == []
+
+
+def test_itens_saem_antes_do_fim_da_resposta():
+    itens = at._iter_json_array(iter([b'[{"a": 1},', b' {"b"', b': 2}]']))
+    assert next(itens) == {"a": 1}
+    assert next(itens) == {"b": 2}
+
+
+def test_resposta_cortada_levanta():
+    with pytest.raises(ValueError, match='truncado'):
+        list(at._iter_json_array([b'[{"a": 1}, {"b": ']))
+
+
+def test_resposta_que_nao_e_array_levanta():
+    with pytest.raises(ValueError):
+        list(at._iter_json_array([b'{"error": {}}']))